@@ -0,0 +1,114 @@
+#!/usr/bin/python3
+import getopt
+import sys
+import time
+from math import sqrt
+
+import numpy as np
+
+from posting_set import PostingSet, intersect
+
+def usage():
+    print("usage: " + sys.argv[0] + " [-n number-of-documents] [-r repetitions]")
+
+def create_skip_pointers(posting_list):
+    """
+    convert a posting list into (docId, nextValue, nextIndex) tuples, with a skip
+    pointer every sqrt(n) postings, as the previous query evaluator did
+    """
+    skip_jump = int(sqrt(len(posting_list)))
+    length = len(posting_list)
+    new_posting_list = []
+
+    for i in range(length):
+        if i % skip_jump == 0 and i + skip_jump < length:
+            new_posting_list.append((posting_list[i], posting_list[i + skip_jump], i + skip_jump))
+        else:
+            new_posting_list.append((posting_list[i], None, None))
+
+    return new_posting_list
+
+def skip_pointer_intersection(posting_list1, posting_list2):
+    """
+    intersect two posting lists with skip pointers, as the previous query evaluator did
+    """
+    i = j = 0
+    M, N = len(posting_list1), len(posting_list2)
+
+    final_posting_list = []
+    while i < M and j < N:
+        if posting_list1[i][0] == posting_list2[j][0]:
+            final_posting_list.append(posting_list1[i][0])
+            i += 1
+            j += 1
+        elif posting_list2[j][1] != None and posting_list1[i][0] >= posting_list2[j][1]:
+            j = posting_list2[j][2]
+        elif posting_list1[i][1] != None and posting_list1[i][1] <= posting_list2[j][0]:
+            i = posting_list1[i][2]
+        elif posting_list1[i][0] >= posting_list2[j][0]:
+            j += 1
+        elif posting_list1[i][0] <= posting_list2[j][0]:
+            i += 1
+    return create_skip_pointers(final_posting_list)
+
+def measure(function, repetitions) -> float:
+    """
+    return the average time of a function call, in microseconds
+    """
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        function()
+    return (time.perf_counter() - start) / repetitions * 1e6
+
+def run_benchmark(num_of_documents, repetitions):
+    """
+    intersect random posting lists of various lengths with the skip pointers and
+    with the NumPy kernels, on their own and inside posting sets
+    """
+    rng = np.random.default_rng(0)
+    sizes = [(10, 1000), (10, 50000), (100, 1000), (100, 50000), (1000, 1000), (1000, 50000), (4000, 4000), (50000, 50000)]
+
+    print('{:>7} {:>7} {:>14} {:>12} {:>12} {:>9}'.format('short', 'long', 'skip pointers', 'kernel', 'posting set', 'speedup'))
+    for short, long in sizes:
+        if long > num_of_documents:
+            continue
+        first = np.sort(rng.choice(num_of_documents, short, replace = False)).astype(np.uint32)
+        second = np.sort(rng.choice(num_of_documents, long, replace = False)).astype(np.uint32)
+        first_list, second_list = first.tolist(), second.tolist()
+        first_set, second_set = PostingSet.from_sorted(first), PostingSet.from_sorted(second)
+
+        # The previous evaluator built the skip pointers of every posting list it read
+        old = lambda: skip_pointer_intersection(create_skip_pointers(first_list), create_skip_pointers(second_list))
+        kernel = lambda: intersect(first, second)
+        posting_set = lambda: first_set & second_set
+
+        expected = [doc_id for doc_id, _, _ in old()]
+        if kernel().tolist() != expected or posting_set().to_list() != expected:
+            print('results differ for {} and {} docIDs'.format(short, long))
+            sys.exit(1)
+
+        old_time = measure(old, repetitions)
+        kernel_time = measure(kernel, repetitions)
+        posting_set_time = measure(posting_set, repetitions)
+        print('{:>7} {:>7} {:>12.1f}us {:>10.1f}us {:>10.1f}us {:>8.1f}x'.format(
+            short, long, old_time, kernel_time, posting_set_time, old_time / kernel_time))
+
+if __name__ == '__main__':
+    num_of_documents = 1 << 20
+    repetitions = 20
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'n:r:')
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for o, a in opts:
+        if o == '-n': # range of the docIDs
+            num_of_documents = int(a)
+        elif o == '-r': # number of repetitions of every measure
+            repetitions = int(a)
+        else:
+            assert False, "unhandled option"
+
+    run_benchmark(num_of_documents, repetitions)
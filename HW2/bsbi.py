@@ -1,4 +1,5 @@
-from typing import List
+from typing import Dict, List, Tuple
+import heapq
 import os
 
 class BSBI:
@@ -26,79 +27,87 @@ class BSBI:
             chunks.append(self.filenames[i: i + self.num_of_files_in_one_block])
         return chunks
 
-    def merge(self, list_of_filenames, target_folder, target_level):
+    def _push_next_line(self, heap, run_file, run_index, translation):
         '''
-        Do 2-way merge on the filenames.
+        Read the next line of a run and push it into the heap, keyed on its termID.
 
         Argument:
-        list_of_filenames (list[str]): A list of filenames
-        target_folder (str): Path to save the merged file
-        target_level (int): Denote the level of the merging, act as identifier
+        heap (List[Tuple[int, int, List[int]]]): Heap of (termID, run index, postings)
+        run_file (file): The opened run
+        run_index (int): Position of the run, used to break ties between runs
+        translation (List[int]): Map the local termID i + 1 of the run to its global termID
         '''
-        number_of_merging = len(list_of_filenames) // 2
-        for i in range(number_of_merging):
-            # Open 2 files that is going to be merged
-            filename0, filename1 = list_of_filenames[2 * i : 2 * i + 2]
-            file0 = open(os.path.join(target_folder, filename0), 'r')
-            file1 = open(os.path.join(target_folder, filename1), 'r')
-
-            # Open target file
-            target_name = os.path.join(target_folder, 'level{}_chunk{}.txt'.format(target_level, i))
-            target_file = open(os.path.join(target_folder, target_name), 'w')
-
-            # Perform merging
-            line0 = file0.readline().rstrip()
-            line1 = file1.readline().rstrip()
-            while line0 != '' and line0 != '\n' and line1 != '' and line1 != '\n':
-                termId0 = int(line0.split("|", 1)[0])
-                termId1 = int(line1.split("|", 1)[0])
-                if termId0 < termId1:
-                    target_file.write(line0)
-                    target_file.write("\n")
-                    line0 = file0.readline().rstrip()
-                elif termId0 > termId1:
-                    target_file.write(line1)
-                    target_file.write("\n")
-                    line1 = file1.readline().rstrip()
-                else:
-                    target_file.write(str(termId0))
-                    elem_line0 = list(map(int, line0.split('|')[1:]))
-                    elem_line1 = list(map(int, line1.split('|')[1:]))
-                    m, n = len(elem_line0), len(elem_line1)
-                    i = j = 0
-                    while i < m and j < n:
-                        if elem_line0[i] < elem_line1[j]:
-                            target_file.write("|" + str(elem_line0[i]))
-                            i += 1
-                        else:
-                            target_file.write("|" + str(elem_line1[j]))
-                            j += 1
-
-                    # Leftovers
-                    while i < m:
-                        target_file.write("|" + str(elem_line0[i]))
-                        i += 1
-                    while j < n:
-                        target_file.write("|" + str(elem_line1[j]))
-                        j += 1
-                    target_file.write("\n")
-                    line0 = file0.readline().rstrip()
-                    line1 = file1.readline().rstrip()
-                
-            # Left overs of file0
-            while line0 != '' and line0 != '\n':
-                target_file.write(line0)
-                target_file.write("\n")
-                line0 = file0.readline().rstrip()
-
-            # Left overs of file1
-            while line1 != '' and line1 != '\n':
-                target_file.write(line1)
-                target_file.write("\n")
-                line1 = file1.readline().rstrip()
-
-            # Delete the old 2 files
-            file0.close()
-            file1.close()
-            os.remove(os.path.join(target_folder, filename0))
-            os.remove(os.path.join(target_folder, filename1))
+        line = run_file.readline().rstrip()
+        if line == '':
+            return
+        term_id, *postings = line.split('|')
+        term_id = int(term_id)
+        if translation is not None:
+            term_id = translation[term_id - 1]
+        heapq.heappush(heap, (term_id, run_index, list(map(int, postings))))
+
+    def write_posting_list(self, posting_file, posting_list, codec) -> Tuple[int, int]:
+        '''
+        Encode a posting list, together with its skip entries, and write it.
+
+        Argument:
+        posting_file (file): The final postings file, opened in binary mode
+        posting_list (List[int]): A sorted posting list
+        codec (PostingsCodec): Used to encode the posting list
+
+        Return:
+        The byte offset where the posting list starts and its length in bytes
+        '''
+        offset = posting_file.tell()
+        encoded = codec.encode(posting_list)
+        posting_file.write(encoded)
+        return offset, len(encoded)
+
+    def merge(self, list_of_filenames, target_folder, posting_file, codec, translations = None) -> Dict[int, Tuple[int, int, int]]:
+        '''
+        Do a single-pass k-way merge on all the runs, and write the final
+        posting lists (with skip entries) into the postings file.
+
+        Argument:
+        list_of_filenames (list[str]): A list of run filenames
+        target_folder (str): Path to the folder that contains the runs
+        posting_file (file): The final postings file, opened in binary mode
+        codec (PostingsCodec): Used to encode the posting lists
+        translations (List[List[int]]): For each run, map its local termIDs into global termIDs.
+            The mapping must preserve the order of the termIDs inside the run.
+            None if the runs already use global termIDs.
+
+        Return:
+        A dictionary that maps a termID to its (document frequency, byte offset, length in bytes)
+        '''
+        run_files = [open(os.path.join(target_folder, filename), 'r') for filename in list_of_filenames]
+        if translations is None:
+            translations = [None] * len(run_files)
+        heap = []
+        for i, run_file in enumerate(run_files):
+            self._push_next_line(heap, run_file, i, translations[i])
+
+        term_entries = dict()
+        while heap:
+            # Collect the postings of the smallest termID from every run that has it
+            term_id, i, postings = heapq.heappop(heap)
+            postings_from_runs = [postings]
+            self._push_next_line(heap, run_files[i], i, translations[i])
+            while heap and heap[0][0] == term_id:
+                _, j, postings = heapq.heappop(heap)
+                postings_from_runs.append(postings)
+                self._push_next_line(heap, run_files[j], j, translations[j])
+
+            if len(postings_from_runs) == 1:
+                posting_list = postings_from_runs[0]
+            else:
+                posting_list = list(heapq.merge(*postings_from_runs))
+            offset, length = self.write_posting_list(posting_file, posting_list, codec)
+            term_entries[term_id] = (len(posting_list), offset, length)
+
+        # Delete the runs
+        for filename, run_file in zip(list_of_filenames, run_files):
+            run_file.close()
+            os.remove(os.path.join(target_folder, filename))
+
+        return term_entries
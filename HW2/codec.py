@@ -0,0 +1,132 @@
+from math import sqrt
+from typing import List, Tuple
+
+class PostingsCodec:
+    '''
+    A class that encodes posting lists into a compact binary format,
+    and decodes them back.
+
+    Each posting list is stored as:
+        header       : df, number of skips (variable-byte)
+        skip entries : (byte offset, docID) pairs (variable-byte)
+        postings     : gaps between consecutive docIDs (variable-byte)
+
+    There is a skip entry every sqrt(df) postings. The byte offset of a skip
+    entry points right after its posting inside the gaps, so that decoding can
+    resume from there with the docID of the skip entry as the previous docID.
+
+    No unique attributes added to this class, using the default
+    constructor in Python.
+    '''
+
+    def encode_number(self, number) -> bytearray:
+        '''
+        Encode a non-negative integer with variable-byte encoding. The last byte
+        of the number has its high bit set.
+
+        Argument:
+        number (int): A non-negative integer
+
+        Return:
+        The encoded bytes
+        '''
+        encoded = bytearray()
+        while True:
+            encoded.insert(0, number & 127)
+            if number < 128:
+                break
+            number >>= 7
+        encoded[-1] |= 128
+        return encoded
+
+    def decode_number(self, data, position) -> Tuple[int, int]:
+        '''
+        Decode a single variable-byte encoded integer.
+
+        Argument:
+        data (bytes): The encoded bytes
+        position (int): Where the number starts
+
+        Return:
+        The number and the position right after it
+        '''
+        number = 0
+        while True:
+            byte = data[position]
+            position += 1
+            if byte < 128:
+                number = (number << 7) | byte
+            else:
+                return (number << 7) | (byte - 128), position
+
+    def encode(self, posting_list) -> bytes:
+        '''
+        Encode a sorted posting list, together with its skip entries.
+
+        Argument:
+        posting_list (List[int]): A sorted list of docIDs
+
+        Return:
+        The encoded posting list
+        '''
+        df = len(posting_list)
+        skip_jump = int(sqrt(df))
+
+        gaps = bytearray()
+        skips = []
+        previous = 0
+        for index, doc_id in enumerate(posting_list):
+            gaps += self.encode_number(doc_id - previous)
+            previous = doc_id
+            # Only worth skipping when it jumps over at least one posting
+            if skip_jump > 1 and index > 0 and index % skip_jump == 0:
+                skips.append((len(gaps), doc_id))
+
+        encoded = self.encode_number(df) + self.encode_number(len(skips))
+        for offset, doc_id in skips:
+            encoded += self.encode_number(offset)
+            encoded += self.encode_number(doc_id)
+        return bytes(encoded + gaps)
+
+    def decode_header(self, data) -> Tuple[int, List[Tuple[int, int]], int]:
+        '''
+        Decode the header and the skip entries of an encoded posting list.
+
+        Argument:
+        data (bytes): An encoded posting list
+
+        Return:
+        The df, the list of (byte offset, docID) skip entries, and the position
+        where the gaps start
+        '''
+        df, position = self.decode_number(data, 0)
+        num_of_skips, position = self.decode_number(data, position)
+        skips = []
+        for _ in range(num_of_skips):
+            offset, position = self.decode_number(data, position)
+            doc_id, position = self.decode_number(data, position)
+            skips.append((offset, doc_id))
+        return df, skips, position
+
+    def decode(self, data) -> List[int]:
+        '''
+        Decode all the docIDs of an encoded posting list in one pass.
+
+        Argument:
+        data (bytes): An encoded posting list
+
+        Return:
+        The sorted list of docIDs
+        '''
+        _, _, position = self.decode_header(data)
+        posting_list = []
+        append = posting_list.append
+        doc_id = number = 0
+        for byte in memoryview(data)[position:]:
+            if byte < 128:
+                number = (number << 7) | byte
+            else:
+                doc_id += (number << 7) | (byte - 128)
+                append(doc_id)
+                number = 0
+        return posting_list
@@ -1,30 +1,147 @@
 #!/usr/bin/python3
 import getopt
-import json
 import os
 import shutil
-import platform
+import subprocess
 import sys
+from array import array
+from itertools import repeat
+from multiprocessing import Pool
+from typing import List, Tuple
+import yaml
 
 from bsbi import BSBI
+from codec import PostingsCodec
 from index_table import IndexTable
 from memory_indexing import MemoryIndexing
-from preprocessor import Preprocessor
+from permuterm import permuterm_path, write_permuterm_index
+from preprocessor import Preprocessor, StemCache, stem_table_path
+from segments import SegmentManager
+from spimi import SPIMI
+from term_table import TermTableWriter
+from utils import parse_size
+
+# doc frequency, byte offset and length of the posting list of a term
+DICTIONARY_FORMAT = '<IQI'
+
+# Obtain the maximum number of segments before merging them, and the default memory budget and inverter of the blocks
+ROOT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+with open(os.path.join(ROOT_DIRECTORY, "config.yaml"), "r") as config:
+    hyperparameters = yaml.full_load(config)
+max_segments = hyperparameters['indexing']['max_segments']
+default_memory_budget = hyperparameters['indexing']['memory_budget']
+default_inverter = hyperparameters['indexing']['inverter']
 
 def usage():
-    print("usage: " + sys.argv[0] + " -i directory-of-documents -d dictionary-file -p postings-file")
+    print("usage: " + sys.argv[0] + " -i directory-of-documents -d dictionary-file -p postings-file [--workers N] [--memory-budget SIZE] [--inverter spimi|bsbi] [--append]")
+    print("       " + sys.argv[0] + " --merge -d dictionary-file -p postings-file")
+    print("after --append or --merge, the index is the manifest dictionary-file.segments and the numbered files it lists")
+
+# Preprocessor of the current process, kept across blocks so that its stem cache stays warm
+preprocessor = None
+
+# Rough memory held by every distinct term of a block, on top of the term itself:
+# its entries in the index table and in the posting dictionary (about 100 bytes each
+# with their int values), and its posting array
+TERM_OVERHEAD = 2 * 100 + sys.getsizeof(array('I'))
 
-def build_index(in_dir, out_dict, out_postings):
+def write_run(it, termid_docid_pairs, target_name) -> List[str]:
     """
-    build index from documents stored in the input directory,
-    then output the dictionary file and postings file
+    invert the termID-docID pairs of a block and write them to the disk as a run.
+    The termIDs in the run are local to it and follow the sorted order of the terms,
+    so that the runs can be reconciled before merging.
+    Return the sorted terms of the run
     """
-    print('indexing...')
-    # This is an empty method
-    # Pls implement your code in below
+    mi = MemoryIndexing()
+    index_table = it.get_term_termID_dict()
+    terms = sorted(index_table)
+
+    # create the postings list of every termID
+    posting_dictionary = mi.create_posting(termid_docid_pairs)
+
+    # write the postings list to the disk, renumbering the termIDs in sorted order
+    with open(target_name,'w') as posting_file:
+        for local_id, term in enumerate(terms, 1):
+            posting_file.write(str(local_id))
+            for posting in posting_dictionary[index_table[term]]:
+                posting_file.write("|" + str(posting))
+            posting_file.write("\n")
+
+    return terms
 
+def get_preprocessor() -> Preprocessor:
+    """
+    get the preprocessor of the current process
+    """
+    global preprocessor
+    if preprocessor is None:
+        preprocessor = Preprocessor()
+    return preprocessor
+
+def invert_block(directory, chunk, run_prefix, memory_budget) -> Tuple[List[Tuple[str, List[str]]], List[Tuple[str, str]]]:
+    """
+    tokenize and invert a chunk of files with BSBI, then write it to the disk as runs.
+    The termID-docID pairs are held in compact arrays, and a run is spilled
+    whenever their measured memory reaches the memory budget.
+    Return the (filename, sorted terms) of every run and the content of the stem cache
+    """
+    p = get_preprocessor()
+
+    runs = []
+    it = IndexTable()
+    term_ids, doc_ids = array('I'), array('I')
+    vocabulary_size = 0 # memory held by the terms of the index table
+    for filename in chunk:
+        doc_id = int(filename)
+        for term in p.preprocess_file(os.path.join(directory, filename)):
+            if term not in it.term_termID_dict:
+                vocabulary_size += sys.getsizeof(term) + TERM_OVERHEAD
+            term_ids.append(it.get_termID(term))
+        doc_ids.extend(repeat(doc_id, len(term_ids) - len(doc_ids)))
+
+        # The posting arrays built from the pairs when spilling take at most as much memory as the docIDs
+        if sys.getsizeof(term_ids) + 2 * sys.getsizeof(doc_ids) + vocabulary_size >= memory_budget:
+            run_filename = '{}_{}.txt'.format(run_prefix, len(runs))
+            runs.append((run_filename, write_run(it, zip(term_ids, doc_ids), run_filename)))
+            it = IndexTable()
+            term_ids, doc_ids = array('I'), array('I')
+            vocabulary_size = 0
+
+    if term_ids:
+        run_filename = '{}_{}.txt'.format(run_prefix, len(runs))
+        runs.append((run_filename, write_run(it, zip(term_ids, doc_ids), run_filename)))
+
+    return runs, list(p.stem_cache.entries.items())
+
+def spimi_invert_block(directory, chunk, run_prefix, memory_budget) -> Tuple[List[Tuple[str, List[str]]], List[Tuple[str, str]]]:
+    """
+    tokenize and invert a chunk of files with SPIMI, then write it to the disk as runs.
+    The docIDs go straight into a posting buffer per term, and a run is spilled
+    whenever the buffers reach the memory budget.
+    Return the (filename, sorted terms) of every run and the content of the stem cache
+    """
+    p = get_preprocessor()
+    spimi = SPIMI(memory_budget)
+
+    runs = []
+    for filename in chunk:
+        spimi.add_document(p.preprocess_file(os.path.join(directory, filename)), int(filename))
+        if spimi.is_full():
+            run_filename = '{}_{}.txt'.format(run_prefix, len(runs))
+            runs.append((run_filename, spimi.write_run(run_filename)))
+
+    if spimi.postings:
+        run_filename = '{}_{}.txt'.format(run_prefix, len(runs))
+        runs.append((run_filename, spimi.write_run(run_filename)))
+
+    return runs, list(p.stem_cache.entries.items())
+
+def build_segment(directory, filenames, out_dict, out_postings, workers, stem_cache, memory_budget, inverter):
+    """
+    build a segment of the index from the given files in the input directory,
+    then output its dictionary file and postings file
+    """
     ROOT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
-    directory = os.path.join(ROOT_DIRECTORY, in_dir)
     temp_folder = os.path.join(ROOT_DIRECTORY, 'disks')
 
     # Check if folder exists
@@ -34,129 +151,145 @@ def build_index(in_dir, out_dict, out_postings):
         shutil.rmtree(temp_folder)
         os.mkdir(temp_folder)
 
-    p = Preprocessor()
-    mi = MemoryIndexing()
     it = IndexTable()
 
-    # BSBI
-    filenames = sorted(os.listdir(directory), key = lambda filename: int(filename))
-    num_of_files_in_one_block = 1000
+    # BSBI, where the size of the blocks is bounded by memory instead of a number of files.
+    # With several workers, the files are split in a few chunks per worker to balance
+    # the load, and the memory budget is shared between the workers
+    num_of_chunks = workers * 4 if workers > 1 else 1
+    num_of_files_in_one_block = max(-(-len(filenames) // num_of_chunks), 1)
     bsbi = BSBI(num_of_files_in_one_block, filenames)
     chunks = bsbi.generate_chunks()
+    worker_budget = memory_budget // max(workers, 1)
+
+    # Invert each chunk into runs, in separate processes if there are several workers.
+    # Both inverters write the same runs, so they share the same merge
+    invert = spimi_invert_block if inverter == 'spimi' else invert_block
+    blocks = [(directory, chunk, os.path.join(temp_folder, 'level0_chuck_{}'.format(i)), worker_budget)
+        for i, chunk in enumerate(chunks)]
+    if workers > 1:
+        with Pool(workers) as pool:
+            results = pool.starmap(invert, blocks, chunksize = 1)
+    else:
+        results = [invert(*block) for block in blocks]
+    runs = [run for block_runs, _ in results for run in block_runs]
+    run_filenames = [os.path.basename(run_filename) for run_filename, _ in runs]
+    vocabularies = [vocabulary for _, vocabulary in runs]
+
+    # Collect the stems of the surface forms seen by every process
+    for _, stems in results:
+        stem_cache.update(stems)
+
+    # Reconcile the local termIDs of the runs into global termIDs, which follow the sorted order of the terms
+    index_table = it.term_to_termID(sorted(set().union(*vocabularies)))
+    translations = [[index_table[term] for term in vocabulary] for vocabulary in vocabularies]
+
+    ## Merging all the runs in one pass, which also writes the final compressed postings with skip entries
+    codec = PostingsCodec()
+    with open(out_postings, 'wb') as posting_file:
+        term_entries = bsbi.merge(run_filenames, temp_folder, posting_file, codec, translations)
+
+        # Write the _ALL_ for NOT operation in Search
+        all_offset, all_length = bsbi.write_posting_list(posting_file, list(map(int, filenames)), codec)
+
+    # write the dictionary of terms to the disk as a front-coded term table, sorted by term
+    entries = [(term, term_entries[term_id]) for term, term_id in index_table.items()]
+    entries.append(('_ALL_', (len(filenames), all_offset, all_length)))
+    entries.sort()
+    with TermTableWriter(out_dict, DICTIONARY_FORMAT) as term_table:
+        for term, (doc_frequency, offset, length) in entries:
+            term_table.add(term, doc_frequency, offset, length)
+
+    # write the permuterm index of the terms, for the leading and infix wildcards
+    write_permuterm_index(index_table.keys(), permuterm_path(out_dict))
+
+def build_index(in_dir, out_dict, out_postings, workers = 1, append = False, memory_budget = None, inverter = None):
+    """
+    build index from documents stored in the input directory,
+    then output the dictionary file and postings file.
+    When appending, only the documents that are not indexed yet are
+    indexed, into a new segment of the existing index.
+    The memory budget (e.g. 512M) bounds the memory used to invert the blocks,
+    with either the spimi or the bsbi inverter
+    """
+    print('indexing...')
+    # This is an empty method
+    # Pls implement your code in below
+
+    ROOT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+    directory = os.path.join(ROOT_DIRECTORY, in_dir)
+    out_postings = os.path.join(ROOT_DIRECTORY, out_postings)
+
+    filenames = sorted(os.listdir(directory), key = lambda filename: int(filename))
+    segments = SegmentManager(out_dict, out_postings)
+    stem_cache = StemCache()
+    memory_budget = parse_size(default_memory_budget if memory_budget is None else memory_budget)
+    inverter = default_inverter if inverter is None else inverter
 
-    term_docid_list = [] # list to store the term_docid pairs
-    for i in range(len(chunks)):
-        chunk = chunks[i]
-        for filename in chunk:
-            data = p.preprocess_file(os.path.join(directory, filename))
-            doc_id = int(filename)
-            dictionary = mi.create_term_docid_pair(data, doc_id)
-            term_docid_list.extend(dictionary)
-
-        # convert all the terms into term_id 
-        terms = list(set(map(lambda pair: pair[0], term_docid_list)))
-        index_table = it.term_to_termID(terms)
-        termid_docid_list = [(index_table[pair[0]], pair[1]) for pair in term_docid_list]
-
-        # create the postings list and the dictionary terms
-        posting_dictionary = mi.create_posting(termid_docid_list)
-
-        # write the postings list to the disk
-        target_name = os.path.join(temp_folder, 'level0_chuck_{}.txt'.format(i))
-        with open(target_name,'w') as posting_file:
-            for term in sorted(terms, key = lambda t: index_table[t]):
-                term_id = index_table[term]
-                posting_file.write(str(term_id))
-                for posting in posting_dictionary[term_id]:
-                    posting_file.write("|" + str(posting))
-                posting_file.write("\n")
-
-        # Clear for next chunk
-        term_docid_list.clear()
-
-    ## Merging
-    level = 1
-    filenames_in_disks = os.listdir(temp_folder)
-    while len(filenames_in_disks) > 1:
-        bsbi.merge(filenames_in_disks, temp_folder, level)
-        filenames_in_disks = os.listdir(temp_folder)
-        level += 1
-
-    # Write the _ALL_ for NOT operation in Search
-    with open(os.path.join(temp_folder, filenames_in_disks[0]), 'a') as posting_file:
-        posting_file.write("_ALL_")
-        for filename in filenames:
-            posting_file.write("|" + filename)
-
-    # Create skip pointer and write it on the output file
-    with open(os.path.join(ROOT_DIRECTORY, out_postings), 'w') as posting_file:
-        with open(os.path.join(temp_folder, filenames_in_disks[0]), 'r') as bsbi_result:
-            line = bsbi_result.readline().rstrip()
-            while line != '' and line != '\n':
-                termId, *postings = line.split('|')
-                posting_with_skip = mi.create_skip_pointers(list(map(int, postings)))
-                posting_file.write(termId)
-                for posting in posting_with_skip:
-                    posting_file.write("|" + str(posting))
-                posting_file.write("\n")
-                line = bsbi_result.readline()
-    
-    # Delete BSBI chunk
-    os.remove(os.path.join(temp_folder, filenames_in_disks[0]))
-    
-    #### CHANGES
-    windows_platform = platform.system() == 'Windows'
-
-    # read the postings file again to help with the seek() function when searching
-    line_offset = []
-    frequencies = []
-    offset = 0
-    with open(os.path.join(ROOT_DIRECTORY, out_postings), 'r') as posting_file:
-        line = posting_file.readline()
-        while line != '' and line != '\n':
-            line_offset.append(offset)
-            frequencies.append(len(line.split('|')) - 1)
-            offset += len(line) + 1 if windows_platform else len(line) #### CHANGES
-            line = posting_file.readline()
-
-    # create the dictionary of terms using the trie data structure
-    terms = it.get_term_termID_dict().keys()
-    term_dictionary = mi.create_dictionary_trie(terms, frequencies, index_table)
-
-    for term in terms:
-        term_id = index_table[term]
-        root = term[0]
-        current_node = term_dictionary[root]
-        for char in term[1:]:
-            current_node = current_node[char]
-        current_node["_end_"].append(line_offset[term_id - 1])
-    term_dictionary['_ALL_'] = (None, line_offset[-1])
-
-
-    # write the dictionary to the disk
-    with open(out_dict, 'w') as dict_file:
-        json.dump(term_dictionary, dict_file)
-        
-input_directory = output_file_dictionary = output_file_postings = None
-
-try:
-    opts, args = getopt.getopt(sys.argv[1:], 'i:d:p:')
-except getopt.GetoptError:
-    usage()
-    sys.exit(2)
-
-for o, a in opts:
-    if o == '-i': # input directory
-        input_directory = a
-    elif o == '-d': # dictionary file
-        output_file_dictionary = a
-    elif o == '-p': # postings file
-        output_file_postings = a
+    append = append and segments.exists()
+    if append:
+        indexed_documents = set(segments.get_indexed_documents())
+        filenames = [filename for filename in filenames if int(filename) not in indexed_documents]
+        if not filenames:
+            print('no new documents to index')
+            return
+        segment_dict, segment_postings = segments.new_segment_files()
+        if os.path.exists(stem_table_path(out_dict)):
+            stem_cache.load(stem_table_path(out_dict))
     else:
-        assert False, "unhandled option"
+        segments.reset()
+        segment_dict, segment_postings = out_dict, out_postings
 
-if input_directory == None or output_file_postings == None or output_file_dictionary == None:
-    usage()
-    sys.exit(2)
+    build_segment(directory, filenames, segment_dict, segment_postings, workers, stem_cache, memory_budget, inverter)
+    if append:
+        segments.add(segment_dict, segment_postings)
 
-build_index(input_directory, output_file_dictionary, output_file_postings)
+    # Save the stems of the surface forms, to be reused by the query parser
+    stem_cache.save(stem_table_path(out_dict))
+
+    # Merge the segments in the background once there are too many of them
+    if len(segments) > max_segments:
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), '--merge', '-d', out_dict, '-p', out_postings],
+            start_new_session = True)
+
+if __name__ == '__main__':
+    input_directory = output_file_dictionary = output_file_postings = None
+    workers = 1
+    memory_budget = inverter = None
+    append = merge = False
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'i:d:p:', ['workers=', 'memory-budget=', 'inverter=', 'append', 'merge'])
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for o, a in opts:
+        if o == '-i': # input directory
+            input_directory = a
+        elif o == '-d': # dictionary file
+            output_file_dictionary = a
+        elif o == '-p': # postings file
+            output_file_postings = a
+        elif o == '--workers': # number of processes used to invert the blocks
+            workers = int(a)
+        elif o == '--memory-budget': # memory used to invert the blocks, e.g. 512M
+            memory_budget = a
+        elif o == '--inverter': # spimi or bsbi
+            inverter = a
+        elif o == '--append': # only index the new documents, into a new segment
+            append = True
+        elif o == '--merge': # merge the segments of the index
+            merge = True
+        else:
+            assert False, "unhandled option"
+
+    if output_file_postings == None or output_file_dictionary == None or (input_directory == None and not merge) \
+        or inverter not in (None, 'spimi', 'bsbi'):
+        usage()
+        sys.exit(2)
+
+    if merge:
+        SegmentManager(output_file_dictionary, output_file_postings).merge()
+    else:
+        build_index(input_directory, output_file_dictionary, output_file_postings, workers, append, memory_budget, inverter)
@@ -31,9 +31,10 @@ class IndexTable:
       return self.term_termID_dict[term]
 
     # Create new termID
-    self.term_termID_dict[term] = self.id
+    term_id = self.id
+    self.term_termID_dict[term] = term_id
     self.id += 1
-    return self.id
+    return term_id
 
   def term_to_termID(self,list_of_terms) -> Dict[str, int]:
     '''
@@ -1,5 +1,5 @@
+from array import array
 from typing import List,Tuple, Dict
-from math import sqrt
 
 class MemoryIndexing:
   '''
@@ -31,88 +31,34 @@ class MemoryIndexing:
     return term_docid_pairs
 
 
-  def create_dictionary_trie(self, list_of_terms, frequency, index_table) -> Dict[str, List[int]]:
+  def create_posting(self,termid_docid_pairs) -> Dict[int, array]:
     '''
-    Take a list of terms from a particular document, the
-    posting dictionary (to get the doc frequency), and the index
-    table to map the term to termIDs and returns a 
-    dictionary that represents the trie-representation of the 
-    words inside the list of terms. 
+    Take the termID-docID pairs of a block and returns a dictionary
+    where the key is the termID and the value is a compact array of
+    docIDs.
 
-    Arguments:
-      list_of_terms : list of terms from the particular document
-
-    
-    Return:
-      Dictionary representing the trie-representation of the words
-      inside the document.
-    '''
-    root = {}
-
-    for term in list_of_terms:
-      current_node = root
-      for char in term:
-        current_node = current_node.setdefault(char,{})
-      identifier = index_table[term]
-      current_node['_end_'] = [frequency[identifier - 1]]
-    return root
-
-
-  def create_posting(self,termid_docid_pairs) -> Dict[int, List[int]]:
-    '''
-    Take a list of term-docID pairs stored in a tuple and the index
-    table that maps the terms to termIDs and returns a dictionary
-    where the key is the termId and the value is a list of docIDs.
+    The pairs must be grouped by document, in increasing order of
+    docID, so that the docIDs of every term come out sorted and a
+    duplicate is always the last docID of its term.
 
     Argument:
-      term_docid_pairs  : list containing the term-docID pairs stored in a tuple.
+      termid_docid_pairs  : iterable of the termID-docID pairs of a block.
 
     Return:
-      Dictionary with term_list-of-docIDs key-value pairs. 
-
-    Note: If the current node does not have skip pointer, it will be labelled as (..., None, None)
+      Dictionary with termID-array-of-docIDs key-value pairs.
     '''
     posting_dict = dict()
-    exist_posting = set()
 
     for term_id, doc_id in termid_docid_pairs:
+      postings = posting_dict.get(term_id)
+      if postings is None:
+        posting_dict[term_id] = array('I', (doc_id,))
       # Duplicate
-      if (term_id, doc_id) in exist_posting:
-        continue
-      if term_id not in posting_dict.keys():
-        posting_dict[term_id] = [doc_id]
-      else:
-        posting_dict[term_id].append(doc_id)
-      exist_posting.add((term_id, doc_id))
+      elif postings[-1] != doc_id:
+        postings.append(doc_id)
 
     return posting_dict
 
-  def create_skip_pointers(self, posting_list) -> List[Tuple[int, int, int]]:
-    '''
-    A function that convert the posting list from a list of int into a list of tuple.
-
-    Note: If the current node does not have skip pointer, it will be labelled as (..., None, None)
-    Otherwise, it will be labeled as (..., ..., ...)
-
-    Argument:
-      posting_list (List[int])  : A posting list.
-
-    Return:
-      Dictionary with term_list-of-docIDs key-value pairs. 
-    '''
-    posting_skip_pointers = []
-    skip_jump = int(sqrt(len(posting_list))) # to indicate the skip pointer
-    index = 0
-    length = len(posting_list)
-
-    for posting in posting_list:
-      if  index % skip_jump == 0 and index+skip_jump < length:
-        posting_skip_pointers.append((posting, posting_list[index+skip_jump],index+skip_jump))
-      else:
-        posting_skip_pointers.append((posting,None,None))
-      index+=1
-    return posting_skip_pointers
-
   def count_chars(self,posting_key,posting_value) -> int:
     '''
     Take the posting key and the list of postings and returns 
@@ -0,0 +1,144 @@
+import os
+from typing import Generator, List, Tuple
+
+from term_table import TermTable, TermTableWriter
+
+# Marks the end of a term in its rotations
+END = '$'
+
+# The rotations have no payload, since the term can be recovered from the rotation itself
+PERMUTERM_FORMAT = ''
+
+def permuterm_path(dictionary_file) -> str:
+    '''
+    Get the path of the permuterm index that is saved next to a dictionary file.
+
+    Argument:
+        dictionary_file (str): Path to the dictionary file
+
+    Return:
+        Path to the permuterm index
+    '''
+    return dictionary_file + '.permuterm'
+
+def is_wildcard(term) -> bool:
+    '''
+    Check whether a query term is a wildcard pattern.
+
+    Argument:
+        term (str): A query term
+
+    Return:
+        A boolean denoting whether the term contains a *
+    '''
+    return '*' in term
+
+def matches(term, pattern) -> bool:
+    '''
+    Check whether a term matches a wildcard pattern, where * matches any
+    sequence of characters.
+
+    Argument:
+        term (str): A term
+        pattern (str): A wildcard pattern
+
+    Return:
+        A boolean denoting whether the term matches
+    '''
+    parts = pattern.split('*')
+    if len(term) < sum(map(len, parts)) or not term.startswith(parts[0]) or not term.endswith(parts[-1]):
+        return False
+    position = len(parts[0])
+    end = len(term) - len(parts[-1])
+    for part in parts[1: -1]:
+        position = term.find(part, position, end)
+        if position < 0:
+            return False
+        position += len(part)
+    return True
+
+def write_permuterm_index(terms, path) -> None:
+    '''
+    Write the permuterm index of a vocabulary: every rotation of every term
+    followed by the end marker, in a sorted term table. A term with the end
+    marker in it can only be matched by trailing wildcards.
+
+    Argument:
+        terms (Iterable[str]): The terms
+        path (str): Path to the permuterm index
+    '''
+    rotations = []
+    for term in terms:
+        if END in term:
+            continue
+        word = term + END
+        for i in range(len(word)):
+            rotations.append(word[i:] + word[:i])
+    rotations.sort()
+    with TermTableWriter(path, PERMUTERM_FORMAT) as table:
+        for rotation in rotations:
+            table.add(rotation)
+
+class PermutermIndex:
+    '''
+    Expand wildcard query terms into the terms of a dictionary. A trailing
+    wildcard (e.g. comput*) is a range scan of the sorted dictionary. Leading
+    and infix wildcards (e.g. *put, co*er) are rotated so that the * is at the
+    end (put$*, er$co*), and become a range scan of the permuterm index.
+
+    Attributes:
+        dictionary (TermTable): The dictionary of terms
+        rotations (TermTable): The permuterm index, or None if the index has none
+    '''
+
+    def __init__(self, dictionary, path) -> None:
+        self.dictionary = dictionary
+        self.rotations = TermTable(path) if os.path.exists(path) else None
+
+    def _match_rotations(self, pattern) -> List[str]:
+        '''
+        Find the terms that match a wildcard pattern in the permuterm index.
+
+        Argument:
+            pattern (str): A wildcard pattern
+
+        Return:
+            The sorted terms that match the pattern
+        '''
+        parts = pattern.split('*')
+        if parts[0] or parts[-1]:
+            key = parts[-1] + END + parts[0]
+        else:
+            # Without a fixed start or end, scan the rotations that start with the longest part
+            key = max(parts, key = len)
+        terms = set()
+        for rotation, _ in self.rotations.prefix_items(key):
+            end = rotation.index(END)
+            terms.add(rotation[end + 1:] + rotation[:end])
+        return sorted(term for term in terms if matches(term, pattern))
+
+    def expand(self, pattern) -> Generator[Tuple[str, tuple], None, None]:
+        '''
+        Iterate through the terms of the dictionary that match a wildcard pattern,
+        in sorted order.
+
+        Argument:
+            pattern (str): A wildcard pattern
+
+        Return:
+            A generator of (term, payload)
+        '''
+        prefix, _, rest = pattern.partition('*')
+        if rest.strip('*') == '':
+            yield from self.dictionary.prefix_items(prefix)
+            return
+        if self.rotations is None:
+            return
+        for term in self._match_rotations(pattern):
+            values = self.dictionary.get(term)
+            if values is not None:
+                yield term, values
+
+    def close(self):
+        if self.rotations is not None:
+            self.rotations.close()
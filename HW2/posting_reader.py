@@ -0,0 +1,47 @@
+import mmap
+
+class PostingReader:
+    '''
+    Read-only access to a postings file through a shared memory map. The posting
+    lists are read by their byte offset and length, as zero-copy slices of the map,
+    so there is no file position shared between readers and one reader can be
+    used by several threads at the same time without locking.
+
+    Attributes:
+        file (file): The postings file
+        data (mmap.mmap): The memory-mapped postings file, or None if it is empty
+        view (memoryview): A view on the whole postings file
+    '''
+
+    def __init__(self, path) -> None:
+        self.file = open(path, 'rb')
+        if self.file.seek(0, 2) == 0:
+            # An empty file can not be memory-mapped
+            self.data = None
+            self.view = memoryview(b'')
+        else:
+            self.data = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+            self.view = memoryview(self.data)
+
+    def read(self, offset, length) -> memoryview:
+        '''
+        Get the bytes of a posting list.
+
+        Argument:
+            offset (int): Byte offset of the posting list in the postings file
+            length (int): Length of the posting list in bytes
+
+        Return:
+            A read-only view on the bytes of the posting list
+        '''
+        return self.view[offset: offset + length]
+
+    def close(self) -> None:
+        self.view.release()
+        if self.data is not None:
+            try:
+                self.data.close()
+            except BufferError:
+                # Views on posting lists are still in use, the map is released with the last of them
+                pass
+        self.file.close()
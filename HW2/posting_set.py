@@ -0,0 +1,315 @@
+from typing import Iterator, List, Tuple, Union
+import numpy as np
+
+# docIDs are split into containers by their high 16 bits
+CONTAINER_BITS = 16
+CONTAINER_MASK = (1 << CONTAINER_BITS) - 1
+BITMAP_BYTES = (1 << CONTAINER_BITS) // 8
+
+# Beyond this number of docIDs, a bitmap container is smaller than a sorted array
+ARRAY_LIMIT = 4096
+
+# Rough memory held by a container on top of its docIDs: its array object and its dictionary entry
+CONTAINER_OVERHEAD = 200
+
+# Beyond this length ratio, the shorter array is binary searched in the longer one instead of merged
+SEARCH_RATIO = 4
+
+def _locate(short, long) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Binary search every docID of a sorted array in another, in a single vectorized call.
+
+    Argument:
+        short (np.ndarray): A sorted array of docIDs
+        long (np.ndarray): A sorted array of docIDs
+
+    Return:
+        The insertion position of every docID of short in long, and whether long contains it
+    '''
+    positions = np.searchsorted(long, short)
+    found = np.zeros(len(short), dtype = bool)
+    inside = positions < len(long)
+    found[inside] = long[positions[inside]] == short[inside]
+    return positions, found
+
+def intersect(first, second) -> np.ndarray:
+    '''
+    Intersect two sorted arrays of docIDs. When their lengths differ widely, the
+    shorter one is searched in the longer one, in O(m log n). Otherwise they are
+    merged in O(m + n).
+
+    Argument:
+        first (np.ndarray): A sorted array of docIDs
+        second (np.ndarray): A sorted array of docIDs
+
+    Return:
+        The sorted array of the docIDs in both arrays
+    '''
+    if len(first) > len(second):
+        first, second = second, first
+    if len(second) >= SEARCH_RATIO * len(first):
+        _, found = _locate(first, second)
+        return first[found]
+    return np.intersect1d(first, second, assume_unique = True)
+
+def union(first, second) -> np.ndarray:
+    '''
+    Unite two sorted arrays of docIDs by merging them.
+
+    Argument:
+        first (np.ndarray): A sorted array of docIDs
+        second (np.ndarray): A sorted array of docIDs
+
+    Return:
+        The sorted array of the docIDs in any of the arrays
+    '''
+    merged = np.concatenate((first, second))
+    merged.sort(kind = 'stable')
+    if len(merged) < 2:
+        return merged
+    return merged[np.concatenate(([True], merged[1:] != merged[:-1]))]
+
+def difference(first, second) -> np.ndarray:
+    '''
+    Remove the docIDs of a sorted array from another, searching the shorter
+    array in the longer one.
+
+    Argument:
+        first (np.ndarray): A sorted array of docIDs
+        second (np.ndarray): A sorted array of the docIDs to remove
+
+    Return:
+        The sorted array of the docIDs of first that are not in second
+    '''
+    if len(first) <= len(second):
+        _, found = _locate(first, second)
+        return first[~found]
+    positions, found = _locate(second, first)
+    return np.delete(first, positions[found])
+
+def _to_bitmap(array) -> int:
+    '''
+    Convert a sorted array container into a bitmap container.
+
+    Argument:
+        array (np.ndarray): Sorted low bits of the docIDs
+
+    Return:
+        A bitmap where the i-th bit is set if i is in the container
+    '''
+    bits = np.zeros(1 << CONTAINER_BITS, dtype = bool)
+    bits[array] = True
+    return int.from_bytes(np.packbits(bits, bitorder = 'little').tobytes(), 'little')
+
+def _to_bits(bitmap) -> np.ndarray:
+    '''
+    Unpack a bitmap container.
+
+    Argument:
+        bitmap (int): A bitmap container
+
+    Return:
+        A boolean array where the i-th value is whether i is in the container
+    '''
+    data = np.frombuffer(bitmap.to_bytes(BITMAP_BYTES, 'little'), dtype = np.uint8)
+    return np.unpackbits(data, bitorder = 'little').view(bool)
+
+def _to_array(bitmap) -> np.ndarray:
+    '''
+    Convert a bitmap container into a sorted array container.
+
+    Argument:
+        bitmap (int): A bitmap container
+
+    Return:
+        The sorted low bits of the docIDs
+    '''
+    return np.flatnonzero(_to_bits(bitmap)).astype(np.uint16)
+
+def _filter(array, bitmap, keep) -> np.ndarray:
+    '''
+    Keep the docIDs of an array container depending on whether they are in a bitmap container.
+
+    Argument:
+        array (np.ndarray): Sorted low bits of the docIDs
+        bitmap (int): A bitmap container
+        keep (bool): Keep the docIDs that are in the bitmap if True, the ones that are not otherwise
+
+    Return:
+        The sorted low bits of the kept docIDs
+    '''
+    contained = _to_bits(bitmap)[array]
+    return array[contained if keep else ~contained]
+
+def _normalize(container) -> Union[np.ndarray, int, None]:
+    '''
+    Pick the smallest representation of a container.
+
+    Argument:
+        container (Union[np.ndarray, int]): An array or bitmap container
+
+    Return:
+        The container as an array if it has few docIDs, as a bitmap otherwise,
+        or None if it is empty
+    '''
+    if isinstance(container, int):
+        if container == 0:
+            return None
+        if bin(container).count('1') <= ARRAY_LIMIT:
+            return _to_array(container)
+        return container
+    if len(container) == 0:
+        return None
+    if len(container) > ARRAY_LIMIT:
+        return _to_bitmap(container)
+    return container
+
+class PostingSet:
+    '''
+    A set of docIDs stored in Roaring-style containers. The docIDs are grouped
+    by their high 16 bits, and each group is stored either as a sorted NumPy array
+    of its low 16 bits when it is sparse, or as a bitmap (a Python int) when it is
+    dense. Operations between two bitmaps are word-level bit operations, and
+    operations between two arrays are vectorized kernels that adapt to the ratio
+    of their lengths.
+
+    Attributes:
+        containers (Dict[int, Union[np.ndarray, int]]): Map the high bits of the docIDs to their container
+    '''
+
+    def __init__(self, containers = None):
+        self.containers = containers if containers is not None else dict()
+
+    @classmethod
+    def from_sorted(cls, doc_ids) -> 'PostingSet':
+        '''
+        Build a posting set from a posting list.
+
+        Argument:
+            doc_ids (Iterable[int]): A sorted list of docIDs
+
+        Return:
+            The posting set of the docIDs
+        '''
+        doc_ids = np.asarray(doc_ids, dtype = np.uint32)
+        highs = doc_ids >> CONTAINER_BITS
+        boundaries = np.flatnonzero(highs[1:] != highs[:-1]) + 1
+        containers = dict()
+        for start, end in zip(np.concatenate(([0], boundaries)), np.concatenate((boundaries, [len(doc_ids)]))):
+            if start < end:
+                array = (doc_ids[start: end] & CONTAINER_MASK).astype(np.uint16)
+                containers[int(highs[start])] = _normalize(array)
+        return cls(containers)
+
+    def __len__(self) -> int:
+        return sum(bin(container).count('1') if isinstance(container, int) else len(container)
+            for container in self.containers.values())
+
+    @property
+    def nbytes(self) -> int:
+        '''
+        Estimated memory taken by the containers of the set, in bytes.
+        '''
+        return sum(BITMAP_BYTES if isinstance(container, int) else container.nbytes
+            for container in self.containers.values()) + CONTAINER_OVERHEAD * (len(self.containers) + 1)
+
+    def __bool__(self) -> bool:
+        return bool(self.containers)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.to_list())
+
+    def __and__(self, other) -> 'PostingSet':
+        containers = dict()
+        for high, container in self.containers.items():
+            other_container = other.containers.get(high)
+            if other_container is None:
+                continue
+            if isinstance(container, int) and isinstance(other_container, int):
+                result = container & other_container
+            elif isinstance(container, int):
+                result = _filter(other_container, container, True)
+            elif isinstance(other_container, int):
+                result = _filter(container, other_container, True)
+            else:
+                result = intersect(container, other_container)
+            result = _normalize(result)
+            if result is not None:
+                containers[high] = result
+        return PostingSet(containers)
+
+    def __or__(self, other) -> 'PostingSet':
+        containers = dict(self.containers)
+        for high, other_container in other.containers.items():
+            container = containers.get(high)
+            if container is None:
+                containers[high] = other_container
+                continue
+            if isinstance(container, int) or isinstance(other_container, int):
+                if not isinstance(container, int):
+                    container = _to_bitmap(container)
+                if not isinstance(other_container, int):
+                    other_container = _to_bitmap(other_container)
+                result = container | other_container
+            else:
+                result = union(container, other_container)
+            containers[high] = _normalize(result)
+        return PostingSet(containers)
+
+    def __sub__(self, other) -> 'PostingSet':
+        containers = dict()
+        for high, container in self.containers.items():
+            other_container = other.containers.get(high)
+            if other_container is None:
+                containers[high] = container
+                continue
+            if isinstance(container, int):
+                if not isinstance(other_container, int):
+                    other_container = _to_bitmap(other_container)
+                result = container & ~other_container
+            elif isinstance(other_container, int):
+                result = _filter(container, other_container, False)
+            else:
+                result = difference(container, other_container)
+            result = _normalize(result)
+            if result is not None:
+                containers[high] = result
+        return PostingSet(containers)
+
+    def complement(self, universe) -> 'PostingSet':
+        '''
+        Get the docIDs of the universe that are not in the set.
+
+        Argument:
+            universe (PostingSet): All the docIDs
+
+        Return:
+            The complement of the set
+        '''
+        return universe - self
+
+    def to_array(self) -> np.ndarray:
+        '''
+        Get the sorted docIDs of the set.
+
+        Return:
+            A sorted uint32 array of docIDs
+        '''
+        arrays = []
+        for high in sorted(self.containers):
+            container = self.containers[high]
+            if isinstance(container, int):
+                container = _to_array(container)
+            arrays.append(container.astype(np.uint32) | np.uint32(high << CONTAINER_BITS))
+        if not arrays:
+            return np.zeros(0, dtype = np.uint32)
+        return np.concatenate(arrays)
+
+    def to_list(self) -> List[int]:
+        '''
+        Get the sorted docIDs of the set.
+
+        Return:
+            A sorted list of docIDs
+        '''
+        return self.to_array().tolist()
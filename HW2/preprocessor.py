@@ -1,8 +1,125 @@
-from typing import List
+import os
+import re
+from collections import OrderedDict
+from typing import Iterable, List, Optional
 
 from nltk.stem.porter import PorterStemmer
 from nltk.tokenize import sent_tokenize, word_tokenize
 from unidecode import unidecode
+import yaml
+
+# Obtain the tokenizer and the size of the stem cache
+ROOT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+with open(os.path.join(ROOT_DIRECTORY, "config.yaml"), "r") as config:
+    hyperparameters = yaml.full_load(config)
+default_tokenizer = hyperparameters['preprocessing']['tokenizer']
+default_stem_cache_size = hyperparameters['preprocessing']['stem_cache_size']
+
+# Single-pass approximation of the NLTK sentence and word tokenizers
+TOKEN_PATTERN = re.compile(r"""
+    (?:[^\W\d_]\.){2,}                              # acronyms, e.g. U.S.
+  | [^\W\d_]+\.(?=\s+[a-z0-9])                      # abbreviations inside a sentence, e.g. Corp. said
+  | \w+(?=(?i:n't)\b)                               # the word before a negation, e.g. did|n't
+  | (?i:n't)\b
+  | '(?i:s|re|ve|ll|d|m)\b                          # clitics, e.g. it|'s
+  | \w+(?:[-.,/]\w+|'(?!(?i:s|re|ve|ll|d|m)\b)\w+)*  # words and numbers, e.g. rate-cut, 1,000.5, O'Neil
+  | \.{2,}|--|[^\w\s]                               # punctuation, e.g. ... and --
+""", re.VERBOSE)
+
+def stem_table_path(dictionary_file) -> str:
+    '''
+    Get the path of the stem table that is saved next to a dictionary file.
+
+    Argument:
+        dictionary_file (str): Path to the dictionary file
+
+    Return:
+        Path to the stem table
+    '''
+    return dictionary_file + '.stems'
+
+class StemCache:
+    '''
+    Bounded cache from surface forms to their stems, evicting the least
+    recently used surface form once it is full. It can be saved to the disk
+    as a surface form to stem table, to be loaded back when searching.
+
+    Attributes:
+        capacity (int) : Maximum number of surface forms in the cache.
+        entries (OrderedDict[str, str]) : Map a surface form into its stem.
+        hits (int) : Number of lookups found in the cache.
+        misses (int) : Number of lookups not found in the cache.
+    '''
+
+    def __init__(self, capacity = None) -> None:
+        self.capacity = default_stem_cache_size if capacity is None else capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, word) -> Optional[str]:
+        '''
+        Get the stem of a surface form.
+
+        Argument:
+            word (str): A surface form
+
+        Return:
+            The stem, or None if it is not in the cache
+        '''
+        stem = self.entries.get(word)
+        if stem is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(word)
+        return stem
+
+    def put(self, word, stem) -> None:
+        '''
+        Store the stem of a surface form, evicting the least recently used one if full.
+
+        Argument:
+            word (str): A surface form
+            stem (str): Its stem
+        '''
+        if self.capacity <= 0:
+            return
+        self.entries[word] = stem
+        self.entries.move_to_end(word)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last = False)
+
+    def update(self, entries) -> None:
+        '''
+        Store several surface forms and their stems.
+
+        Argument:
+            entries (Iterable[Tuple[str, str]]): Pairs of surface form and stem
+        '''
+        for word, stem in entries:
+            self.put(word, stem)
+
+    def save(self, path) -> None:
+        '''
+        Write the cache as a table with one "surface form<TAB>stem" per line.
+
+        Argument:
+            path (str): Path to the stem table
+        '''
+        with open(path, "w", encoding="utf8") as f:
+            for word, stem in self.entries.items():
+                f.write(word + "\t" + stem + "\n")
+
+    def load(self, path) -> None:
+        '''
+        Load a stem table written by save.
+
+        Argument:
+            path (str): Path to the stem table
+        '''
+        with open(path, "r", encoding="utf8") as f:
+            self.update(line.rstrip("\n").split("\t") for line in f)
 
 class Preprocessor:
     '''
@@ -11,10 +128,19 @@ class Preprocessor:
 
     Attributes:
         stemmer (nltk.stem) : Stemmer use for preprocessing.
+        tokenizer (str) : Either 'nltk' for the NLTK sentence and word tokenizers,
+            or 'regex' for the faster single-pass regex tokenizer.
+        stem_cache (StemCache) : Cache of the stems of the surface forms seen so far.
     '''
 
-    def __init__(self) -> None:
+    def __init__(self, tokenizer = None, stem_table = None) -> None:
         self.stemmer = PorterStemmer()
+        self.tokenizer = default_tokenizer if tokenizer is None else tokenizer
+        if self.tokenizer not in ('nltk', 'regex'):
+            raise ValueError('Unknown tokenizer: {}'.format(self.tokenizer))
+        self.stem_cache = StemCache()
+        if stem_table is not None and os.path.exists(stem_table):
+            self.stem_cache.load(stem_table)
 
     def preprocess_word(self, word) -> str:
         '''
@@ -27,30 +153,72 @@ class Preprocessor:
         Return:
             A lower-case word after being stemmed
         '''
-        return self.stemmer.stem(unidecode(word))
+        stem = self.stem_cache.get(word)
+        if stem is None:
+            stem = self.stemmer.stem(unidecode(word))
+            self.stem_cache.put(word, stem)
+        return stem
 
-    def preprocess_file(self, file_path) -> List[str]:
+    def preprocess_pattern(self, pattern) -> str:
         '''
-        Take a file path and return the tokenized words for the document.
+        Take a wildcard pattern and turn it into lower case, without stemming
+        it, since it is matched against the stems in the dictionary.
+
+        Argument:
+            pattern (str): A wildcard pattern, e.g. Comput*
+
+        Return:
+            A lower-case pattern
+        '''
+        return unidecode(pattern).lower()
+
+    def tokenize_file(self, file_path) -> Iterable[str]:
+        '''
+        Take a file path and return the raw tokens of the document,
+        using the selected tokenizer.
 
         Argument:
             file_path (str): Path to file.
 
         Return:
-            list of tokenized lower case words in the file.
+            An iterable of raw tokens in the file.
         '''
+        if self.tokenizer == 'regex':
+            return self._stream_regex_tokens(file_path)
+
         with open(file_path, "r", encoding="utf8") as f:
             file = f.read()
-        # Tokenize sentence
-        sentences = sent_tokenize(file)
+        # Tokenize sentence, then words
+        return [word for sentence in sent_tokenize(file) for word in word_tokenize(sentence)]
+
+    def _stream_regex_tokens(self, file_path) -> Iterable[str]:
+        '''
+        Stream the tokens of a file line by line with the compiled regex.
 
-        # Tokenize, normalize, and store unique words
-        raw_words = set()
-        for sentence in sentences:
-            for word in word_tokenize(sentence):
-                raw_words.add(unidecode(word))
+        Argument:
+            file_path (str): Path to file.
+
+        Return:
+            A generator of raw tokens in the file.
+        '''
+        with open(file_path, "r", encoding="utf8") as f:
+            for line in f:
+                yield from TOKEN_PATTERN.findall(line)
+
+    def preprocess_file(self, file_path) -> List[str]:
+        '''
+        Take a file path and return the tokenized words for the document.
+
+        Argument:
+            file_path (str): Path to file.
+
+        Return:
+            list of tokenized lower case words in the file.
+        '''
+        # Tokenize and store unique words
+        raw_words = set(self.tokenize_file(file_path))
 
-        # Lower case, stemming, and remove non-alphanumeric words
-        processed_words = [self.stemmer.stem(word) for word in raw_words]
+        # Normalize, lower case, stemming, and remove non-alphanumeric words
+        processed_words = [self.preprocess_word(word) for word in raw_words]
 
         return processed_words
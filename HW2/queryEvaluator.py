@@ -1,6 +1,27 @@
-from math import sqrt
-
-from typing import List
+import heapq
+import os
+import sys
+from typing import Iterator, List, Tuple
+import numpy as np
+import yaml
+
+from permuterm import is_wildcard
+from posting_cache import PostingCache
+from posting_set import PostingSet
+from queryIterator import AndIterator, AndNotIterator, ListIterator, OrIterator, PostingIterator, TermIterator
+from queryPlanner import QueryPlanner
+from utils import parse_size
+
+# Obtain the sizes of the posting cache and of the document frequency cache, and the limit of the wildcard expansions
+ROOT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+with open(os.path.join(ROOT_DIRECTORY, "config.yaml"), "r") as config:
+    hyperparameters = yaml.full_load(config)
+default_posting_cache_size = hyperparameters['searching']['posting_cache_size']
+doc_frequency_cache_size = hyperparameters['searching']['doc_frequency_cache_size']
+wildcard_df_cap = hyperparameters['searching']['wildcard_df_cap']
+
+# Rough memory held by a cached document frequency besides its term: the integer, and its entry in the cache
+DOC_FREQUENCY_SIZE = sys.getsizeof(2 ** 20) + sys.getsizeof((0, 0)) + 100
 
 class QueryEvaluator:
     '''
@@ -8,18 +29,29 @@ class QueryEvaluator:
     queries.
 
     Attributes:
-    posting_lists (Dict[str, List[int]]) : A Dict of posting-lists.
-    trie (Trie) : A trie to convert term into id
+    segments (List[Segment]) : The segments of the index, each with its
+        own dictionary of terms and postings file
+    all_documents (List[int]) : The docIDs of all the documents, cached
+        by the first NOT
+    universe (PostingSet) : The posting set of all the documents
+    planner (QueryPlanner) : Turn the parsed queries into query plans
+    cache (PostingCache) : Cache of the posting sets of the terms
+    doc_frequencies (PostingCache) : LRU cache of the document frequencies of the terms and wildcards looked up
     '''
-    def __init__(self, path_to_postings, trie):
+    def __init__(self, segments, cache_size = None):
         '''
         Initialize the posting lists.
 
         Argument:
-        path_to_postings (str): Path to posting lists
+        segments (List[Segment]): The segments of the index
+        cache_size (Union[str, int]): Size of the posting cache, e.g. 64M
         '''
-        self.posting_lists = open(path_to_postings, 'r')
-        self.trie = trie
+        self.segments = segments
+        self.cache = PostingCache(parse_size(default_posting_cache_size if cache_size is None else cache_size))
+        self.doc_frequencies = PostingCache(parse_size(doc_frequency_cache_size))
+        self.all_documents = None
+        self.universe = None
+        self.planner = QueryPlanner(self._get_doc_frequency, self._get_doc_frequency('_ALL_'))
 
     def _exist(self, term) -> bool:
         '''
@@ -31,234 +63,348 @@ class QueryEvaluator:
         Return:
             A boolean specifying whether it exists or not
         '''
-        current = self.trie
-        for letter in term:
-            if letter not in current:
-                return False
-            current = current[letter]
-        return True
+        if is_wildcard(term):
+            return len(self._expand(term)) > 0
+        return any(segment.get(term) is not None for segment in self.segments)
 
-    def _get_posting_list(self, term) -> List[int]:
+    def _expand(self, pattern) -> List[Tuple[object, tuple]]:
         '''
-        Get the posting list of an existing term.
+        Expand a wildcard pattern into the terms of every segment that match it,
+        in sorted order. The expansion stops once the matching terms reach a
+        cumulative document frequency of wildcard_df_cap, to bound the latency.
+
+        Argument:
+            pattern (str): A wildcard pattern, where * matches any sequence of characters
+
+        Return:
+            The (segment, (df, offset, length)) of the matching terms
+        '''
+        def expand_segment(segment):
+            for term, entry in segment.expand(pattern):
+                yield term, id(segment), segment, entry
+
+        expansion = []
+        doc_frequency = 0
+        for _, _, segment, entry in heapq.merge(*map(expand_segment, self.segments), key = lambda match: match[:2]):
+            expansion.append((segment, entry))
+            doc_frequency += entry[0]
+            if doc_frequency >= wildcard_df_cap:
+                break
+        return expansion
+
+    def _get_doc_frequency(self, term) -> int:
+        '''
+        Get the document frequency of a term, summed over the segments, from
+        the document frequency cache if it is there. The document frequency
+        of a wildcard is the sum of those of the terms it expands into.
 
         Argument:
             term (str): A word
 
         Return:
-            A posting list
-        '''
-        current = self.trie
-        for letter in term:
-            if letter not in current:
-                return []
-            current = current[letter]
-        # Not leave
-        if '_end_' not in current:
-            return []
-        position = current['_end_'][1]
-        self.posting_lists.seek(position, 0)
-        lines = self.posting_lists.readline().split('|')
-        relevant_lines = list(map(lambda clause: eval(clause.rstrip()), lines[1:]))
-        return relevant_lines
+            The number of documents that contain the term
+        '''
+        doc_frequency = self.doc_frequencies.get(term)
+        if doc_frequency is None and is_wildcard(term):
+            # Only an upper bound, since a document can contain several of the terms
+            doc_frequency = sum(entry[0] for _, entry in self._expand(term))
+            self.doc_frequencies.put(term, doc_frequency, sys.getsizeof(term) + DOC_FREQUENCY_SIZE)
+        elif doc_frequency is None:
+            doc_frequency = 0
+            for segment in self.segments:
+                entry = segment.get(term)
+                if entry is not None:
+                    doc_frequency += entry[0]
+            self.doc_frequencies.put(term, doc_frequency, sys.getsizeof(term) + DOC_FREQUENCY_SIZE)
+        return doc_frequency
+
+    def _get_posting_list(self, term) -> PostingSet:
+        '''
+        Get the posting set of a term or a wildcard, from the posting cache if it is there.
+
+        Argument:
+            term (str): A word, or a wildcard pattern
 
-    def _is_operator(self, token) -> bool:
+        Return:
+            A posting set, empty if the term does not exist
         '''
-        Take a token and specify whether it is an operator or not.
+        posting_set = self.cache.get(term)
+        if posting_set is None:
+            if is_wildcard(term):
+                posting_set = PostingSet.from_sorted(self._read_wildcard(term))
+            elif not self._exist(term):
+                posting_set = PostingSet()
+            else:
+                posting_set = PostingSet.from_sorted(self._read_posting_list(term))
+            self.cache.put(term, posting_set, posting_set.nbytes)
+        return posting_set
+
+    def _get_universe(self) -> PostingSet:
+        '''
+        Get the posting set of all the documents, which is read once and cached.
+
+        Return:
+            The posting set of _ALL_
+        '''
+        if self.universe is None:
+            self.universe = PostingSet.from_sorted(self._get_all_documents())
+        return self.universe
+
+    def _get_all_documents(self) -> List[int]:
+        '''
+        Get the docIDs of all the documents, which are read once and cached.
+
+        Return:
+            The posting list of _ALL_
+        '''
+        if self.all_documents is None:
+            self.all_documents = self._read_posting_list('_ALL_')
+        return self.all_documents
+
+    def _get_term_iterator(self, term) -> PostingIterator:
+        '''
+        Get an iterator over the compressed posting list of a term, in every segment.
+        A wildcard iterates over the union of the terms it expands into.
 
         Argument:
-        token (str): A token
+            term (str): A word, or a wildcard pattern
 
         Return:
-        A boolean denoting whether the token is an operator or not.
+            An iterator over the docIDs of the term
         '''
-        return token == 'AND' or token == 'OR' or token == 'NOT'
+        if is_wildcard(term):
+            entries = self._expand(term)
+        else:
+            entries = [(segment, segment.get(term)) for segment in self.segments]
+        iterators = []
+        for segment, entry in entries:
+            if entry is not None:
+                iterators.append(TermIterator(segment.read_encoded_posting_list(entry), segment.codec))
+        if len(iterators) == 1:
+            return iterators[0]
+        return OrIterator(iterators)
+
+    def _read_posting_list(self, term) -> List[int]:
+        '''
+        Read the posting list of a term from every segment, and merge them.
+
+        Argument:
+            term (str): A word
 
-    def _create_skip_pointers(self, posting_list) -> List[int]:
+        Return:
+            A list of docIDs
+        '''
+        posting_lists = [segment.get_posting_list(term) for segment in self.segments]
+        if len(posting_lists) == 1:
+            return posting_lists[0]
+        return list(heapq.merge(*posting_lists))
+
+    def _read_wildcard(self, pattern) -> np.ndarray:
         '''
-        Convert the element of the posting list into tuple that has format of
-        (docId, nextValue, nextIndex)
-        
+        Read the posting lists of the terms a wildcard expands into, in the order
+        of their offsets, and unite them all at once instead of one pair at a time.
+
         Argument:
-        posting_list (List[int]): A posting list
+            pattern (str): A wildcard pattern
 
         Return:
-        A posting list with skip pointers
+            The sorted docIDs of the documents that contain any of the terms
         '''
-        skip_jump = int(sqrt(len(posting_list)))
-        length = len(posting_list)
-        new_posting_list = []
+        expansion = sorted(self._expand(pattern), key = lambda match: (id(match[0]), match[1][1]))
+        posting_lists = [np.asarray(segment.read_posting_list(entry), dtype = np.uint32) for segment, entry in expansion]
+        if not posting_lists:
+            return np.zeros(0, dtype = np.uint32)
+        return np.unique(np.concatenate(posting_lists))
 
-        for i in range(length):
-            if i % skip_jump == 0 and i + skip_jump < length:
-                new_posting_list.append((posting_list[i], posting_list[i + skip_jump], i + skip_jump))
-            else:
-                new_posting_list.append((posting_list[i], None, None))
+    def _negate(self, posting_set) -> PostingSet:
+        '''
+        Get the complement of a posting set.
 
-        return new_posting_list
+        Argument:
+        posting_set (PostingSet): Posting set
 
-    def _intersection(self, posting_list1, posting_list2) -> List[int]:
+        Return:
+        The posting set of the documents that are not in the posting_set
         '''
-        Perform intersection of 2 posting lists.
+        return posting_set.complement(self._get_universe())
+
+    def _execute(self, node, shared = None) -> PostingSet:
+        '''
+        Evaluate a node of a query plan. The operands of an AND are intersected
+        from the rarest one, and the evaluation stops as soon as it is empty.
 
         Argument:
-        posting_list1 (List[int]) : Posting list of term 1
-        posting_list2 (List[int]): Posting list of term 2
+            node (PlanNode): A node of the query plan
+            shared (Dict[tuple, PostingSet]): The posting sets of the nodes already
+                evaluated in the batch, by key, or None outside of a batch
 
         Return:
-        A posting-list that consists of the intersection of the two posting lists
-        '''
-        i = j = 0
-        M, N = len(posting_list1), len(posting_list2)
-        
-        final_posting_list = []
-        while i < M and j < N:
-            if posting_list1[i][0] == posting_list2[j][0]:
-                final_posting_list.append(posting_list1[i][0])
-                i += 1
-                j += 1
-            elif posting_list2[j][1] != None and posting_list1[i][0] >= posting_list2[j][1]:
-                j = posting_list2[j][2]
-            elif posting_list1[i][1] != None and posting_list1[i][1] <= posting_list2[j][0]:
-                i = posting_list1[i][2]
-            elif posting_list1[i][0] >= posting_list2[j][0]:
-                j += 1
-            elif posting_list1[i][0] <= posting_list2[j][0]:
-                i += 1
-        return self._create_skip_pointers(final_posting_list)
-
-    def _union(self, posting_list1, posting_list2) -> List[int]:
-        '''
-        Perform union of 2 posting lists.
+            The posting set of the node
+        '''
+        if shared is None:
+            return self._compute(node, shared)
+        key = node.key()
+        result = shared.get(key)
+        if result is None:
+            result = shared[key] = self._compute(node, shared)
+        return result
+
+    def _compute(self, node, shared) -> PostingSet:
+        '''
+        Compute the posting set of a node of a query plan from its children.
 
         Argument:
-        posting_list1 (List[int]) : Posting list of term 1
-        posting_list2 (List[int]): Posting list of term 2
+            node (PlanNode): A node of the query plan
+            shared (Dict[tuple, PostingSet]): The posting sets shared in the batch, or None
 
         Return:
-        A posting-list that consists of the union of the two posting lists
-        '''
-        i = j = 0
-        M, N = len(posting_list1), len(posting_list2)
-        
-        final_posting_list = []
-        while i < M and j < N:
-            if posting_list1[i][0] == posting_list2[j][0]:
-                final_posting_list.append(posting_list1[i][0])
-                i += 1
-                j += 1
-            elif posting_list1[i][0] > posting_list2[j][0]:
-                final_posting_list.append(posting_list2[j][0])
-                j += 1
+            The posting set of the node
+        '''
+        if node.operator == 'TERM':
+            if node.cost == 0:
+                return PostingSet()
+            return self._get_posting_list(node.term)
+        if node.operator == 'NOT':
+            return self._negate(self._execute(node.children[0], shared))
+        if node.operator == 'OR':
+            result = PostingSet()
+            for child in node.children:
+                result = result | self._execute(child, shared)
+            return result
+
+        # AND and ANDNOT
+        result = self._execute(node.children[0], shared)
+        for child in node.children[1:]:
+            if not result:
+                break
+            if node.operator == 'AND':
+                result = result & self._execute(child, shared)
             else:
-                final_posting_list.append(posting_list1[i][0])
-                i += 1
+                result = result - self._execute(child, shared)
+        return result
 
-        # Leftovers
-        while i < M:
-            final_posting_list.append(posting_list1[i][0])
-            i += 1
-        while j < N:
-            final_posting_list.append(posting_list2[j][0])
-            j += 1
-        return self._create_skip_pointers(final_posting_list)
-
-    def _negate(self, posting_list):
+    def _get_iterator(self, node) -> PostingIterator:
         '''
-        Get the complement of a posting list.
+        Build the iterators of a node of a query plan.
 
         Argument:
-        posting_list List[int]: Posting list
+            node (PlanNode): A node of the query plan
 
         Return:
-        A list of integers that is the complement of the posting_list
+            An iterator over the docIDs of the node
+        '''
+        if node.operator == 'TERM':
+            if node.cost == 0:
+                return ListIterator([])
+            return self._get_term_iterator(node.term)
+        if node.operator == 'NOT':
+            return AndNotIterator(ListIterator(self._get_all_documents()), [self._get_iterator(node.children[0])])
+
+        children = [self._get_iterator(child) for child in node.children]
+        if node.operator == 'OR':
+            return OrIterator(children)
+        if node.operator == 'AND':
+            return AndIterator(children)
+        return AndNotIterator(children[0], children[1:])
+
+    def cursor(self, parsed_query) -> Iterator[int]:
         '''
-        avoided_files = set(map(lambda x: x[0], posting_list))
-        all_position = self.trie['_ALL_'][1]
-        self.posting_lists.seek(all_position, 0)
-        lines = self.posting_lists.readline().split('|')
-        relevant_lines = list(map(lambda clause: eval(clause.rstrip()), lines[1:]))
+        Take a parsed queries in the form of postfix notation, plan it,
+        and lazily evaluate it one docID at a time.
 
-        final_posting_list = []
-        for id, _, _ in relevant_lines:
-            if id in avoided_files:
-                continue
-            final_posting_list.append(id)
-        return self._create_skip_pointers(final_posting_list)
+        Argument:
+            parsed_query (List[str]): The parsed query in postfix notations
+
+        Return:
+            A generator of docIDs in increasing order
+        '''
+        plan = self.planner.plan(parsed_query)
+        if plan is None:
+            print('Error in Evaluation {}'.format(parsed_query))
+            return
+        iterator = self._get_iterator(plan)
+        while iterator.doc is not None:
+            yield iterator.doc
+            iterator.next()
 
-    def evaluate(self, parsed_query) -> List[str]:
+    def evaluate(self, parsed_query) -> List[int]:
         '''
-        Take a parsed queries in the form of postfix notation
-        and evaluate it.
+        Take a parsed queries in the form of postfix notation,
+        plan it and evaluate it.
 
         Argument:
             parsed_query (List[str]): The parsed query in postfix notations
 
         Return:
-            A list of string
-        '''
-        stack = []
-        for token in parsed_query:
-            if self._is_operator(token):
-                # NOT operation
-                if token == 'NOT':
-                    term = stack.pop()
-                    if isinstance(term, str):
-                        if not self._exist(term):
-                            term = []
-                        else:
-                            term = self._get_posting_list(term)
-                    new_posting_list = self._negate(term)
-                    stack.append(new_posting_list)
-                    continue
-
-                term1, term2 = stack.pop(), stack.pop()
-                # Both tokens
-                if isinstance(term1, str) and isinstance(term2, str):
-                    if not self._exist(term1):
-                        posting_list1 = []
-                    else:
-                        posting_list1 = self._get_posting_list(term1)
-                    if not self._exist(term2):
-                        posting_list2 = []
-                    else:
-                        posting_list2 = self._get_posting_list(term2)
-                # Both list
-                if isinstance(term1, list) and isinstance(term2, list):
-                    posting_list1, posting_list2 = term1, term2
-
-                # Token - list
-                if isinstance(term1, str) and isinstance(term2, list):
-                    if not self._exist(term1):
-                        posting_list1 = []
-                    else:
-                        posting_list1 = self._get_posting_list(term1)
-                    posting_list2 = term2
-
-                # List - token
-                if isinstance(term1, list) and isinstance(term2, str):
-                    if not self._exist(term2):
-                        posting_list2 = []
-                    else:
-                        posting_list2 = self._get_posting_list(term2)
-                    posting_list1 = term1
-
-                # Merge operation
-                if token == 'AND':
-                    combined_posting_list = self._intersection(posting_list1, posting_list2)
-                else:
-                    combined_posting_list = self._union(posting_list1, posting_list2)
-                stack.append(combined_posting_list)
-            else:
-                stack.append(token)
-        if len(stack) > 1:
+            A list of docIDs
+        '''
+        plan = self.planner.plan(parsed_query)
+        if plan is None:
             print('Error in Evaluation {}'.format(parsed_query))
             return []
+        return self._execute(plan).to_list()
 
-        final_result = []
-        # Query of single word
-        if isinstance(stack[0], str):
-            final_result = self._get_posting_list(stack.pop())
-        else:
-            final_result = stack.pop()
-        return list(map(lambda x: x[0], final_result))
+    def evaluate_batch(self, parsed_queries) -> List[List[int]]:
+        '''
+        Evaluate a batch of parsed queries together. The posting lists of all
+        the terms of the batch are read once, in one sweep of the postings file
+        of each segment, and a subexpression that appears in several queries
+        (e.g. the same a AND b) is only evaluated once.
+
+        Argument:
+            parsed_queries (List[List[str]]): The parsed queries in postfix notations
+
+        Return:
+            A list where the i-th is the list of docIDs of the i-th query
+        '''
+        # Identical queries are only planned once
+        plans_by_query = dict()
+        for parsed_query in parsed_queries:
+            if tuple(parsed_query) not in plans_by_query:
+                plans_by_query[tuple(parsed_query)] = self.planner.plan(parsed_query)
+        plans = [plans_by_query[tuple(parsed_query)] for parsed_query in parsed_queries]
+
+        # Read the posting lists that are not cached yet, in the order of their offsets
+        shared = dict()
+        terms = set()
+        for plan in plans_by_query.values():
+            if plan is not None:
+                terms.update(self.planner.get_terms(plan))
+        for term in terms:
+            # The wildcards read the terms they expand into on their own
+            if is_wildcard(term):
+                shared[('TERM', term)] = self._get_posting_list(term)
+                continue
+            posting_set = self.cache.get(term)
+            if posting_set is not None:
+                shared[('TERM', term)] = posting_set
+        posting_lists = [segment.read_posting_lists(term for term in terms if ('TERM', term) not in shared)
+            for segment in self.segments]
+        for term in terms:
+            if ('TERM', term) not in shared:
+                posting_set = PostingSet.from_sorted(list(heapq.merge(*[lists.get(term, []) for lists in posting_lists])))
+                self.cache.put(term, posting_set, posting_set.nbytes)
+                shared[('TERM', term)] = posting_set
+
+        results = []
+        for parsed_query, plan in zip(parsed_queries, plans):
+            if plan is None:
+                print('Error in Evaluation {}'.format(parsed_query))
+                results.append([])
+            else:
+                results.append(self._execute(plan, shared).to_list())
+        return results
+
+    def warm(self, parsed_queries):
+        '''
+        Load the posting sets of the terms of past queries into the posting
+        cache, then reset its statistics.
+
+        Argument:
+            parsed_queries (List[List[str]]): The parsed queries of a query log
+        '''
+        for parsed_query in parsed_queries:
+            for token in parsed_query:
+                if token not in ('AND', 'OR', 'NOT') and self._exist(token):
+                    self._get_posting_list(token)
+        self.cache.reset_stats()
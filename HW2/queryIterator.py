@@ -0,0 +1,247 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from typing import Optional
+
+class PostingIterator(ABC):
+    '''
+    A cursor over the sorted docIDs matched by a node of a query plan. An
+    iterator starts on its first docID, and only moves forward.
+
+    Attributes:
+    doc (int): The current docID, or None once the iterator is exhausted
+    cost (int): Estimated number of docIDs of the iterator
+    '''
+
+    @abstractmethod
+    def next(self) -> Optional[int]:
+        '''
+        Move to the next docID.
+
+        Return:
+        The new current docID, or None if there is none
+        '''
+
+    @abstractmethod
+    def advance(self, target) -> Optional[int]:
+        '''
+        Move to the first docID that is not smaller than the target. The
+        iterator does not move if it is already there.
+
+        Argument:
+        target (int): A docID
+
+        Return:
+        The new current docID, or None if there is none
+        '''
+
+class ListIterator(PostingIterator):
+    '''
+    Iterator over a sorted list of docIDs held in memory, which advances by galloping.
+
+    Attributes:
+    posting_list (List[int]): A sorted list of docIDs
+    index (int): Position of the current docID
+    '''
+
+    def __init__(self, posting_list):
+        self.posting_list = posting_list
+        self.cost = len(posting_list)
+        self.index = 0
+        self.doc = posting_list[0] if posting_list else None
+
+    def _move(self, index) -> Optional[int]:
+        self.index = index
+        self.doc = self.posting_list[index] if index < len(self.posting_list) else None
+        return self.doc
+
+    def next(self) -> Optional[int]:
+        if self.doc is None:
+            return None
+        return self._move(self.index + 1)
+
+    def advance(self, target) -> Optional[int]:
+        if self.doc is None or self.doc >= target:
+            return self.doc
+        # Gallop with doubling steps to bound the target, then binary search within the bound,
+        # so that short advances stay cheap on long lists
+        posting_list = self.posting_list
+        low, step = self.index, 1
+        high = low + step
+        while high < len(posting_list) and posting_list[high] < target:
+            low = high
+            step <<= 1
+            high = low + step
+        return self._move(bisect_left(posting_list, target, low + 1, min(high, len(posting_list))))
+
+class TermIterator(PostingIterator):
+    '''
+    Iterator that decodes a compressed posting list lazily, and uses its
+    skip entries to jump over the postings that are not needed.
+
+    Attributes:
+    data (Union[bytes, memoryview]): The encoded posting list
+    skip_offsets (List[int]): Byte offset of every skip entry, relative to the gaps
+    skip_doc_ids (List[int]): docID of every skip entry
+    gap_start (int): Position where the gaps start
+    position (int): Position of the gap of the next docID
+    '''
+
+    def __init__(self, data, codec):
+        self.data = data
+        self.cost, skips, self.gap_start = codec.decode_header(data)
+        self.skip_offsets = [offset for offset, _ in skips]
+        self.skip_doc_ids = [doc_id for _, doc_id in skips]
+        self.position = self.gap_start
+        self.doc = 0
+        self.next()
+
+    def next(self) -> Optional[int]:
+        data = self.data
+        position = self.position
+        if position >= len(data):
+            self.doc = None
+            return None
+        number = 0
+        while True:
+            byte = data[position]
+            position += 1
+            if byte < 128:
+                number = (number << 7) | byte
+            else:
+                number = (number << 7) | (byte - 128)
+                break
+        self.position = position
+        self.doc += number
+        return self.doc
+
+    def advance(self, target) -> Optional[int]:
+        if self.doc is None or self.doc >= target:
+            return self.doc
+        # Jump to the last skip entry that does not pass the target, if it is ahead
+        i = bisect_right(self.skip_doc_ids, target) - 1
+        if i >= 0 and self.skip_doc_ids[i] > self.doc:
+            self.doc = self.skip_doc_ids[i]
+            self.position = self.gap_start + self.skip_offsets[i]
+        while self.doc is not None and self.doc < target:
+            self.next()
+        return self.doc
+
+class OrIterator(PostingIterator):
+    '''
+    Iterator over the docIDs that are in any of its children.
+
+    Attributes:
+    children (List[PostingIterator]): The children that are not exhausted yet
+    '''
+
+    def __init__(self, children):
+        self.children = [child for child in children if child.doc is not None]
+        self.cost = sum(child.cost for child in children)
+        self._update()
+
+    def _update(self) -> Optional[int]:
+        self.children = [child for child in self.children if child.doc is not None]
+        self.doc = min((child.doc for child in self.children), default = None)
+        return self.doc
+
+    def next(self) -> Optional[int]:
+        if self.doc is None:
+            return None
+        for child in self.children:
+            if child.doc == self.doc:
+                child.next()
+        return self._update()
+
+    def advance(self, target) -> Optional[int]:
+        if self.doc is None or self.doc >= target:
+            return self.doc
+        for child in self.children:
+            child.advance(target)
+        return self._update()
+
+class AndIterator(PostingIterator):
+    '''
+    Iterator over the docIDs that are in all of its children. The children
+    are advanced to the candidate docID from the rarest one, and any docID
+    they land on becomes the next candidate.
+
+    Attributes:
+    children (List[PostingIterator]): The children, rarest first
+    '''
+
+    def __init__(self, children):
+        self.children = children
+        self.cost = min(child.cost for child in children)
+        self._align(children[0].doc)
+
+    def _align(self, target) -> Optional[int]:
+        '''
+        Move every child to the first docID, from the target, that they all contain.
+
+        Argument:
+        target (int): The first candidate docID, or None
+
+        Return:
+        The new current docID, or None if there is none
+        '''
+        while target is not None:
+            for child in self.children:
+                doc = child.advance(target)
+                if doc != target:
+                    target = doc
+                    break
+            else:
+                break
+        self.doc = target
+        return self.doc
+
+    def next(self) -> Optional[int]:
+        if self.doc is None:
+            return None
+        return self._align(self.children[0].next())
+
+    def advance(self, target) -> Optional[int]:
+        if self.doc is None or self.doc >= target:
+            return self.doc
+        return self._align(self.children[0].advance(target))
+
+class AndNotIterator(PostingIterator):
+    '''
+    Iterator over the docIDs of its first child that are in none of the other children.
+
+    Attributes:
+    positive (PostingIterator): The child whose docIDs are kept
+    negatives (List[PostingIterator]): The children whose docIDs are removed
+    '''
+
+    def __init__(self, positive, negatives):
+        self.positive = positive
+        self.negatives = negatives
+        self.cost = positive.cost
+        self._align()
+
+    def _align(self) -> Optional[int]:
+        '''
+        Move the first child to its first docID, from its current one, that
+        is in none of the other children.
+
+        Return:
+        The new current docID, or None if there is none
+        '''
+        doc = self.positive.doc
+        while doc is not None and any(negative.advance(doc) == doc for negative in self.negatives):
+            doc = self.positive.next()
+        self.doc = doc
+        return self.doc
+
+    def next(self) -> Optional[int]:
+        if self.doc is None:
+            return None
+        self.positive.next()
+        return self._align()
+
+    def advance(self, target) -> Optional[int]:
+        if self.doc is None or self.doc >= target:
+            return self.doc
+        self.positive.advance(target)
+        return self._align()
@@ -1,6 +1,7 @@
 import re
-from typing import Generator, List
+from typing import Generator, List, Optional
 
+from permuterm import is_wildcard
 from preprocessor import Preprocessor
 
 class QueryParser:
@@ -13,13 +14,14 @@ class QueryParser:
     the tokens in the query
     '''
 
-    def __init__(self):
-        self.preprocessor = Preprocessor()
+    def __init__(self, tokenizer = None, stem_table = None):
+        self.preprocessor = Preprocessor(tokenizer, stem_table)
 
     def _tokenize(self, expression) -> Generator[str, None, None]:
         '''
         Take a query string and parsed it into tokens. The main difference
-        with nltk tokenizer is that it treats '(' and ')' as a single token.
+        with nltk tokenizer is that it treats '(' and ')' as a single token,
+        and keeps the * of the wildcard terms.
 
         Argument:
         expression (str): String to be parsed
@@ -27,7 +29,7 @@ class QueryParser:
         Return:
         A generator of tokens
         '''
-        return (re.findall("[()]|[a-zA-Z0-9]+", expression))
+        return (re.findall("[()]|[a-zA-Z0-9*]+", expression))
 
     def _is_operator(self, token) -> bool:
         '''
@@ -41,7 +43,72 @@ class QueryParser:
         '''
         return token == 'AND' or token == 'OR' or token == 'NOT'
 
-    def parse_queries(self, file_path) -> List[List[str]]:
+    def parse_query(self, sentence) -> Optional[List[str]]:
+        '''
+        Parse a query into postfix notation using the shunting yard algorithm.
+
+        Argument:
+        sentence (str): A query
+
+        Return:
+        The parsed query in postfix notation, or None if the query is invalid
+        '''
+        output_stack = []
+        operator_stack = []
+        valid_query = True
+        num_of_unmatched_brackets = 0
+        previous_token = ''
+        for token in self._tokenize(sentence):
+            if self._is_operator(token):
+                # Push the operators in operator stack with higher precedence
+                if token == 'AND':
+                    if self._is_operator(previous_token):
+                        valid_query = False
+                        break
+                    while operator_stack and operator_stack[-1] in {'AND', 'NOT'}:
+                        output_stack.append(operator_stack.pop())
+                elif token == 'OR':
+                    if self._is_operator(previous_token):
+                        valid_query = False
+                        break
+                    while operator_stack and self._is_operator(operator_stack[-1]):
+                        output_stack.append(operator_stack.pop())
+                operator_stack.append(token)
+            elif token == '(':
+                operator_stack.append(token)
+                num_of_unmatched_brackets += 1
+            elif token == ')':
+                # Empty Stack
+                if len(operator_stack) == 0:
+                    valid_query = False
+                    break
+
+                # Find '('
+                current = operator_stack.pop()
+                while current != '(':
+                    output_stack.append(current)
+                    try:
+                        current = operator_stack.pop()
+                    except: # No '(' in operator stack
+                        valid_query = False
+                        break
+                num_of_unmatched_brackets -= 1
+            elif is_wildcard(token):
+                output_stack.append(self.preprocessor.preprocess_pattern(token))
+            else:
+                output_stack.append(self.preprocessor.preprocess_word(token))
+            previous_token = token
+
+        # Invalid Query
+        if not valid_query or num_of_unmatched_brackets > 0:
+            return None
+
+        # Empty operator stack
+        while operator_stack:
+            output_stack.append(operator_stack.pop())
+        return output_stack
+
+    def parse_queries(self, file_path) -> List[Optional[List[str]]]:
         '''
         Take a queries file and answer each of the query.
 
@@ -50,70 +117,18 @@ class QueryParser:
 
         Return:
         A list where the i-th is a list that contains the parsing of
-            the i-th query.
+            the i-th query, or None if it is invalid.
         '''
         with open(file_path, "r", encoding="utf8") as f:
             sentences = f.readlines()
 
         parsed_queries = []
-        output_stack = []
-        operator_stack = []
 
         # Parse each query using shunting yard algorithm
         for sentence in sentences:
-            valid_query = True
-            num_of_unmatched_brackets = 0
-            previous_token = ''
-            for token in self._tokenize(sentence):
-                if self._is_operator(token):
-                    # Push the operators in operator stack with higher precedence
-                    if token == 'AND':
-                        if self._is_operator(previous_token):
-                            valid_query = False
-                            break
-                        while operator_stack and operator_stack[-1] in {'AND', 'NOT'}:
-                            output_stack.append(operator_stack.pop())
-                    elif token == 'OR':
-                        if self._is_operator(previous_token):
-                            valid_query = False
-                            break
-                        while operator_stack and self._is_operator(operator_stack[-1]):
-                            output_stack.append(operator_stack.pop())
-                    operator_stack.append(token)
-                elif token == '(':
-                    operator_stack.append(token)
-                    num_of_unmatched_brackets += 1
-                elif token == ')':
-                    # Empty Stack
-                    if len(operator_stack) == 0:
-                        valid_query = False
-                        break
-
-                    # Find '('
-                    current = operator_stack.pop()
-                    while current != '(':
-                        output_stack.append(current)
-                        try:
-                            current = operator_stack.pop()
-                        except: # No '(' in operator stack
-                            valid_query = False
-                            break
-                    num_of_unmatched_brackets -= 1
-                else:
-                    output_stack.append(self.preprocessor.preprocess_word(token))
-                previous_token = token
-
-            # Invalid Query
-            if not valid_query or num_of_unmatched_brackets > 0:
+            parsed_query = self.parse_query(sentence)
+            if parsed_query is None:
                 print('Invalid query: {}'.format(sentence))
-                output_stack.clear()
-                operator_stack.clear()
-                continue
-
-            # Empty operator stack
-            while operator_stack:
-                output_stack.append(operator_stack.pop())
-            parsed_queries.append(output_stack.copy())
-            output_stack.clear()
+            parsed_queries.append(parsed_query)
 
         return parsed_queries
@@ -0,0 +1,183 @@
+from typing import List, Optional
+
+class PlanNode:
+    '''
+    A node of a query plan.
+
+    Attributes:
+    operator (str): TERM, AND, OR, NOT, or ANDNOT for the documents of the first
+        child that are in none of the other children
+    children (List[PlanNode]): The operands of the node, in evaluation order
+    term (str): The term of a TERM node
+    cost (int): Estimated number of documents in the result of the node
+    '''
+
+    def __init__(self, operator, children = None, term = None, cost = 0):
+        self.operator = operator
+        self.children = children if children is not None else []
+        self.term = term
+        self.cost = cost
+
+    def key(self) -> tuple:
+        '''
+        Get a canonical key of the node, which is the same for equivalent nodes
+        whose AND/OR operands are in a different order.
+
+        Return:
+        A hashable key of the node
+        '''
+        if self.operator == 'TERM':
+            return ('TERM', self.term)
+        keys = [child.key() for child in self.children]
+        if self.operator in ('AND', 'OR'):
+            keys.sort()
+        elif self.operator == 'ANDNOT':
+            keys[1:] = sorted(keys[1:])
+        return (self.operator, tuple(keys))
+
+    def __repr__(self) -> str:
+        if self.operator == 'TERM':
+            return '{}:{}'.format(self.term, self.cost)
+        return '{}({})'.format(self.operator, ', '.join(map(repr, self.children)))
+
+class QueryPlanner:
+    '''
+    Planner class that in charge of turning a parsed query into a query plan,
+    using the document frequencies of the terms to pick the cheapest order.
+
+    Attributes:
+    get_doc_frequency (Callable[[str], int]): Get the document frequency of a term
+    num_of_documents (int): Number of documents in the index
+    '''
+
+    def __init__(self, get_doc_frequency, num_of_documents):
+        self.get_doc_frequency = get_doc_frequency
+        self.num_of_documents = num_of_documents
+
+    def _is_operator(self, token) -> bool:
+        '''
+        Take a token and specify whether it is an operator or not.
+
+        Argument:
+        token (str): A token
+
+        Return:
+        A boolean denoting whether the token is an operator or not.
+        '''
+        return token == 'AND' or token == 'OR' or token == 'NOT'
+
+    def build(self, parsed_query) -> Optional[PlanNode]:
+        '''
+        Build the tree of a parsed query, where chains of the same operator are
+        flattened into a single node with several children.
+
+        Argument:
+        parsed_query (List[str]): The parsed query in postfix notations
+
+        Return:
+        The root of the tree, or None if the query is malformed
+        '''
+        stack = []
+        for token in parsed_query:
+            if not self._is_operator(token):
+                stack.append(PlanNode('TERM', term = token))
+                continue
+            if token == 'NOT':
+                if not stack:
+                    return None
+                stack.append(PlanNode('NOT', [stack.pop()]))
+                continue
+            if len(stack) < 2:
+                return None
+            right, left = stack.pop(), stack.pop()
+            children = []
+            for child in (left, right):
+                children.extend(child.children if child.operator == token else [child])
+            stack.append(PlanNode(token, children))
+        if len(stack) != 1:
+            return None
+        return stack[0]
+
+    def optimize(self, node) -> PlanNode:
+        '''
+        Rewrite a tree into a cheaper equivalent plan and estimate its cost:
+        the operands of an AND are ordered by ascending cost, an AND with NOT
+        operands becomes a set difference, and double negations are removed.
+
+        Argument:
+        node (PlanNode): A node of the tree
+
+        Return:
+        The optimized node
+        '''
+        if node.operator == 'TERM':
+            node.cost = self.get_doc_frequency(node.term)
+            return node
+
+        if node.operator == 'NOT':
+            child = node.children[0]
+            if child.operator == 'NOT':
+                return self.optimize(child.children[0])
+            child = self.optimize(child)
+            return PlanNode('NOT', [child], cost = self.num_of_documents - child.cost)
+
+        children = [self.optimize(child) for child in node.children]
+        if node.operator == 'OR':
+            flattened = []
+            for child in children:
+                flattened.extend(child.children if child.operator == 'OR' else [child])
+            return PlanNode('OR', flattened, cost = min(sum(child.cost for child in flattened), self.num_of_documents))
+
+        # x AND NOT y AND NOT z is the documents of x that are in neither y nor z
+        positives, negatives = [], []
+        for child in children:
+            if child.operator == 'AND':
+                positives.extend(child.children)
+            elif child.operator == 'NOT':
+                negatives.append(child.children[0])
+            else:
+                positives.append(child)
+        if not positives:
+            # NOT y AND NOT z is NOT (y OR z), which only complements once
+            union = []
+            for child in negatives:
+                union.extend(child.children if child.operator == 'OR' else [child])
+            if len(union) > 1:
+                union = [PlanNode('OR', union, cost = min(sum(child.cost for child in union), self.num_of_documents))]
+            return PlanNode('NOT', union, cost = self.num_of_documents - union[0].cost)
+
+        positives.sort(key = lambda child: child.cost)
+        plan = positives[0] if len(positives) == 1 else PlanNode('AND', positives, cost = positives[0].cost)
+        if negatives:
+            negatives.sort(key = lambda child: child.cost, reverse = True)
+            plan = PlanNode('ANDNOT', [plan] + negatives, cost = plan.cost)
+        return plan
+
+    def get_terms(self, node) -> List[str]:
+        '''
+        Get the terms of a query plan that are in the index.
+
+        Argument:
+        node (PlanNode): The root of the query plan
+
+        Return:
+        The terms of the leaves with a non-zero document frequency
+        '''
+        if node.operator == 'TERM':
+            return [node.term] if node.cost > 0 else []
+        return [term for child in node.children for term in self.get_terms(child)]
+
+    def plan(self, parsed_query) -> Optional[PlanNode]:
+        '''
+        Turn a parsed query into an optimized query plan.
+
+        Argument:
+        parsed_query (List[str]): The parsed query in postfix notations
+
+        Return:
+        The root of the query plan, or None if the query is malformed
+        '''
+        tree = self.build(parsed_query)
+        if tree is None:
+            return None
+        return self.optimize(tree)
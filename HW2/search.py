@@ -1,31 +1,103 @@
 #!/usr/bin/python3
 import getopt
-import json
 import sys
+from itertools import islice
+from multiprocessing import Pool
 
 from queryParser import QueryParser
+from preprocessor import stem_table_path
 from queryEvaluator import QueryEvaluator
+from segments import SegmentManager
 
 def usage():
-    print("usage: " + sys.argv[0] + " -d dictionary-file -p postings-file -q file-of-queries -o output-file-of-results")
+    print("usage: " + sys.argv[0] + " -d dictionary-file -p postings-file -q file-of-queries -o output-file-of-results [--limit N] [--offset N] [--warm query-log] [--batch N] [--workers N]")
 
-def run_search(dict_file, postings_file, queries_file, results_file):
+# The evaluator of a worker process, opened once by init_worker
+worker_evaluator = None
+
+def open_evaluator(dict_file, postings_file, warm_queries = None):
+    """
+    open the segments of the index read-only and create an evaluator on them,
+    warming its posting cache with the parsed queries of a query log if given
+    """
+    evaluator = QueryEvaluator(SegmentManager(dict_file, postings_file).open())
+    if warm_queries is not None:
+        evaluator.warm(warm_queries)
+    return evaluator
+
+def evaluate_queries(evaluator, queries, limit = None, offset = 0, batch_size = None):
+    """
+    evaluate the parsed queries in order and return their results.
+    With a limit or an offset, only that page of the results of each query is
+    evaluated, lazily, with a cursor. With a batch size, the queries are evaluated
+    in batches that read each posting list once and share their common subexpressions
+    """
+    results = []
+    stop = None if limit is None else offset + limit
+    if batch_size is not None:
+        for i in range(0, len(queries), batch_size):
+            results.extend(result[offset: stop] for result in evaluator.evaluate_batch(queries[i: i + batch_size]))
+    else:
+        for query in queries:
+            if limit is None and offset == 0:
+                results.append(evaluator.evaluate(query))
+            else:
+                results.append(list(islice(evaluator.cursor(query), offset, stop)))
+    return results
+
+def init_worker(dict_file, postings_file, warm_queries):
+    """
+    open the index in a worker process, once for all the chunks of queries it evaluates
+    """
+    global worker_evaluator
+    worker_evaluator = open_evaluator(dict_file, postings_file, warm_queries)
+
+def evaluate_chunk(queries, limit, offset, batch_size):
+    """
+    evaluate a chunk of queries in a worker process, and return their results
+    with the statistics of the posting cache for this chunk
+    """
+    worker_evaluator.cache.reset_stats()
+    results = evaluate_queries(worker_evaluator, queries, limit, offset, batch_size)
+    return results, worker_evaluator.cache.stats()
+
+def run_search(dict_file, postings_file, queries_file, results_file, limit = None, offset = 0, warm_log = None, batch_size = None, workers = 1):
     """
     using the given dictionary file and postings file,
-    perform searching on the given queries file and output the results to a file
+    perform searching on the given queries file and output the results to a file.
+    With a limit or an offset, only that page of the results of each query is
+    evaluated, lazily, with a cursor. The posting cache can be warmed with the
+    queries of a query log. With a batch size, the queries are evaluated in batches
+    that read each posting list once and share their common subexpressions.
+    With several workers, the queries are split in chunks evaluated by separate
+    processes, each with its own read-only handles on the index
     """
     print('running search on the queries...')
-    # Create Parser and Evaluator
-    parser = QueryParser()
-    with open(dict_file, 'r') as f:
-        trie = json.load(f)
-    evaluator = QueryEvaluator(postings_file, trie)
-
     # Parse queries
-    results = []
-    queries = parser.parse_queries(queries_file)
-    for query in queries:
-        results.append(evaluator.evaluate(query))
+    parser = QueryParser(stem_table = stem_table_path(dict_file))
+    parsed_queries = parser.parse_queries(queries_file)
+    queries = [query for query in parsed_queries if query is not None]
+    warm_queries = [query for query in parser.parse_queries(warm_log) if query is not None] if warm_log is not None else None
+
+    if workers > 1:
+        # A few contiguous chunks per worker balance the load, and the results
+        # of the chunks come back in the order of the queries
+        chunk_size = max(-(-len(queries) // (workers * 4)), 1)
+        chunks = [(queries[i: i + chunk_size], limit, offset, batch_size) for i in range(0, len(queries), chunk_size)]
+        with Pool(workers, initializer = init_worker, initargs = (dict_file, postings_file, warm_queries)) as pool:
+            chunk_results = pool.starmap(evaluate_chunk, chunks, chunksize = 1)
+        results = [result for chunk, _ in chunk_results for result in chunk]
+        stats = {key: sum(chunk_stats[key] for _, chunk_stats in chunk_results) for key in ('hits', 'misses', 'evictions')}
+    else:
+        evaluator = open_evaluator(dict_file, postings_file, warm_queries)
+        results = evaluate_queries(evaluator, queries, limit, offset, batch_size)
+        stats = evaluator.cache.stats()
+
+    print('posting cache: {}'.format(stats))
+
+    # An invalid query gets an empty line, as in the query server, so the results stay in line with the queries
+    results = iter(results)
+    results = [[] if query is None else next(results) for query in parsed_queries]
 
     # Save result
     with open(results_file, 'w') as f:
@@ -35,28 +107,45 @@ def run_search(dict_file, postings_file, queries_file, results_file):
             else:
                 f.write(" ".join(map(str, result)) + "\n")
 
-dictionary_file = postings_file = file_of_queries = output_file_of_results = None
-
-try:
-    opts, args = getopt.getopt(sys.argv[1:], 'd:p:q:o:')
-except getopt.GetoptError:
-    usage()
-    sys.exit(2)
-
-for o, a in opts:
-    if o == '-d':
-        dictionary_file  = a
-    elif o == '-p':
-        postings_file = a
-    elif o == '-q':
-        file_of_queries = a
-    elif o == '-o':
-        file_of_output = a
-    else:
-        assert False, "unhandled option"
+if __name__ == '__main__':
+    dictionary_file = postings_file = file_of_queries = output_file_of_results = None
+    limit = warm_log = batch_size = None
+    offset = 0
+    workers = 1
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'd:p:q:o:', ['limit=', 'offset=', 'warm=', 'batch=', 'workers='])
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for o, a in opts:
+        if o == '-d':
+            dictionary_file  = a
+        elif o == '-p':
+            postings_file = a
+        elif o == '-q':
+            file_of_queries = a
+        elif o == '-o':
+            file_of_output = a
+        elif o == '--limit': # maximum number of results per query
+            limit = int(a)
+        elif o == '--offset': # number of results to skip per query
+            offset = int(a)
+        elif o == '--warm': # query log to warm the posting cache with
+            warm_log = a
+        elif o == '--batch': # number of queries evaluated together
+            batch_size = int(a)
+            if batch_size <= 0:
+                usage()
+                sys.exit(2)
+        elif o == '--workers': # number of processes evaluating the queries
+            workers = int(a)
+        else:
+            assert False, "unhandled option"
 
-if dictionary_file == None or postings_file == None or file_of_queries == None or file_of_output == None :
-    usage()
-    sys.exit(2)
+    if dictionary_file == None or postings_file == None or file_of_queries == None or file_of_output == None :
+        usage()
+        sys.exit(2)
 
-run_search(dictionary_file, postings_file, file_of_queries, file_of_output)
+    run_search(dictionary_file, postings_file, file_of_queries, file_of_output, limit, offset, warm_log, batch_size, workers)
@@ -0,0 +1,434 @@
+from contextlib import contextmanager
+from typing import Dict, Generator, List, Optional, Tuple
+import heapq
+import json
+import os
+import time
+
+from codec import PostingsCodec
+from permuterm import PermutermIndex, permuterm_path, write_permuterm_index
+from posting_reader import PostingReader
+from term_table import TermTable, TermTableWriter
+
+def _try_lock(fd) -> bool:
+    '''
+    Try to take an exclusive lock on an open file, without waiting.
+
+    Argument:
+    fd (int): The file descriptor of the lock file
+
+    Return:
+    A boolean specifying whether the lock was taken
+    '''
+    try:
+        if os.name == 'nt':
+            import msvcrt
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+def _unlock(fd):
+    '''
+    Release the lock taken on an open file with _try_lock.
+
+    Argument:
+    fd (int): The file descriptor of the lock file
+    '''
+    if os.name == 'nt':
+        import msvcrt
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+def _is_open_file(fd, path) -> bool:
+    '''
+    Check whether a path still points to an open file.
+
+    Argument:
+    fd (int): The file descriptor of the open file
+    path (str): The path it was opened from
+
+    Return:
+    A boolean specifying whether the file at the path is the open file
+    '''
+    try:
+        return os.stat(path).st_ino == os.fstat(fd).st_ino
+    except FileNotFoundError:
+        return False
+
+class Segment:
+    '''
+    A read-only segment of the index, made of a dictionary of terms and
+    the postings file it points to.
+
+    Attributes:
+    dictionary (TermTable): The dictionary of terms of the segment
+    posting_lists (PostingReader): The postings file of the segment, read by offset and length
+    codec (PostingsCodec): Used to decode the posting lists
+    permuterm (PermutermIndex): Expand the wildcard terms of the segment
+    '''
+
+    def __init__(self, dictionary_file, postings_file):
+        self.dictionary = TermTable(dictionary_file)
+        self.permuterm = PermutermIndex(self.dictionary, permuterm_path(dictionary_file))
+        self.posting_lists = PostingReader(postings_file)
+        self.codec = PostingsCodec()
+
+    def get(self, term) -> Optional[tuple]:
+        '''
+        Get the dictionary entry of a term.
+
+        Argument:
+        term (str): A word
+
+        Return:
+        The (df, offset, length) of the term, or None if the segment does not have it
+        '''
+        return self.dictionary.get(term)
+
+    def expand(self, pattern) -> Generator[Tuple[str, tuple], None, None]:
+        '''
+        Iterate through the terms of the segment that match a wildcard pattern.
+
+        Argument:
+        pattern (str): A wildcard pattern, where * matches any sequence of characters
+
+        Return:
+        A generator of (term, (df, offset, length)) in sorted order
+        '''
+        for term, entry in self.permuterm.expand(pattern):
+            if term != '_ALL_':
+                yield term, entry
+
+    def read_encoded_posting_list(self, entry) -> memoryview:
+        '''
+        Read a compressed posting list from the postings file, without decoding it.
+        It does not move any file position, so segments can be read by several threads.
+
+        Argument:
+        entry (tuple): The (df, offset, length) of a term
+
+        Return:
+        The encoded posting list, with its skip entries
+        '''
+        _, position, length = entry
+        return self.posting_lists.read(position, length)
+
+    def read_posting_list(self, entry) -> List[int]:
+        '''
+        Read and decode a compressed posting list from the postings file.
+
+        Argument:
+        entry (tuple): The (df, offset, length) of a term
+
+        Return:
+        A list of docIDs
+        '''
+        return self.codec.decode(self.read_encoded_posting_list(entry))
+
+    def read_posting_lists(self, terms) -> Dict[str, List[int]]:
+        '''
+        Read and decode the posting lists of several terms in one sweep of the
+        postings file, in the order of their offsets.
+
+        Argument:
+        terms (Iterable[str]): The terms to read
+
+        Return:
+        A dictionary that maps each term of the segment to its list of docIDs
+        '''
+        entries = []
+        for term in terms:
+            entry = self.get(term)
+            if entry is not None:
+                entries.append((entry[1], term, entry))
+        entries.sort()
+        return {term: self.read_posting_list(entry) for _, term, entry in entries}
+
+    def get_posting_list(self, term) -> List[int]:
+        '''
+        Get the posting list of a term.
+
+        Argument:
+        term (str): A word
+
+        Return:
+        A list of docIDs, empty if the segment does not have the term
+        '''
+        entry = self.get(term)
+        if entry is None:
+            return []
+        return self.read_posting_list(entry)
+
+    def close(self):
+        self.permuterm.close()
+        self.dictionary.close()
+        self.posting_lists.close()
+
+class SegmentManager:
+    '''
+    Keep track of the segments of an index, in a manifest saved next to the
+    dictionary file. Without a manifest, the index is the single segment stored
+    in the given dictionary and postings files. Every appended or merged segment
+    is stored next to them, with a numbered suffix.
+
+    Attributes:
+    dictionary_file (str): Path to the dictionary file of the index
+    postings_file (str): Path to the postings file of the index
+    manifest_file (str): Path to the manifest
+    segments (List[Tuple[str, str]]): The (dictionary file, postings file) of every segment, oldest first
+    next_id (int): Suffix of the next segment
+    '''
+
+    def __init__(self, dictionary_file, postings_file):
+        self.dictionary_file = os.path.abspath(dictionary_file)
+        self.postings_file = os.path.abspath(postings_file)
+        self.manifest_file = self.dictionary_file + '.segments'
+        self._load()
+
+    def _load(self):
+        '''
+        Load the list of segments from the manifest.
+        '''
+        self.segments = [(self.dictionary_file, self.postings_file)]
+        self.next_id = 1
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, 'r') as f:
+                manifest = json.load(f)
+            # The files are stored relative to the manifest, so that the index can be moved
+            directory = os.path.dirname(self.manifest_file)
+            self.segments = [tuple(os.path.join(directory, path) for path in segment) for segment in manifest['segments']]
+            self.next_id = manifest['next_id']
+
+    def _save(self):
+        '''
+        Atomically replace the manifest with the current list of segments.
+        '''
+        directory = os.path.dirname(self.manifest_file)
+        segments = [[os.path.relpath(path, directory) for path in segment] for segment in self.segments]
+        temp_file = self.manifest_file + '.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump({'segments': segments, 'next_id': self.next_id}, f)
+        os.replace(temp_file, self.manifest_file)
+
+    @contextmanager
+    def _lock(self, name = 'lock', wait = True) -> Generator[bool, None, None]:
+        '''
+        Hold an advisory lock on a file next to the manifest, which is removed
+        once it is released. The operating system releases the lock when the
+        process that holds it dies, so a crashed indexer does not leave the
+        index locked.
+
+        Argument:
+        name (str): Suffix of the lock file
+        wait (bool): Whether to wait for the lock, or give up if it is taken
+
+        Return:
+        A context where the lock is held, yielding whether it was acquired
+        '''
+        lock_file = self.manifest_file + '.' + name
+        while True:
+            fd = os.open(lock_file, os.O_RDWR | os.O_CREAT)
+            if not _try_lock(fd):
+                os.close(fd)
+                if not wait:
+                    yield False
+                    return
+                time.sleep(0.1)
+                continue
+            if _is_open_file(fd, lock_file):
+                break
+            # The holder removed the file before releasing it, so lock the new one instead
+            _unlock(fd)
+            os.close(fd)
+        try:
+            yield True
+        finally:
+            if os.name == 'nt':
+                # An open file can not be removed, so it is only removed if no other process waits on it
+                _unlock(fd)
+                os.close(fd)
+                try:
+                    os.remove(lock_file)
+                except OSError:
+                    pass
+            else:
+                # Removed before being released, so that a process waiting on it locks a new file
+                os.remove(lock_file)
+                _unlock(fd)
+                os.close(fd)
+
+    def __len__(self) -> int:
+        return len(self.segments)
+
+    def exists(self) -> bool:
+        '''
+        Check whether there is already an index.
+
+        Return:
+        A boolean specifying whether every segment of the index exists
+        '''
+        return all(os.path.exists(dictionary_file) for dictionary_file, _ in self.segments)
+
+    def open(self) -> List[Segment]:
+        '''
+        Open every segment of the index for searching.
+
+        Return:
+        A list of segments, oldest first
+        '''
+        return [Segment(dictionary_file, postings_file) for dictionary_file, postings_file in self.segments]
+
+    def get_indexed_documents(self) -> List[int]:
+        '''
+        Get the docIDs of every document in the index.
+
+        Return:
+        A list of docIDs
+        '''
+        doc_ids = []
+        for segment in self.open():
+            doc_ids.extend(segment.get_posting_list('_ALL_'))
+            segment.close()
+        return doc_ids
+
+    def new_segment_files(self) -> Tuple[str, str]:
+        '''
+        Allocate the dictionary and postings files of a new segment.
+
+        Return:
+        The (dictionary file, postings file) of the new segment
+        '''
+        with self._lock():
+            self._load()
+            segment_id = self.next_id
+            self.next_id += 1
+            self._save()
+        suffix = '.{}'.format(segment_id)
+        return self.dictionary_file + suffix, self.postings_file + suffix
+
+    def reset(self):
+        '''
+        Delete every appended segment and the manifest, so that the index can
+        be rebuilt from scratch in the given dictionary and postings files.
+        '''
+        with self._lock():
+            self._load()
+            for segment in self.segments:
+                if segment != (self.dictionary_file, self.postings_file):
+                    self._delete_segment(segment)
+            if os.path.exists(self.manifest_file):
+                os.remove(self.manifest_file)
+            self._load()
+
+    def add(self, dictionary_file, postings_file):
+        '''
+        Add a newly written segment to the index.
+
+        Argument:
+        dictionary_file (str): Dictionary file of the segment
+        postings_file (str): Postings file of the segment
+        '''
+        with self._lock():
+            self._load()
+            self.segments.append((dictionary_file, postings_file))
+            self._save()
+
+    def _delete_segment(self, segment):
+        '''
+        Delete the files of a segment.
+
+        Argument:
+        segment (Tuple[str, str]): The (dictionary file, postings file) of the segment
+        '''
+        for path in (*segment, permuterm_path(segment[0])):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def merge(self) -> bool:
+        '''
+        Merge all the current segments into a single one. Searches that
+        already opened the old segments can keep using them, and segments
+        appended during the merge are kept. The merged segment has a numbered
+        suffix like the others, so the index is then only found through the
+        manifest.
+
+        Return:
+        A boolean specifying whether the merge ran, since only one merge runs at a time
+        '''
+        with self._lock('merging', wait = False) as acquired:
+            if not acquired:
+                return False
+
+            with self._lock():
+                self._load()
+                merged_segments = list(self.segments)
+            if len(merged_segments) < 2:
+                return True
+            dictionary_file, postings_file = self.new_segment_files()
+            self._merge_segments(merged_segments, dictionary_file, postings_file)
+
+            # Replace the merged segments by the new one
+            with self._lock():
+                self._load()
+                self.segments = [(dictionary_file, postings_file)] + \
+                    [segment for segment in self.segments if segment not in merged_segments]
+                self._save()
+            for segment in merged_segments:
+                self._delete_segment(segment)
+            return True
+
+    def _merge_segments(self, merged_segments, dictionary_file, postings_file):
+        '''
+        Do a k-way merge on the sorted dictionaries of the segments, and write
+        the merged posting lists into a new segment.
+
+        Argument:
+        merged_segments (List[Tuple[str, str]]): The segments to merge
+        dictionary_file (str): Dictionary file of the new segment
+        postings_file (str): Postings file of the new segment
+        '''
+        segments = [Segment(*segment) for segment in merged_segments]
+        codec = PostingsCodec()
+        payload_format = segments[0].dictionary.payload.format
+
+        # Every segment iterates through its terms in sorted order
+        iterators = [segment.dictionary.items() for segment in segments]
+        heap = []
+        for i, iterator in enumerate(iterators):
+            for term, entry in iterator:
+                heap.append((term, i, entry))
+                break
+        heapq.heapify(heap)
+
+        terms = []
+        with open(postings_file, 'wb') as posting_file, \
+            TermTableWriter(dictionary_file, payload_format) as term_table:
+            while heap:
+                term = heap[0][0]
+                posting_lists = []
+                while heap and heap[0][0] == term:
+                    _, i, entry = heapq.heappop(heap)
+                    posting_lists.append(segments[i].read_posting_list(entry))
+                    for next_term, next_entry in iterators[i]:
+                        heapq.heappush(heap, (next_term, i, next_entry))
+                        break
+
+                posting_list = list(heapq.merge(*posting_lists))
+                offset = posting_file.tell()
+                encoded = codec.encode(posting_list)
+                posting_file.write(encoded)
+                term_table.add(term, len(posting_list), offset, len(encoded))
+                if term != '_ALL_':
+                    terms.append(term)
+
+        write_permuterm_index(terms, permuterm_path(dictionary_file))
+
+        for segment in segments:
+            segment.close()
@@ -0,0 +1,79 @@
+from array import array
+from typing import List
+import sys
+
+# Rough memory held by every distinct term, on top of the term itself: its entry
+# in the dictionary (about 100 bytes with the pointer to its buffer) and its posting buffer
+TERM_OVERHEAD = 100 + sys.getsizeof(array('I'))
+
+class SPIMI:
+    '''
+    A class that implements Single-Pass In-Memory Indexing. The docIDs are
+    appended directly into a growable posting buffer per term, without any
+    termID or term-docID pairs, and the buffers are written as a term-sorted
+    run once they reach the memory budget.
+
+    Attributes:
+    memory_budget (int): Memory in bytes that the posting buffers can take before being written as a run
+    postings (Dict[str, array]): Map a term to the sorted docIDs of the block that contain it
+    size (int): Estimated memory in bytes taken by the terms and their posting buffers
+    '''
+
+    def __init__(self, memory_budget):
+        self.memory_budget = memory_budget
+        self.postings = dict()
+        self.size = 0
+
+    def add_document(self, terms, doc_id):
+        '''
+        Add the terms of a document into the posting buffers. The documents
+        must be added in increasing order of docID, so that a duplicate is
+        always the last docID of the buffer of its term.
+
+        Argument:
+        terms (List[str]): The terms of the document
+        doc_id (int): The docID of the document
+        '''
+        postings = self.postings
+        for term in terms:
+            buffer = postings.get(term)
+            if buffer is None:
+                postings[term] = array('I', (doc_id,))
+                self.size += sys.getsizeof(term) + TERM_OVERHEAD
+            elif buffer[-1] != doc_id:
+                buffer.append(doc_id)
+                self.size += buffer.itemsize
+
+    def is_full(self) -> bool:
+        '''
+        Check whether the posting buffers reached the memory budget.
+
+        Return:
+        A boolean specifying whether the block should be written as a run
+        '''
+        return self.size >= self.memory_budget
+
+    def write_run(self, target_name) -> List[str]:
+        '''
+        Write the posting buffers to the disk as a run sorted by term, then
+        empty them. Each line of the run is keyed on the position of its term
+        in the sorted terms of the run, so that the run can be merged with the
+        others once their terms are reconciled.
+
+        Argument:
+        target_name (str): Path to the run
+
+        Return:
+        The sorted terms of the run
+        '''
+        terms = sorted(self.postings)
+        with open(target_name, 'w') as run_file:
+            for local_id, term in enumerate(terms, 1):
+                run_file.write(str(local_id))
+                for posting in self.postings[term]:
+                    run_file.write("|" + str(posting))
+                run_file.write("\n")
+
+        self.postings = dict()
+        self.size = 0
+        return terms
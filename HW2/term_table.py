@@ -0,0 +1,276 @@
+import mmap
+import struct
+from typing import Generator, Optional, Tuple
+
+# magic, number of terms, terms per block, offset of the block index, length of the payload format
+HEADER = struct.Struct('<4sIIQB')
+MAGIC = b'FCTT'
+BLOCK_OFFSET = struct.Struct('<Q')
+
+def _encode_number(number) -> bytes:
+    '''
+    Encode a non-negative integer with variable-byte encoding, where the
+    last byte of the number has its high bit set.
+
+    Argument:
+        number (int): A non-negative integer
+
+    Return:
+        The encoded bytes
+    '''
+    encoded = bytearray([(number & 127) | 128])
+    number >>= 7
+    while number:
+        encoded.insert(0, number & 127)
+        number >>= 7
+    return bytes(encoded)
+
+def _decode_number(data, position) -> Tuple[int, int]:
+    '''
+    Decode a variable-byte encoded integer.
+
+    Argument:
+        data (bytes): The encoded bytes
+        position (int): Where the number starts
+
+    Return:
+        The number and the position right after it
+    '''
+    number = 0
+    while True:
+        byte = data[position]
+        position += 1
+        if byte < 128:
+            number = (number << 7) | byte
+        else:
+            return (number << 7) | (byte - 128), position
+
+class TermTableWriter:
+    '''
+    Writer of a sorted, block front-coded term dictionary.
+
+    The terms must be added in sorted order. Inside a block, each term is stored
+    as the length of the prefix it shares with the previous term, followed by the
+    rest of the term and its payload. The first term of a block is stored in full,
+    so that a block can be decoded on its own. The offsets of the blocks are
+    stored at the end of the file, to binary search on the first term of each block.
+
+    Attributes:
+        file (file): The dictionary file
+        payload (struct.Struct): Fixed-size format of the payload of every term
+        block_size (int): Number of terms in a block
+        block_offsets (List[int]): Byte offset of every block
+        num_of_terms (int): Number of terms added so far
+        previous_term (bytes): Last term that was added
+    '''
+
+    def __init__(self, path, payload_format, block_size = 16):
+        self.file = open(path, 'wb')
+        self.payload = struct.Struct(payload_format)
+        self.block_size = block_size
+        self.block_offsets = []
+        self.num_of_terms = 0
+        self.previous_term = None
+
+        # The header is rewritten once the position of the block index is known
+        self.file.write(HEADER.pack(MAGIC, 0, block_size, 0, len(payload_format)))
+        self.file.write(payload_format.encode('ascii'))
+
+    def add(self, term, *payload):
+        '''
+        Add a term and its payload into the dictionary.
+
+        Argument:
+            term (str): A term, greater than every term added before it
+            payload: Values of the payload, following the payload format
+        '''
+        key = term.encode('utf8')
+        if self.previous_term is not None and key <= self.previous_term:
+            raise ValueError('Terms must be added in sorted order: {}'.format(term))
+
+        prefix_length = 0
+        if self.num_of_terms % self.block_size == 0:
+            self.block_offsets.append(self.file.tell())
+        else:
+            limit = min(len(key), len(self.previous_term))
+            while prefix_length < limit and key[prefix_length] == self.previous_term[prefix_length]:
+                prefix_length += 1
+
+        suffix = key[prefix_length:]
+        self.file.write(_encode_number(prefix_length) + _encode_number(len(suffix)) + suffix)
+        self.file.write(self.payload.pack(*payload))
+        self.previous_term = key
+        self.num_of_terms += 1
+
+    def close(self):
+        '''
+        Write the block index and the header, then close the file.
+        '''
+        index_offset = self.file.tell()
+        for offset in self.block_offsets:
+            self.file.write(BLOCK_OFFSET.pack(offset))
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, self.num_of_terms, self.block_size, index_offset, len(self.payload.format)))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class TermTable:
+    '''
+    Read-only view of a dictionary written by TermTableWriter. The file is
+    memory-mapped, so opening it takes constant time, and only the pages of
+    the blocks that are looked up are read.
+
+    Attributes:
+        data (mmap.mmap): The memory-mapped dictionary file
+        payload (struct.Struct): Fixed-size format of the payload of every term
+        num_of_terms (int): Number of terms in the dictionary
+        block_size (int): Number of terms in a block
+        num_of_blocks (int): Number of blocks
+        index_offset (int): Byte offset of the block index
+    '''
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        magic, self.num_of_terms, self.block_size, self.index_offset, format_length = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError('{} is not a term table'.format(path))
+        self.payload = struct.Struct(self.data[HEADER.size: HEADER.size + format_length].decode('ascii'))
+        self.num_of_blocks = (self.num_of_terms + self.block_size - 1) // self.block_size
+
+    def _block_offset(self, block) -> int:
+        '''
+        Get the byte offset of a block.
+
+        Argument:
+            block (int): Index of the block
+
+        Return:
+            The byte offset of the block
+        '''
+        return BLOCK_OFFSET.unpack_from(self.data, self.index_offset + block * BLOCK_OFFSET.size)[0]
+
+    def _first_term(self, block) -> bytes:
+        '''
+        Get the first term of a block, which is stored in full.
+
+        Argument:
+            block (int): Index of the block
+
+        Return:
+            The first term of the block
+        '''
+        _, position = _decode_number(self.data, self._block_offset(block))
+        length, position = _decode_number(self.data, position)
+        return self.data[position: position + length]
+
+    def _find_block(self, key) -> int:
+        '''
+        Binary search for the last block whose first term is not greater than the key.
+
+        Argument:
+            key (bytes): An encoded term
+
+        Return:
+            Index of the block, or -1 if the key is smaller than every term
+        '''
+        low, high = 0, self.num_of_blocks - 1
+        result = -1
+        while low <= high:
+            middle = (low + high) // 2
+            if self._first_term(middle) <= key:
+                result = middle
+                low = middle + 1
+            else:
+                high = middle - 1
+        return result
+
+    def _iterate_from(self, block) -> Generator[Tuple[bytes, tuple], None, None]:
+        '''
+        Decode the terms and their payloads, starting from the beginning of a block.
+
+        Argument:
+            block (int): Index of the block
+
+        Return:
+            A generator of (encoded term, payload) in sorted order
+        '''
+        data = self.data
+        payload = self.payload
+        position = self._block_offset(block)
+        term = b''
+        for _ in range(block * self.block_size, self.num_of_terms):
+            prefix_length, position = _decode_number(data, position)
+            suffix_length, position = _decode_number(data, position)
+            term = term[:prefix_length] + data[position: position + suffix_length]
+            position += suffix_length
+            values = payload.unpack_from(data, position)
+            position += payload.size
+            yield term, values
+
+    def get(self, term) -> Optional[tuple]:
+        '''
+        Get the payload of a term.
+
+        Argument:
+            term (str): A term
+
+        Return:
+            The payload of the term, or None if it is not in the dictionary
+        '''
+        key = term.encode('utf8')
+        block = self._find_block(key)
+        if block < 0:
+            return None
+        for i, (current, values) in enumerate(self._iterate_from(block)):
+            if current == key:
+                return values
+            if current > key or i + 1 == self.block_size:
+                return None
+        return None
+
+    def __contains__(self, term) -> bool:
+        return self.get(term) is not None
+
+    def __len__(self) -> int:
+        return self.num_of_terms
+
+    def items(self) -> Generator[Tuple[str, tuple], None, None]:
+        '''
+        Iterate through all the terms in sorted order.
+
+        Return:
+            A generator of (term, payload)
+        '''
+        if self.num_of_blocks == 0:
+            return
+        for term, values in self._iterate_from(0):
+            yield term.decode('utf8'), values
+
+    def prefix_items(self, prefix) -> Generator[Tuple[str, tuple], None, None]:
+        '''
+        Iterate through the terms that start with a prefix, in sorted order.
+        They are contiguous in the dictionary, so only their blocks are decoded.
+
+        Argument:
+            prefix (str): The prefix of the terms
+
+        Return:
+            A generator of (term, payload)
+        '''
+        if self.num_of_blocks == 0:
+            return
+        key = prefix.encode('utf8')
+        for term, values in self._iterate_from(max(self._find_block(key), 0)):
+            if term.startswith(key):
+                yield term.decode('utf8'), values
+            elif term > key:
+                return
+
+    def close(self):
+        self.data.close()
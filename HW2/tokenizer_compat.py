@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+import getopt
+import os
+import sys
+import time
+from collections import Counter
+
+from preprocessor import Preprocessor
+
+def usage():
+    print("usage: " + sys.argv[0] + " -i directory-of-documents [-t minimum-overlap]")
+
+def compare_tokenizers(in_dir, minimum_overlap):
+    """
+    preprocess every document with both the NLTK and the regex tokenizers,
+    then report how far the terms of the regex tokenizer diverge from the NLTK ones.
+    Return whether the average overlap per document reaches the minimum overlap
+    """
+    nltk_preprocessor = Preprocessor('nltk')
+    regex_preprocessor = Preprocessor('regex')
+
+    filenames = sorted(os.listdir(in_dir), key = lambda filename: int(filename))
+    nltk_time = regex_time = 0
+    num_of_identical_documents = 0
+    total_overlap = 0
+    nltk_vocabulary, regex_vocabulary = set(), set()
+    missing_terms, extra_terms = Counter(), Counter()
+
+    for filename in filenames:
+        file_path = os.path.join(in_dir, filename)
+
+        start = time.perf_counter()
+        nltk_terms = Counter(nltk_preprocessor.preprocess_file(file_path))
+        nltk_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        regex_terms = Counter(regex_preprocessor.preprocess_file(file_path))
+        regex_time += time.perf_counter() - start
+
+        # Overlap of the two bags of terms (weighted Jaccard)
+        union = sum((nltk_terms | regex_terms).values())
+        total_overlap += sum((nltk_terms & regex_terms).values()) / union if union else 1
+        if nltk_terms == regex_terms:
+            num_of_identical_documents += 1
+
+        nltk_vocabulary.update(nltk_terms)
+        regex_vocabulary.update(regex_terms)
+        missing_terms.update(nltk_terms - regex_terms)
+        extra_terms.update(regex_terms - nltk_terms)
+
+    num_of_documents = max(len(filenames), 1)
+    average_overlap = total_overlap / num_of_documents
+    vocabulary_union = len(nltk_vocabulary | regex_vocabulary)
+    vocabulary_overlap = len(nltk_vocabulary & regex_vocabulary) / vocabulary_union if vocabulary_union else 1
+
+    print('documents: {}'.format(len(filenames)))
+    print('identical documents: {:.2%}'.format(num_of_identical_documents / num_of_documents))
+    print('average overlap per document: {:.4f}'.format(average_overlap))
+    print('vocabulary: nltk {}, regex {}, overlap {:.4f}'.format(len(nltk_vocabulary), len(regex_vocabulary), vocabulary_overlap))
+    print('time: nltk {:.2f}s, regex {:.2f}s, speedup {:.1f}x'.format(nltk_time, regex_time, nltk_time / max(regex_time, 1e-9)))
+    print('most missing terms: {}'.format(missing_terms.most_common(10)))
+    print('most extra terms: {}'.format(extra_terms.most_common(10)))
+
+    return average_overlap >= minimum_overlap
+
+if __name__ == '__main__':
+    input_directory = None
+    minimum_overlap = 0.95
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'i:t:')
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for o, a in opts:
+        if o == '-i': # input directory
+            input_directory = a
+        elif o == '-t': # minimum average overlap for the check to pass
+            minimum_overlap = float(a)
+        else:
+            assert False, "unhandled option"
+
+    if input_directory == None:
+        usage()
+        sys.exit(2)
+
+    if not compare_tokenizers(input_directory, minimum_overlap):
+        sys.exit(1)
@@ -0,0 +1,124 @@
+#!/usr/bin/python3
+import getopt
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from block_max import block_max_path
+from index import create_postings, write_index
+from permuterm import permuterm_path
+from preprocessor import stem_table_path
+from queryEvaluator import QueryEvaluator
+from queryParser import QueryParser
+from term_table import TermTable
+
+# The postings formats that are compared, as (name, postings format, number of bits of the impacts)
+FORMATS = [('text', 'text', None), ('binary 16-bit', 'binary', 16), ('binary 8-bit', 'binary', 8)]
+
+def usage():
+    print("usage: " + sys.argv[0] + " -i directory-of-documents -q file-of-queries [-e expected-output-file] [-r repetitions]")
+
+def measure_decoding(evaluator, dictionary, repetitions):
+    """
+    decode every posting list of an index, and return the number of postings
+    decoded per second
+    """
+    entries = [(term, entry) for term, entry in dictionary.items() if term != "_LENGTH_" and entry[2] > 0]
+    num_of_postings = sum(entry[0] for _, entry in entries)
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        for term, entry in entries:
+            evaluator._read_posting_list(term, entry)
+    return num_of_postings * repetitions / (time.perf_counter() - start)
+
+def count_differences(results, expected):
+    """
+    return the number of queries whose top 10 differs from the expected one,
+    and the fraction of the expected documents that are in the top 10. The
+    expected results must have one line per query
+    """
+    if len(results) != len(expected):
+        raise ValueError('{} queries but {} expected results'.format(len(results), len(expected)))
+    different = sum(result != expected_result for result, expected_result in zip(results, expected))
+    found = sum(len(set(result) & set(expected_result)) for result, expected_result in zip(results, expected))
+    return different, found / max(1, sum(map(len, expected)))
+
+def run_benchmark(in_dir, queries_file, expected_file, repetitions):
+    """
+    build the index of the documents in every postings format, then compare their
+    sizes, decoding throughput and top 10 results, with the expected results and
+    with the results of the text postings
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        with open(queries_file, 'r', encoding = 'utf8') as f:
+            sentences = [line.rstrip('\r\n') for line in f]
+        expected = None
+        if expected_file is not None:
+            with open(expected_file, 'r') as f:
+                expected = [line.split() for line in f]
+            if len(expected) != len(sentences):
+                print('the expected output has {} lines, but there are {} queries'.format(len(expected), len(sentences)))
+                sys.exit(2)
+        postings_list = create_postings(in_dir, os.path.join(directory, 'dictionary.txt'))
+
+        text_results = None
+        print('{:>14} {:>12} {:>12} {:>16} {:>18} {:>18}'.format(
+            'format', 'postings', 'dictionary', 'decoding', 'vs text', 'vs expected'))
+        for name, postings_format, bits in FORMATS:
+            dict_file = os.path.join(directory, 'dictionary.txt')
+            postings_file = os.path.join(directory, 'postings.txt')
+            write_index(postings_list, dict_file, postings_file, postings_format, bits)
+
+            dictionary = TermTable(dict_file)
+            evaluator = QueryEvaluator(postings_file, dictionary, path_to_permuterm = permuterm_path(dict_file),
+                path_to_blocks = block_max_path(dict_file))
+            try:
+                parser = QueryParser(stem_table = stem_table_path(dict_file))
+                throughput = measure_decoding(evaluator, dictionary, repetitions)
+                results = [list(map(str, evaluator.evaluate(parser.parse_query(sentence)))) for sentence in sentences]
+            finally:
+                # The next format rewrites the files that are mapped
+                evaluator.close()
+                dictionary.close()
+            if text_results is None:
+                text_results = results
+
+            text_differences = '{} ({:.1%})'.format(*count_differences(results, text_results))
+            expected_differences = '-' if expected is None else '{} ({:.1%})'.format(*count_differences(results, expected))
+            print('{:>14} {:>11.1f}K {:>11.1f}K {:>10.2f}M/s {:>18} {:>18}'.format(name,
+                os.path.getsize(postings_file) / 1024, os.path.getsize(dict_file) / 1024, throughput / 1e6,
+                text_differences, expected_differences))
+        print('vs text and vs expected: number of queries whose top 10 differs (fraction of the documents found)')
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    input_directory = file_of_queries = expected_output = None
+    repetitions = 3
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'i:q:e:r:')
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for o, a in opts:
+        if o == '-i': # input directory
+            input_directory = a
+        elif o == '-q': # file of queries
+            file_of_queries = a
+        elif o == '-e': # expected results of the queries
+            expected_output = a
+        elif o == '-r': # number of repetitions of the decoding
+            repetitions = int(a)
+        else:
+            assert False, "unhandled option"
+
+    if input_directory == None or file_of_queries == None:
+        usage()
+        sys.exit(2)
+
+    run_benchmark(input_directory, file_of_queries, expected_output, repetitions)
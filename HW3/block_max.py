@@ -0,0 +1,114 @@
+import os
+import struct
+import sys
+from typing import List, Optional, Tuple
+
+from posting_reader import PostingReader
+
+# Header of the block-max file: the number of postings in every block, padded to 8 bytes
+HEADER_FORMAT = '<Ixxxx'
+
+def block_max_path(dictionary_file) -> str:
+    '''
+    Get the path of the block-max file that is saved next to a dictionary file.
+
+    Argument:
+        dictionary_file (str): Path to the dictionary file
+
+    Return:
+        Path to the block-max file
+    '''
+    return dictionary_file + '.blocks'
+
+class BlockMaxWriter:
+    '''
+    Write the block-max metadata of the posting lists. The postings of a term,
+    sorted by docID, are split in blocks of block_size postings. Every term is
+    stored as the largest weight of each block (float64) followed by the last
+    docID of each block (uint32), padded to 8 bytes, so that both arrays can be
+    read in place from a memory map.
+
+    Attributes:
+        file (file): The block-max file
+        block_size (int): Number of postings in every block
+    '''
+
+    def __init__(self, path, block_size) -> None:
+        self.file = open(path, 'wb')
+        self.block_size = block_size
+        self.file.write(struct.pack(HEADER_FORMAT, block_size))
+
+    def add(self, postings) -> int:
+        '''
+        Write the blocks of a posting list.
+
+        Argument:
+            postings (List[Tuple[int, float]]): The (docID, weight) postings of a term
+
+        Return:
+            The byte offset of the blocks of the term in the file
+        '''
+        offset = self.file.tell()
+        postings = sorted(postings)
+        blocks = [postings[i: i + self.block_size] for i in range(0, len(postings), self.block_size)]
+        data = struct.pack('<{}d'.format(len(blocks)), *(max(weight for _, weight in block) for block in blocks))
+        data += struct.pack('<{}I'.format(len(blocks)), *(block[-1][0] for block in blocks))
+        self.file.write(data + bytes(-len(data) % 8))
+        return offset
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+class BlockMaxIndex:
+    '''
+    Read-only access to the block-max metadata through a shared memory map.
+
+    Attributes:
+        reader (PostingReader): The memory-mapped block-max file
+        block_size (int): Number of postings in every block
+    '''
+
+    def __init__(self, path) -> None:
+        self.reader = PostingReader(path)
+        self.block_size, = struct.unpack_from(HEADER_FORMAT, self.reader.read(0, struct.calcsize(HEADER_FORMAT)))
+
+    def blocks(self, offset, doc_frequency) -> Tuple[List[float], List[int]]:
+        '''
+        Get the blocks of a term.
+
+        Argument:
+            offset (int): Byte offset of the blocks of the term
+            doc_frequency (int): Number of postings of the term
+
+        Return:
+            The largest weight and the last docID of every block
+        '''
+        num_of_blocks = -(-doc_frequency // self.block_size)
+        max_weights = self.reader.read(offset, 8 * num_of_blocks)
+        last_docs = self.reader.read(offset + 8 * num_of_blocks, 4 * num_of_blocks)
+        if sys.byteorder == 'little':
+            # Zero-copy views on the map
+            return max_weights.cast('d'), last_docs.cast('I')
+        return (list(struct.unpack('<{}d'.format(num_of_blocks), max_weights)),
+            list(struct.unpack('<{}I'.format(num_of_blocks), last_docs)))
+
+    def close(self) -> None:
+        self.reader.close()
+
+def open_block_max_index(path) -> Optional[BlockMaxIndex]:
+    '''
+    Open the block-max file of an index, if it has one.
+
+    Argument:
+        path (str): Path to the block-max file
+
+    Return:
+        The block-max metadata, or None if the file does not exist
+    '''
+    return BlockMaxIndex(path) if path and os.path.exists(path) else None
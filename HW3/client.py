@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+import asyncio
+import getopt
+import os
+import sys
+import time
+import yaml
+
+# Obtain hyperparameters
+ROOT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+with open(os.path.join(ROOT_DIRECTORY, "config.yaml"), "r") as config:
+    hyperparameters = yaml.full_load(config)
+default_host = hyperparameters['serving']['host']
+default_port = hyperparameters['serving']['port']
+
+def usage():
+    print("usage: " + sys.argv[0] + " -q file-of-queries -o output-file-of-results [--host HOST] [--port PORT | --socket PATH]")
+
+async def send_queries(writer, sentences) -> None:
+    '''
+    Send the queries, one per line, while the results are being received.
+
+    Argument:
+        writer (asyncio.StreamWriter): The stream of the queries
+        sentences (List[str]): The queries
+    '''
+    for sentence in sentences:
+        writer.write((sentence + '\n').encode('utf8'))
+        await writer.drain()
+
+async def run_client(queries_file, results_file, host = None, port = None, socket_path = None) -> None:
+    '''
+    Send the queries of a queries file to a running server, and write the
+    results to a file, in the order of the queries.
+
+    Argument:
+        queries_file (str): Path to the queries, one per line
+        results_file (str): Path to the results, one line per query
+        host (str): Address of the server
+        port (int): TCP port of the server
+        socket_path (str): Path of the Unix socket of the server, instead of a TCP port
+    '''
+    with open(queries_file, 'r', encoding = 'utf8') as f:
+        sentences = [line.rstrip('\r\n') for line in f]
+
+    if socket_path is not None:
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+
+    # The queries are pipelined: they are sent while the results are read
+    start = time.perf_counter()
+    sender = asyncio.create_task(send_queries(writer, sentences))
+    results = []
+    for _ in sentences:
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError('the server closed the connection')
+        results.append(line.decode('utf8'))
+    await sender
+    elapsed = time.perf_counter() - start
+    writer.close()
+    await writer.wait_closed()
+
+    with open(results_file, 'w') as f:
+        f.writelines(results)
+    if sentences:
+        print('{} queries in {:.3f}s, {:.3f}ms per query'.format(len(sentences), elapsed, elapsed * 1000 / len(sentences)))
+
+if __name__ == '__main__':
+    file_of_queries = file_of_output = socket_path = None
+    host = default_host
+    port = default_port
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'q:o:', ['host=', 'port=', 'socket='])
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for o, a in opts:
+        if o == '-q':
+            file_of_queries = a
+        elif o == '-o':
+            file_of_output = a
+        elif o == '--host': # address of the server
+            host = a
+        elif o == '--port': # TCP port of the server
+            port = int(a)
+        elif o == '--socket': # Unix socket of the server instead of a TCP port
+            socket_path = a
+        else:
+            assert False, "unhandled option"
+
+    if file_of_queries == None or file_of_output == None:
+        usage()
+        sys.exit(2)
+
+    asyncio.run(run_client(file_of_queries, file_of_output, host, port, socket_path))
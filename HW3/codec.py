@@ -0,0 +1,218 @@
+from typing import List, Tuple
+
+import numpy as np
+
+# Number of docIDs in every block of the PForDelta codec
+BLOCK_SIZE = 128
+
+# Largest number of bits of a docID gap, and the number of bytes that store an exception
+MAX_BITS = 32
+EXCEPTION_SIZE = 5
+
+# Entry of the dictionary of a binary index, with the number of bits of its impacts and their scale
+IMPACT_TERM = "_IMPACT_"
+
+# Term counts of the documents, in the _LENGTH_ list
+LENGTH_DTYPE = np.dtype('<u4')
+
+# bit_length(v) is the number of powers of two that are not larger than v
+POWERS_OF_TWO = 1 << np.arange(MAX_BITS + 1, dtype = np.uint64)
+
+def encode_doc_ids(docs) -> bytes:
+    '''
+    Encode sorted docIDs with PForDelta. The gaps between consecutive docIDs are
+    cut in blocks of BLOCK_SIZE, and every block is stored as:
+        header     : number of bits b and number of exceptions e (1 byte each)
+        low bits   : the lowest b bits of every gap, packed little-endian
+        exceptions : the positions (uint8) and the higher bits (uint32) of the e gaps that do not fit in b bits
+    b is chosen for each block to minimize its size.
+
+    Argument:
+        docs (np.ndarray): The sorted docIDs
+
+    Return:
+        The encoded docIDs
+    '''
+    gaps = np.diff(np.asarray(docs, dtype = np.int64), prepend = 0).astype(np.uint64)
+    encoded = bytearray()
+    for start in range(0, len(gaps), BLOCK_SIZE):
+        block = gaps[start: start + BLOCK_SIZE]
+        bit_lengths = np.searchsorted(POWERS_OF_TWO, block, side = 'right')
+        # exceptions[b] is the number of gaps with more than b bits
+        exceptions = len(block) - np.cumsum(np.bincount(bit_lengths, minlength = MAX_BITS + 1))
+        sizes = (len(block) * np.arange(MAX_BITS + 1) + 7) // 8 + EXCEPTION_SIZE * exceptions
+        bits = int(np.argmin(sizes))
+
+        positions = np.flatnonzero(bit_lengths > bits)
+        low = block & np.uint64((1 << bits) - 1)
+        packed = (low[:, None] >> np.arange(bits, dtype = np.uint64) & np.uint64(1)).astype(np.uint8)
+        encoded += bytes([bits, len(positions)])
+        encoded += np.packbits(packed.ravel(), bitorder = 'little').tobytes()
+        encoded += positions.astype(np.uint8).tobytes()
+        encoded += (block[positions] >> np.uint64(bits)).astype('<u4').tobytes()
+    return bytes(encoded)
+
+def decode_doc_ids(data, count, position = 0) -> Tuple[np.ndarray, int]:
+    '''
+    Decode docIDs encoded with encode_doc_ids, block by block into a NumPy array.
+
+    Argument:
+        data (Union[bytes, memoryview]): The encoded docIDs
+        count (int): Number of docIDs
+        position (int): Byte offset of the docIDs in data
+
+    Return:
+        The docIDs, and the byte offset right after them
+    '''
+    gaps = np.empty(count, dtype = np.int64)
+    for start in range(0, count, BLOCK_SIZE):
+        size = min(BLOCK_SIZE, count - start)
+        bits, num_of_exceptions = data[position], data[position + 1]
+        position += 2
+        num_of_bytes = (size * bits + 7) // 8
+        if bits:
+            packed = np.frombuffer(data, np.uint8, num_of_bytes, position)
+            unpacked = np.unpackbits(packed, count = size * bits, bitorder = 'little').reshape(size, bits)
+            block = unpacked.dot(1 << np.arange(bits, dtype = np.int64))
+        else:
+            block = np.zeros(size, dtype = np.int64)
+        position += num_of_bytes
+        if num_of_exceptions:
+            positions = np.frombuffer(data, np.uint8, num_of_exceptions, position)
+            position += num_of_exceptions
+            high = np.frombuffer(data, '<u4', num_of_exceptions, position).astype(np.int64)
+            position += 4 * num_of_exceptions
+            block[positions] |= high << bits
+        gaps[start: start + size] = block
+    return np.cumsum(gaps), position
+
+def encode_postings(docs, values, dtype) -> bytes:
+    '''
+    Encode the postings of a term: its values, one per document, as a fixed-size
+    array, followed by its docIDs encoded with PForDelta.
+
+    Argument:
+        docs (List[int]): The sorted docIDs
+        values (List[int]): The value of each document
+        dtype (np.dtype): The type of the values
+
+    Return:
+        The encoded postings
+    '''
+    return np.asarray(values, dtype = dtype).tobytes() + encode_doc_ids(docs)
+
+def decode_postings(data, count, dtype) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Decode the postings of a term encoded with encode_postings.
+
+    Argument:
+        data (Union[bytes, memoryview]): The encoded postings
+        count (int): Number of postings
+        dtype (np.dtype): The type of the values
+
+    Return:
+        The sorted docIDs and the value of each document
+    '''
+    dtype = np.dtype(dtype)
+    values = np.frombuffer(data, dtype, count)
+    docs, _ = decode_doc_ids(data, count, count * dtype.itemsize)
+    return docs, values
+
+class ImpactCodec:
+    '''
+    Encode the weights of the postings as 8 or 16 bit integer impacts. The
+    impact of a weight is its value in units of the scale of the index, which
+    is the largest weight divided by the largest impact, so that the impacts
+    keep the order of the weights. An impact is at least 1, so a document in a
+    posting list keeps a positive score.
+
+    Attributes:
+        bits (int): Number of bits of an impact, 8 or 16
+        scale (float): Weight of an impact of 1
+        dtype (np.dtype): The type of the impacts
+    '''
+
+    def __init__(self, bits, scale) -> None:
+        if bits not in (8, 16):
+            raise ValueError('impacts have 8 or 16 bits, not {}'.format(bits))
+        self.bits = bits
+        self.scale = scale
+        self.dtype = np.dtype(np.uint8 if bits == 8 else '<u2')
+
+    @classmethod
+    def for_weights(cls, bits, max_weight):
+        '''
+        Create the codec of an index from its largest weight.
+
+        Argument:
+            bits (int): Number of bits of an impact, 8 or 16
+            max_weight (float): The largest weight of the index
+
+        Return:
+            The codec
+        '''
+        return cls(bits, max_weight / ((1 << bits) - 1))
+
+    def quantize(self, weight) -> int:
+        '''
+        Get the impact of a weight.
+
+        Argument:
+            weight (float): A positive weight
+
+        Return:
+            The impact, between 1 and the largest impact
+        '''
+        return min((1 << self.bits) - 1, max(1, round(weight / self.scale)))
+
+    def weight(self, impact) -> float:
+        '''
+        Get the weight that an impact stands for.
+
+        Argument:
+            impact (int): An impact
+
+        Return:
+            The impact in units of the scale
+        '''
+        return impact * self.scale
+
+    def encode(self, postings) -> bytes:
+        '''
+        Encode a posting list, whose weights are quantized.
+
+        Argument:
+            postings (List[Tuple[int, float]]): The (docID, weight) postings of a term, in any order
+
+        Return:
+            The encoded postings
+        '''
+        postings = sorted(postings)
+        return encode_postings([doc for doc, _ in postings], [self.quantize(weight) for _, weight in postings], self.dtype)
+
+    def decode(self, data, count) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        Decode a posting list.
+
+        Argument:
+            data (Union[bytes, memoryview]): The encoded postings
+            count (int): Number of postings
+
+        Return:
+            The sorted docIDs and the weight that the impact of each document stands for
+        '''
+        docs, impacts = decode_postings(data, count, self.dtype)
+        return docs, impacts * self.scale
+
+    def quantize_postings(self, postings) -> List[Tuple[int, float]]:
+        '''
+        Replace the weights of a posting list by the weights that their impacts
+        stand for, so that the bounds on the scores are computed on them.
+
+        Argument:
+            postings (List[Tuple[int, float]]): The (docID, weight) postings of a term
+
+        Return:
+            The postings, in the same order
+        '''
+        return [(doc, self.weight(self.quantize(weight))) for doc, weight in postings]
@@ -0,0 +1,91 @@
+import heapq
+import time
+from typing import List
+
+# Relative slack on the bounds, since the scores are summed in a different order than by the query terms
+EPSILON = 1e-9
+
+# Number of impact-ordered postings of a term that are scored together
+SEGMENT_SIZE = 64
+
+def score_at_a_time(posting_lists, query_weights, k, doc_to_index, time_budget = 0, postings_budget = 0) -> List[int]:
+    '''
+    Find the k documents with the highest scores, score-at-a-time (Anh & Moffat).
+    The posting lists are sorted by decreasing weight, and are cut in segments of
+    SEGMENT_SIZE postings, whose score contributions are at most the one of their
+    first posting. The segments of all the query terms are scored in decreasing
+    order of that bound, so the postings with the largest contributions come first.
+    The evaluation stops early once the top k can not change anymore: the bounds
+    of the next segments of every term add up to less than the gap between each
+    of the top k scores and the next one, so neither the documents nor their order
+    can change. Otherwise, once every posting is scored, the documents that may tie
+    with the k-th score are rescored in the order of the query terms, so the results
+    are the same as scoring every posting. It also stops once the time budget or the
+    postings budget runs out, with the best documents found so far.
+
+    Argument:
+        posting_lists (List[List[Tuple[int, float]]]): The posting lists of the query terms, by decreasing weight
+        query_weights (List[float]): The weight of each term in the query
+        k (int): Number of documents to return
+        doc_to_index (Dict[int, int]): Rank of every docID to break ties
+        time_budget (float): Time limit of the evaluation in seconds, or 0 for no limit
+        postings_budget (int): Maximum number of postings scored, or 0 for no limit
+
+    Return:
+        The docIDs of the top k documents with a positive score, best first
+    '''
+    deadline = time.perf_counter() + time_budget if time_budget else None
+    # bounds[i] is the largest contribution left in the posting list of term i
+    bounds = [posting_list[0][1] * query_weight if posting_list else 0.0
+        for posting_list, query_weight in zip(posting_lists, query_weights)]
+    remaining = sum(bounds)
+    segments = [(-bound, i, 0) for i, bound in enumerate(bounds) if bound > 0]
+    heapq.heapify(segments)
+
+    scores = {}
+    get = scores.get
+    scored = 0
+    since_check = 0
+    while segments:
+        _, i, start = heapq.heappop(segments)
+        posting_list, query_weight = posting_lists[i], query_weights[i]
+        end = start + SEGMENT_SIZE
+        for doc, weight in posting_list[start: end]:
+            scores[doc] = get(doc, 0) + weight * query_weight
+        count = min(end, len(posting_list)) - start
+        scored += count
+        since_check += count
+
+        # The bound of the term is now the first weight of its next segment
+        remaining -= bounds[i]
+        bounds[i] = posting_list[end][1] * query_weight if end < len(posting_list) else 0.0
+        remaining += bounds[i]
+        if bounds[i] > 0:
+            heapq.heappush(segments, (-bounds[i], i, end))
+
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+        if postings_budget and scored >= postings_budget:
+            break
+        # Checking whether the top k is stable costs a pass over the scores, so it is done
+        # at most once per as many postings as there are scores
+        if since_check >= len(scores) and len(scores) >= k:
+            since_check = 0
+            top = heapq.nlargest(k + 1, scores.values())
+            if len(top) == k:
+                top.append(0.0)
+            if all((top[j + 1] + remaining) * (1 + EPSILON) < top[j] for j in range(k)):
+                break
+
+    top_k = heapq.nlargest(k, scores.items(), key = lambda x: (x[1], -doc_to_index[x[0]]))
+    if not segments and top_k:
+        # Every posting was scored, but not summed in the order of the query terms, so the documents that
+        # may tie with the k-th score are rescored in that order, to break the ties as scoring every posting does
+        kth_score = top_k[-1][1]
+        candidates = {doc: 0 for doc, score in scores.items() if score * (1 + EPSILON) >= kth_score}
+        for posting_list, query_weight in zip(posting_lists, query_weights):
+            for doc, weight in posting_list:
+                if doc in candidates:
+                    candidates[doc] += weight * query_weight
+        top_k = heapq.nlargest(k, candidates.items(), key = lambda x: (x[1], -doc_to_index[x[0]]))
+    return [doc for doc, score in top_k if score > 0]
@@ -1,27 +1,42 @@
 #!/usr/bin/python3
 import getopt
-import json
+import heapq
 import os
-import platform
+import shutil
 import sys
+import yaml
 
-from preprocessor import Preprocessor
+from block_max import BlockMaxWriter, block_max_path
+from codec import IMPACT_TERM, LENGTH_DTYPE, ImpactCodec, encode_postings
+from preprocessor import Preprocessor, stem_table_path
 from memory_indexing import MemoryIndexing
+from permuterm import permuterm_path, write_permuterm_index
+from spimi import SPIMI
+from term_table import TermTableWriter
+from utils import parse_size
+
+# Obtain hyperparameters
+ROOT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+with open(os.path.join(ROOT_DIRECTORY, "config.yaml"), "r") as config:
+    hyperparameters = yaml.full_load(config)
+block_size = hyperparameters['indexing']['block_size']
+default_postings_format = hyperparameters['indexing']['postings_format']
+default_impact_bits = hyperparameters['indexing']['impact_bits']
+default_builder = hyperparameters['indexing']['builder']
+default_memory_budget = hyperparameters['indexing']['memory_budget']
+
+# doc frequency, byte offset and byte length of the posting list of a term, its largest weight,
+# and the byte offset of its blocks in the block-max file
+DICTIONARY_FORMAT = '<IQIdQ'
 
 def usage():
-    print("usage: " + sys.argv[0] + " -i directory-of-documents -d dictionary-file -p postings-file")
+    print("usage: " + sys.argv[0] + " -i directory-of-documents -d dictionary-file -p postings-file [--builder external|memory] [--memory-budget SIZE]")
 
-def build_index(in_dir, out_dict, out_postings):
+def create_postings(in_dir, out_dict):
     """
-    build index from documents stored in the input directory,
-    then output the dictionary file and postings file
+    preprocess the documents stored in the input directory and create their
+    postings list, with tf normalization applied
     """
-    print('indexing...')
-    # This is an empty method
-    # Pls implement your code in below
-
-    ROOT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
-
     p = Preprocessor()
     mi = MemoryIndexing()
     
@@ -37,71 +52,158 @@ def build_index(in_dir, out_dict, out_postings):
         term_docid_pair = mi.create_term_docid_pair(terms,doc_id)
         term_docid_pairs.extend(term_docid_pair)
     
+    # Save the stems of the surface forms, to be reused by the query parser
+    p.stem_cache.save(stem_table_path(out_dict))
+
     # Create the postings list, with tf normalization applied
-    postings_list = mi.create_posting(term_docid_pairs,document_length)
-
-    # Write the postings list to the postings file
-    with open(os.path.join(ROOT_DIRECTORY,out_postings), 'w') as postings_file:
-        for term, postings in postings_list.items():
-            postings_file.write(term)
-            for elem in postings:
-                postings_file.write('|' + str(elem))
-            postings_file.write('\n')
-    
-    # Read the postings file again to help with the seek() function when searching
+    return mi.create_posting(term_docid_pairs,document_length)
+
+def write_postings(term_postings, max_weight, out_dict, out_postings, postings_format = None, bits = None):
+    """
+    write the (term, postings) given in sorted order of the terms to the postings
+    file, as text lines or as binary postings with quantized impacts, then output
+    the dictionary file. The terms are streamed, so the postings list does not
+    need to be in memory. The largest weight of the index is the scale of the impacts
+    """
+    postings_format = default_postings_format if postings_format is None else postings_format
+    bits = default_impact_bits if bits is None else bits
+
+    codec = None
+    if postings_format == 'binary':
+        codec = ImpactCodec.for_weights(bits, max_weight)
+        # The impacts of a binary index are read with its number of bits and scale
+        term_postings = heapq.merge(term_postings, [(IMPACT_TERM, None)], key = lambda pair: pair[0])
+    elif postings_format != 'text':
+        raise ValueError('unknown postings format {}'.format(postings_format))
+
+    # Write the postings list to the postings file, sorted by term, while recording
+    # the doc frequency, byte offset and byte length of each term to read it when searching,
+    # and its largest weight and the largest weight of each block of its postings to bound
+    # its score contributions
     terms = []
-    frequencies = dict()
-    line_offset = dict()
-    offset = 0
-
-    windows_platform = platform.system() == 'Windows'
-
-    with open(os.path.join(ROOT_DIRECTORY, out_postings), 'r') as posting_file:
-        line = posting_file.readline()
-        while line != '' and line != '\n':
-            term = line.split('|')[0]
-            terms.append(term)
-            line_offset[term] = offset
-            frequencies[term] = (len(line.split('|')) - 1)
-            offset += len(line) + 1 if windows_platform else len(line) # due to the discrepancies between Windows and Linux platforms when reading '\n'
-            line = posting_file.readline() 
-
-    term_dictionary = mi.create_dictionary_trie(terms,frequencies)
-
-    for term in terms:
-        root = term[0]
-        current_node = term_dictionary[root]
-        for char in term[1:]:
-            current_node = current_node[char]
-        current_node["_end_"].append(line_offset[term])
-    
-    # Set the dictionary for the _LENGTH_ term 
-    term_dictionary['_LENGTH_'] = line_offset["_LENGTH_"]
-
-    # Write the dictionary to the disk
-    with open(out_dict, 'w') as dict_file:
-        json.dump(term_dictionary, dict_file)
-
-input_directory = output_file_dictionary = output_file_postings = None
-
-try:
-    opts, args = getopt.getopt(sys.argv[1:], 'i:d:p:')
-except getopt.GetoptError:
-    usage()
-    sys.exit(2)
-
-for o, a in opts:
-    if o == '-i': # input directory
-        input_directory = a
-    elif o == '-d': # dictionary file
-        output_file_dictionary = a
-    elif o == '-p': # postings file
-        output_file_postings = a
-    else:
-        assert False, "unhandled option"
+    with open(os.path.join(ROOT_DIRECTORY, out_postings), 'wb') as postings_file, \
+        TermTableWriter(out_dict, DICTIONARY_FORMAT) as term_table, \
+        BlockMaxWriter(block_max_path(out_dict), block_size) as block_max:
+        for term, postings in term_postings:
+            if term == IMPACT_TERM:
+                term_table.add(term, codec.bits, 0, 0, codec.scale, 0)
+                continue
+            if term != "_LENGTH_":
+                terms.append(term)
+            if codec is None:
+                line = [term]
+                for elem in postings:
+                    line.append(str(elem))
+                data = ('|'.join(line) + '\n').encode('utf8')
+            elif term == "_LENGTH_":
+                data = encode_postings([doc for doc, _ in postings], [length for _, length in postings], LENGTH_DTYPE)
+            else:
+                # The bounds are on the weights that the impacts stand for
+                data = codec.encode(postings)
+                postings = codec.quantize_postings(postings)
+            if term == "_LENGTH_":
+                term_max_weight, blocks = 0, 0
+            else:
+                term_max_weight, blocks = max(weight for _, weight in postings), block_max.add(postings)
+            term_table.add(term, len(postings), postings_file.tell(), len(data), term_max_weight, blocks)
+            postings_file.write(data)
+
+    # Write the permuterm index of the terms, for the leading and infix wildcards
+    write_permuterm_index(terms, permuterm_path(out_dict))
+
+def write_index(postings_list, out_dict, out_postings, postings_format = None, bits = None):
+    """
+    write a postings list held in memory to the postings file, then output the dictionary file
+    """
+    max_weight = max((weight for term, postings in postings_list.items() if term != "_LENGTH_"
+        for _, weight in postings), default = 1.0)
+    write_postings(((term, postings_list[term]) for term in sorted(postings_list.keys())), max_weight,
+        out_dict, out_postings, postings_format, bits)
 
-if input_directory == None or output_file_postings == None or output_file_dictionary == None:
-    usage()
-    sys.exit(2)
+def build_index_external(in_dir, out_dict, out_postings, memory_budget):
+    """
+    build index from documents stored in the input directory in external memory.
+    The raw term frequencies are inverted with SPIMI into term-sorted runs on the
+    disk, whose posting buffers take at most the memory budget, and the lengths of
+    the vectors of the documents are computed while they are read. The runs are
+    merged in a single pass, which normalizes the weights and streams the
+    postings to the postings file
+    """
+    temp_folder = os.path.join(ROOT_DIRECTORY, 'disks')
+
+    # Check if folder exists
+    if not os.path.exists(temp_folder):
+        os.mkdir(temp_folder)
+    else:
+        shutil.rmtree(temp_folder)
+        os.mkdir(temp_folder)
 
-build_index(input_directory, output_file_dictionary, output_file_postings)
+    p = Preprocessor()
+    spimi = SPIMI(memory_budget)
+    run_filenames = []
+    filenames = sorted(os.listdir(in_dir), key = lambda filename: int(filename))
+    for filename in filenames:
+        spimi.add_document(p.preprocess_file(os.path.join(in_dir, filename)), int(filename))
+        if spimi.is_full():
+            run_filenames.append(os.path.join(temp_folder, 'run_{}.txt'.format(len(run_filenames))))
+            spimi.write_run(run_filenames[-1])
+    if spimi.postings:
+        run_filenames.append(os.path.join(temp_folder, 'run_{}.txt'.format(len(run_filenames))))
+        spimi.write_run(run_filenames[-1])
+
+    # Save the stems of the surface forms, to be reused by the query parser
+    p.stem_cache.save(stem_table_path(out_dict))
+
+    # The list of the document lengths goes in its sorted place among the terms
+    document_length = [("_LENGTH_", list(spimi.document_length.items()))]
+    term_postings = heapq.merge(spimi.merge(run_filenames), document_length, key = lambda pair: pair[0])
+    write_postings(term_postings, spimi.max_weight or 1.0, out_dict, out_postings)
+    shutil.rmtree(temp_folder)
+
+def build_index(in_dir, out_dict, out_postings, builder = None, memory_budget = None):
+    """
+    build index from documents stored in the input directory,
+    then output the dictionary file and postings file.
+    The external builder bounds the memory used to invert the documents
+    by the memory budget (e.g. 512M), the memory builder holds the whole
+    postings list in memory
+    """
+    print('indexing...')
+    builder = default_builder if builder is None else builder
+    if builder == 'memory':
+        write_index(create_postings(in_dir, out_dict), out_dict, out_postings)
+    elif builder == 'external':
+        build_index_external(in_dir, out_dict, out_postings,
+            parse_size(default_memory_budget if memory_budget is None else memory_budget))
+    else:
+        raise ValueError('unknown builder {}'.format(builder))
+
+if __name__ == '__main__':
+    input_directory = output_file_dictionary = output_file_postings = None
+    builder = memory_budget = None
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'i:d:p:', ['builder=', 'memory-budget='])
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for o, a in opts:
+        if o == '-i': # input directory
+            input_directory = a
+        elif o == '-d': # dictionary file
+            output_file_dictionary = a
+        elif o == '-p': # postings file
+            output_file_postings = a
+        elif o == '--builder': # external or memory index construction
+            builder = a
+        elif o == '--memory-budget': # memory of the posting buffers of the external builder, e.g. 512M
+            memory_budget = a
+        else:
+            assert False, "unhandled option"
+
+    if input_directory == None or output_file_postings == None or output_file_dictionary == None:
+        usage()
+        sys.exit(2)
+
+    build_index(input_directory, output_file_dictionary, output_file_postings, builder, memory_budget)
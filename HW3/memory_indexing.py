@@ -31,31 +31,6 @@ class MemoryIndexing:
     return term_docid_pairs
 
 
-  def create_dictionary_trie(self, list_of_terms, frequency) -> Dict[str, List[int]]:
-    '''
-    Take a list of terms from a particular document, the
-    posting dictionary (to get the doc frequency)  and returns a 
-    dictionary that represents the trie-representation of the 
-    words inside the list of terms. 
-
-    Arguments:
-      list_of_terms : list of terms from the particular document
-
-    
-    Return:
-      Dictionary representing the trie-representation of the words
-      inside the document.
-    '''
-    root = {}
-
-    for term in list_of_terms:
-      current_node = root
-      for char in term:
-        current_node = current_node.setdefault(char,{})
-      current_node['_end_'] = [frequency[term]]
-    return root
-
-
   def create_posting(self,term_docid_pairs,document_length) -> Dict[str, List[Tuple[int,int]]]:
     '''
     Take a list of term-docID pairs stored in a tuple and returns 
@@ -0,0 +1,90 @@
+from collections import OrderedDict
+import threading
+from typing import Dict, Optional
+
+class PostingCache:
+    '''
+    Cache of decoded posting lists, bounded by their estimated size in bytes,
+    evicting the least recently used posting lists once it is full. It can be
+    shared by several threads.
+
+    Attributes:
+        capacity (int) : Maximum number of bytes of the cached posting lists.
+        size (int) : Number of bytes of the cached posting lists.
+        entries (OrderedDict[str, Tuple[object, int]]) : Map a term into its decoded posting list and its size.
+        hits (int) : Number of lookups found in the cache.
+        misses (int) : Number of lookups not found in the cache.
+        evictions (int) : Number of posting lists evicted to make room for others.
+        lock (threading.Lock) : Guards the entries and the counters.
+    '''
+
+    def __init__(self, capacity) -> None:
+        self.capacity = capacity
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def get(self, term) -> Optional[object]:
+        '''
+        Get the decoded posting list of a term.
+
+        Argument:
+            term (str): A term
+
+        Return:
+            The posting list, or None if it is not in the cache
+        '''
+        with self.lock:
+            entry = self.entries.get(term)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(term)
+            return entry[0]
+
+    def put(self, term, posting_list, size) -> None:
+        '''
+        Store the decoded posting list of a term, evicting the least recently
+        used ones until it fits. A posting list larger than the whole cache is not stored.
+
+        Argument:
+            term (str): A term
+            posting_list (object): Its decoded posting list, which must not be modified afterwards
+            size (int): Estimated size of the posting list in bytes
+        '''
+        if size > self.capacity:
+            return
+        with self.lock:
+            if term in self.entries:
+                self.size -= self.entries.pop(term)[1]
+            while self.size + size > self.capacity:
+                _, (_, evicted_size) = self.entries.popitem(last = False)
+                self.size -= evicted_size
+                self.evictions += 1
+            self.entries[term] = (posting_list, size)
+            self.size += size
+
+    def reset_stats(self) -> None:
+        '''
+        Reset the hit, miss and eviction counters, e.g. after warming the cache.
+        '''
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        '''
+        Get the statistics of the cache.
+
+        Return:
+            The number of hits, misses, evictions, cached posting lists and cached bytes
+        '''
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+            'bytes': self.size,
+        }
@@ -1,10 +1,19 @@
 import heapq
 from math import log10
 import os
-from typing import List, Tuple
+import sys
+from typing import Dict, List, Tuple, Union
+import numpy as np
 import yaml
 
-from utils import normalize
+from block_max import open_block_max_index
+from codec import IMPACT_TERM, LENGTH_DTYPE, ImpactCodec, decode_postings
+from impact import score_at_a_time
+from permuterm import PermutermIndex, is_wildcard
+from posting_cache import PostingCache
+from posting_reader import PostingReader
+from utils import normalize, parse_size
+from wand import TermCursor, max_score, wand
 
 # Obtain hyperparameters
 ROOT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
@@ -12,23 +21,50 @@ with open(os.path.join(ROOT_DIRECTORY, "config.yaml"), "r") as config:
     hyperparameters = yaml.full_load(config)
 idf_cutoff = hyperparameters['heuristic1']['idf_cutoff']
 score_contribution_cutoff = hyperparameters['heuristic3']['score_contribution_cutoff']
+default_posting_cache_size = hyperparameters['searching']['posting_cache_size']
+wildcard_df_cap = hyperparameters['searching']['wildcard_df_cap']
+pruning = hyperparameters['searching']['pruning']
+time_budget_ms = hyperparameters['searching']['time_budget_ms']
+postings_budget = hyperparameters['searching']['postings_budget']
+
+# Rough memory held by every decoded (docID, weight) posting, with its pointer in the list
+POSTING_SIZE = sys.getsizeof((0, 0.0)) + sys.getsizeof(0) + sys.getsizeof(0.0) + 8
 
 class QueryEvaluator:
     '''
     Evaluator class that in charge of evalauting the parsed
     queries.
     Attributes:
-    posting_lists (Dict[str, List[int]]) : A Dict of posting-lists.
-    trie (Trie) : A trie to convert term into id
+    posting_lists (PostingReader) : The postings file, read by byte offset and length.
+    dictionary (TermTable) : A term table to find the posting list of a term
+    permuterm (PermutermIndex) : Expand the wildcard terms into the terms of the dictionary
+    block_max (BlockMaxIndex) : The largest weight of every block of the posting lists, or None if the index has none
+    codec (ImpactCodec) : The codec of the quantized impacts of a binary index, or None if its postings are text lines
+    cache (PostingCache) : Cache of the decoded posting lists of the terms
+    batch (dict) : The posting lists read for the current batch of queries, by term or by (term, 'docID')
+    num_of_documents (int) : Number of documents in the collection, loaded by the first query
+    doc_to_index (Dict[int, int]) : Position of every docID in the _LENGTH_ list, loaded by the first query
     '''
-    def __init__(self, path_to_postings, trie):
+    def __init__(self, path_to_postings, dictionary, cache_size = None, path_to_permuterm = '', path_to_blocks = ''):
         '''
         Initialize the posting lists.
         Argument:
         path_to_postings (str): Path to posting lists
+        dictionary (TermTable): The dictionary of terms
+        cache_size (Union[str, int]): Size of the posting cache, e.g. 64M
+        path_to_permuterm (str): Path to the permuterm index, without which only trailing wildcards are expanded
+        path_to_blocks (str): Path to the block-max file, without which the scores are only bounded per term
         '''
-        self.posting_lists = open(path_to_postings, 'r')
-        self.trie = trie
+        self.posting_lists = PostingReader(path_to_postings)
+        self.dictionary = dictionary
+        self.permuterm = PermutermIndex(dictionary, path_to_permuterm)
+        self.block_max = open_block_max_index(path_to_blocks)
+        impact = dictionary.get(IMPACT_TERM)
+        self.codec = None if impact is None else ImpactCodec(impact[0], impact[3])
+        self.cache = PostingCache(parse_size(default_posting_cache_size if cache_size is None else cache_size))
+        self.batch = dict()
+        self.num_of_documents = None
+        self.doc_to_index = None
 
     def _exist(self, term) -> bool:
         '''
@@ -38,12 +74,7 @@ class QueryEvaluator:
         Return:
             A boolean specifying whether it exists or not
         '''
-        current = self.trie
-        for letter in term:
-            if letter not in current:
-                return False
-            current = current[letter]
-        return ('_end_' in current) ### CHANGES
+        return term in self.dictionary
     
     def _get_doc_frequency(self, term) -> int:
         '''
@@ -53,37 +84,171 @@ class QueryEvaluator:
         Return:
             The document frequency of the term
         '''
-        current = self.trie
-        for letter in term:
-            if letter not in current:
-                return []
-            current = current[letter]
-        # Not leaf
-        if '_end_' not in current:
+        entry = self.dictionary.get(term)
+        if entry is None:
             return 0
-        return current['_end_'][0]
+        return entry[0]
+
+    def _read_posting_list(self, term, entry) -> List[Tuple[int, float]]:
+        '''
+        Read and decode the postings of a term in the postings file. It does not
+        move any file position, so the evaluator can be used by several threads.
+        Argument:
+            term (str): A word
+            entry (tuple): The (df, offset, length, max weight, blocks offset) of a term
+        Return:
+            A posting list, by decreasing weight
+        '''
+        doc_freq, position, length, _, _ = entry
+        data = self.posting_lists.read(position, length)
+        if self.codec is None:
+            # The term may contain a |, so the postings start right after it
+            lines = str(data, 'utf8')[len(term) + 1:].split('|')
+            return list(map(lambda clause: eval(clause.rstrip()), lines))
+        if term == "_LENGTH_":
+            docs, lengths = decode_postings(data, doc_freq, LENGTH_DTYPE)
+            return list(zip(docs.tolist(), lengths.tolist()))
+        docs, weights = self.codec.decode(data, doc_freq)
+        # Ties keep the order of the docIDs, as in the text postings
+        order = np.argsort(-weights, kind = 'stable')
+        return list(zip(docs[order].tolist(), weights[order].tolist()))
 
-    def _get_posting_list(self, term) -> List[int]:
+    def _get_posting_list(self, term) -> List[Tuple[int, float]]:
         '''
-        Get the posting list of a term.
+        Get the posting list of a term, from the current batch or the posting
+        cache if it is there.
         Argument:
             term (str): A word
         Return:
             A posting list
         '''
-        current = self.trie
-        for letter in term:
-            if letter not in current:
-                return []
-            current = current[letter]
-        # Not leaf
-        if '_end_' not in current:
+        posting_list = self.batch.get(term)
+        if posting_list is not None:
+            return posting_list
+        posting_list = self.cache.get(term)
+        if posting_list is not None:
+            return posting_list
+        entry = self.dictionary.get(term)
+        if entry is None:
             return []
-        position = current['_end_'][1]
-        self.posting_lists.seek(position, 0)
-        lines = self.posting_lists.readline().split('|')
-        relevant_lines = list(map(lambda clause: eval(clause.rstrip()), lines[1:]))
-        return relevant_lines
+        posting_list = self._read_posting_list(term, entry)
+        self.cache.put(term, posting_list, sys.getsizeof(posting_list) + len(posting_list) * POSTING_SIZE)
+        return posting_list
+
+    def _read_doc_ordered_posting_list(self, term, entry) -> Tuple[List[int], List[float]]:
+        '''
+        Read the postings of a term sorted by docID instead of by weight. Binary
+        postings are stored by docID, so they are decoded in that order directly.
+        Argument:
+            term (str): A word
+            entry (tuple): The (df, offset, length, max weight, blocks offset) of a term
+        Return:
+            The sorted docIDs and the weights of the term in those documents
+        '''
+        if self.codec is not None:
+            docs, weights = self.codec.decode(self.posting_lists.read(entry[1], entry[2]), entry[0])
+            return docs.tolist(), weights.tolist()
+        postings = sorted(self._read_posting_list(term, entry))
+        return [doc for doc, _ in postings], [weight for _, weight in postings]
+
+    def _get_doc_ordered_posting_list(self, term) -> Tuple[List[int], List[float]]:
+        '''
+        Get the posting list of a term sorted by docID instead of by weight, for
+        the cursors of MaxScore and WAND, from the current batch or the posting
+        cache if it is there. It is sorted once and kept in the posting cache.
+        Argument:
+            term (str): A word
+        Return:
+            The sorted docIDs and the weights of the term in those documents
+        '''
+        key = (term, 'docID')
+        posting_list = self.batch.get(key)
+        if posting_list is None:
+            posting_list = self.cache.get(key)
+        if posting_list is None:
+            entry = self.dictionary.get(term)
+            if entry is None:
+                return [], []
+            posting_list = self._read_doc_ordered_posting_list(term, entry)
+            self.cache.put(key, posting_list, 2 * sys.getsizeof(posting_list[0]) + len(posting_list[0]) * POSTING_SIZE)
+        return posting_list
+
+    def _read_posting_lists(self, terms, doc_ordered = False) -> Dict[Union[str, Tuple[str, str]], list]:
+        '''
+        Get the posting lists of several terms. The ones that are not in the
+        current batch or the posting cache are read in a single sweep of the
+        postings file, in the order of their offsets.
+        Argument:
+            terms (Iterable[str]): The terms
+            doc_ordered (bool): Whether to get the posting lists sorted by docID, for MaxScore and WAND
+        Return:
+            A dictionary that maps each term in the dictionary to its posting list, or
+            each (term, 'docID') to its sorted docIDs and weights if doc_ordered
+        '''
+        posting_lists = dict()
+        entries = []
+        for term in terms:
+            key = (term, 'docID') if doc_ordered else term
+            posting_list = self.batch.get(key)
+            if posting_list is None:
+                posting_list = self.cache.get(key)
+            if posting_list is not None:
+                posting_lists[key] = posting_list
+                continue
+            entry = self.dictionary.get(term)
+            if entry is not None:
+                entries.append((entry[1], term, entry))
+        entries.sort()
+        for _, term, entry in entries:
+            if doc_ordered:
+                key = (term, 'docID')
+                posting_list = self._read_doc_ordered_posting_list(term, entry)
+                self.cache.put(key, posting_list, 2 * sys.getsizeof(posting_list[0]) + len(posting_list[0]) * POSTING_SIZE)
+            else:
+                key = term
+                posting_list = self._read_posting_list(term, entry)
+                self.cache.put(key, posting_list, sys.getsizeof(posting_list) + len(posting_list) * POSTING_SIZE)
+            posting_lists[key] = posting_list
+        return posting_lists
+
+    def _expand(self, pattern) -> List[str]:
+        '''
+        Expand a wildcard pattern into the terms of the dictionary that match it,
+        in sorted order. The expansion stops once the matching terms reach a
+        cumulative document frequency of wildcard_df_cap, to bound the latency.
+        Argument:
+            pattern (str): A wildcard pattern, where * matches any sequence of characters
+        Return:
+            The matching terms
+        '''
+        terms = []
+        doc_frequency = 0
+        for term, entry in self.permuterm.expand(pattern):
+            if term == "_LENGTH_" or term == IMPACT_TERM:
+                continue
+            terms.append(term)
+            doc_frequency += entry[0]
+            if doc_frequency >= wildcard_df_cap:
+                break
+        return terms
+
+    def _expand_query(self, parsed_query) -> List[str]:
+        '''
+        Replace the wildcards of a query by the terms they expand into.
+        Argument:
+            parsed_query (List[str]): The terms of a query
+        Return:
+            The terms of the query, without wildcards
+        '''
+        if not any(map(is_wildcard, parsed_query)):
+            return parsed_query
+        terms = []
+        for term in parsed_query:
+            if is_wildcard(term):
+                terms.extend(self._expand(term))
+            else:
+                terms.append(term)
+        return terms
 
     def _get_list_of_doc_term_counts(self) -> List[Tuple[int, int]]:
         '''
@@ -92,11 +257,31 @@ class QueryEvaluator:
         Return:
             List of doc term counts.
         '''
-        position = self.trie["_LENGTH_"]
-        self.posting_lists.seek(position, 0)
-        lines = self.posting_lists.readline().split('|')
-        relevant_lines = list(map(lambda clause: eval(clause.rstrip()), lines[1:]))
-        return relevant_lines
+        return self._get_posting_list("_LENGTH_")
+
+    def _load_documents(self) -> None:
+        '''
+        Load the number of documents and the position of every docID in the
+        _LENGTH_ list, only once instead of for every query.
+        '''
+        if self.doc_to_index is None:
+            length = self._get_list_of_doc_term_counts()
+            doc_to_index = {}
+            for i, (doc, _) in enumerate(length):
+                doc_to_index[doc] = i
+            self.num_of_documents = len(length)
+            self.doc_to_index = doc_to_index
+
+    def warm(self, parsed_queries):
+        '''
+        Load the posting lists of the terms of past queries into the posting
+        cache, then reset its statistics.
+        Argument:
+            parsed_queries (List[List[str]]): The parsed queries of a query log
+        '''
+        for parsed_query in parsed_queries:
+            self._read_posting_lists(self._expand_query(parsed_query), pruning in ('maxscore', 'wand'))
+        self.cache.reset_stats()
 
     def evaluate(self, parsed_query) -> List[str]:
         '''
@@ -107,14 +292,10 @@ class QueryEvaluator:
         Return:
             A list of string
         '''
-        length = self._get_list_of_doc_term_counts()
-        N = len(length)
-        scores = [[posting[0], 0] for posting in length]
-
-        # Create dict for O(1) scores retrieval
-        doc_to_index = {}
-        for i, score in enumerate(scores):
-            doc_to_index[score[0]] = i
+        parsed_query = self._expand_query(parsed_query)
+        self._load_documents()
+        N = self.num_of_documents
+        doc_to_index = self.doc_to_index
 
         # Calculate tf and idf of query
         tf_list = []
@@ -148,23 +329,42 @@ class QueryEvaluator:
             w_tq.append(tf_list[i] * idf_list[i])
         w_tq = normalize(w_tq)
 
+        # Exact top 10 with MaxScore or WAND, which skip the documents that can not enter it
+        if pruning in ('maxscore', 'wand'):
+            cursors = []
+            for term, term_index in term_to_index.items():
+                docs, weights = self._get_doc_ordered_posting_list(term)
+                doc_freq, _, _, max_weight, blocks_offset = self.dictionary.get(term)
+                if self.block_max is None:
+                    cursors.append(TermCursor(docs, weights, w_tq[term_index], max_weight))
+                else:
+                    cursors.append(TermCursor(docs, weights, w_tq[term_index], max_weight,
+                        self.block_max.blocks(blocks_offset, doc_freq), self.block_max.block_size))
+            top_k = max_score if pruning == 'maxscore' else wand
+            return top_k(cursors, 10, doc_to_index)
+
+        posting_lists = self._read_posting_lists(term_to_index)
+
+        # Score-at-a-time over the impact-ordered postings, which stops once the top 10 is stable or the budget runs out
+        if pruning == 'impact':
+            return score_at_a_time([posting_lists[term] for term in term_to_index], [w_tq[i] for i in term_to_index.values()],
+                10, doc_to_index, time_budget_ms / 1000, postings_budget)
+
+        # Sparse accumulator of the scores, with only the documents in the posting lists read
+        scores = {}
         for term, term_index in term_to_index.items():
-            posting_list = self._get_posting_list(term)
+            posting_list = posting_lists[term]
             for doc, w_td in posting_list:
-                doc_index = doc_to_index[doc]
                 score_contribution = w_td * w_tq[term_index]
-                scores[doc_index][1] += score_contribution
+                scores[doc] = scores.get(doc, 0) + score_contribution
                 # Continue to next term
                 if score_contribution < score_contribution_cutoff:
                     break
 
-        # Get top 10
-        top_10 = heapq.nlargest(10, scores, key = lambda x : x[1])
+        # Get top 10 among the scored documents, where ties go to the document that comes first in _LENGTH_
+        top_10 = heapq.nlargest(10, scores.items(), key = lambda x : (x[1], -doc_to_index[x[0]]))
         results = []
 
-        # Sort by score, then by doc id
-        results = sorted(results, key = lambda x : (x[1], x[0]))
-
         # Give docs that have values > 0
         for pair in top_10:
             if pair[1] == 0:
@@ -172,3 +372,43 @@ class QueryEvaluator:
             results.append(pair[0])
 
         return results
+
+    def evaluate_batch(self, parsed_queries) -> List[List[str]]:
+        '''
+        Evaluate a batch of parsed queries. The posting lists of all their terms
+        are read once, in the order of their offsets in the postings file, and
+        identical queries are only scored once.
+        Argument:
+            parsed_queries (List[List[str]]): The parsed queries
+        Return:
+            The results of every query
+        '''
+        self._load_documents()
+        terms = set()
+        for parsed_query in parsed_queries:
+            terms.update(self._expand_query(parsed_query))
+        # MaxScore and WAND only use the posting lists sorted by docID
+        self.batch = self._read_posting_lists(terms, pruning in ('maxscore', 'wand'))
+        try:
+            # Scores are summed in the order of the terms, so only identical queries are shared
+            results = dict()
+            batch_results = []
+            for parsed_query in parsed_queries:
+                key = tuple(parsed_query)
+                if key not in results:
+                    results[key] = self.evaluate(parsed_query)
+                batch_results.append(list(results[key]))
+            return batch_results
+        finally:
+            self.batch = dict()
+
+    def close(self) -> None:
+        '''
+        Release the memory maps of the postings file, the permuterm index and
+        the block-max file, so that they can be rewritten. The dictionary is
+        closed by its owner.
+        '''
+        self.posting_lists.close()
+        self.permuterm.close()
+        if self.block_max is not None:
+            self.block_max.close()
@@ -1,5 +1,6 @@
 from typing import List
 
+from permuterm import is_wildcard
 from preprocessor import Preprocessor
 
 class QueryParser:
@@ -11,8 +12,29 @@ class QueryParser:
     the tokens in the query
     '''
 
-    def __init__(self):
-        self.preprocessor = Preprocessor()
+    def __init__(self, tokenizer = None, stem_table = None):
+        self.preprocessor = Preprocessor(tokenizer, stem_table)
+
+    def parse_query(self, sentence) -> List[str]:
+        '''
+        Parse a free text query into its preprocessed terms. The words with a *
+        are kept as wildcard patterns.
+        Argument:
+        sentence (str): A query
+        Return:
+        The list of the terms of the query
+        '''
+        terms = []
+        for word in sentence.split():
+            # Wildcard terms are matched against the stems in the dictionary, so they are not stemmed
+            if is_wildcard(word):
+                terms.append(self.preprocessor.preprocess_pattern(word))
+            # The regex tokenizer is cheap enough to split the queries the same way as the documents
+            elif self.preprocessor.tokenizer == 'regex':
+                terms.extend(map(self.preprocessor.preprocess_word, self.preprocessor.tokenize(word)))
+            else:
+                terms.append(self.preprocessor.preprocess_word(word))
+        return terms
 
     def parse_queries(self, file_path) -> List[List[str]]:
         '''
@@ -26,11 +48,4 @@ class QueryParser:
         with open(file_path, "r", encoding="utf8") as f:
             sentences = f.readlines()
 
-        parsed_queries = []
-
-        # Parse each query using shunting yard algorithm
-        for sentence in sentences:
-            tokens = list(map(self.preprocessor.preprocess_word, sentence.split()))
-            parsed_queries.append(tokens)
-
-        return parsed_queries
+        return [self.parse_query(sentence) for sentence in sentences]
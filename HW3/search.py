@@ -1,19 +1,71 @@
 #!/usr/bin/python3
 import getopt
-import json
+from multiprocessing import Pool
 import os
 import sys
 
+from block_max import block_max_path
+from permuterm import permuterm_path
+from preprocessor import stem_table_path
 from queryEvaluator import QueryEvaluator
 from queryParser import QueryParser
+from term_table import TermTable
 
 def usage():
-    print("usage: " + sys.argv[0] + " -d dictionary-file -p postings-file -q file-of-queries -o output-file-of-results")
+    print("usage: " + sys.argv[0] + " -d dictionary-file -p postings-file -q file-of-queries -o output-file-of-results [--warm query-log] [--batch N] [--workers N]")
 
-def run_search(dict_file, postings_file, queries_file, results_file):
+# The evaluator of a worker process, opened once by init_worker
+worker_evaluator = None
+
+def open_evaluator(path_to_dict, path_to_postings, warm_queries = None):
+    """
+    open the dictionary and postings read-only and create an evaluator on them,
+    warming its posting cache with the parsed queries of a query log if given
+    """
+    queryEvaluator = QueryEvaluator(path_to_postings, TermTable(path_to_dict), path_to_permuterm = permuterm_path(path_to_dict),
+        path_to_blocks = block_max_path(path_to_dict))
+    if warm_queries is not None:
+        queryEvaluator.warm(warm_queries)
+    return queryEvaluator
+
+def evaluate_queries(queryEvaluator, queries, batch_size = None):
+    """
+    evaluate the parsed queries in order and return their results.
+    With a batch size, the queries are evaluated in batches that read each posting list once
+    """
+    results = []
+    if batch_size is not None:
+        for i in range(0, len(queries), batch_size):
+            results.extend(queryEvaluator.evaluate_batch(queries[i: i + batch_size]))
+    else:
+        for parsed_query in queries:
+            results.append(queryEvaluator.evaluate(parsed_query))
+    return results
+
+def init_worker(path_to_dict, path_to_postings, warm_queries):
+    """
+    open the index in a worker process, once for all the chunks of queries it evaluates
+    """
+    global worker_evaluator
+    worker_evaluator = open_evaluator(path_to_dict, path_to_postings, warm_queries)
+
+def evaluate_chunk(queries, batch_size):
+    """
+    evaluate a chunk of queries in a worker process, and return their results
+    with the statistics of the posting cache for this chunk
+    """
+    worker_evaluator.cache.reset_stats()
+    results = evaluate_queries(worker_evaluator, queries, batch_size)
+    return results, worker_evaluator.cache.stats()
+
+def run_search(dict_file, postings_file, queries_file, results_file, warm_log = None, batch_size = None, workers = 1):
     """
     using the given dictionary file and postings file,
-    perform searching on the given queries file and output the results to a file
+    perform searching on the given queries file and output the results to a file.
+    The posting cache can be warmed with the queries of a query log. With a batch
+    size, the queries are evaluated in batches that read each posting list once.
+    With several workers, the queries are split in chunks evaluated by separate
+    processes, each with its own read-only handles on the index
     """
     print('running search on the queries...')
     # This is an empty method
@@ -26,17 +78,29 @@ def run_search(dict_file, postings_file, queries_file, results_file):
     path_to_queries = os.path.join(ROOT_DIRECTORY, queries_file)
     path_to_results = os.path.join(ROOT_DIRECTORY, results_file)
 
-    # Initialize Query related classes
-    with open(path_to_dict, 'r') as f:
-        trie = json.load(f)
-    queryParser = QueryParser()
-    queryEvaluator = QueryEvaluator(path_to_postings, trie)
+    # Parse queries
+    queryParser = QueryParser(stem_table = stem_table_path(path_to_dict))
+    queries = queryParser.parse_queries(path_to_queries)
+    warm_queries = None
+    if warm_log is not None:
+        warm_queries = queryParser.parse_queries(os.path.join(ROOT_DIRECTORY, warm_log))
 
     # Process queries
-    queries = queryParser.parse_queries(path_to_queries)
-    results = []
-    for parsed_query in queries:
-        results.append(queryEvaluator.evaluate(parsed_query))
+    if workers > 1:
+        # A few contiguous chunks per worker balance the load, and the results
+        # of the chunks come back in the order of the queries
+        chunk_size = max(-(-len(queries) // (workers * 4)), 1)
+        chunks = [(queries[i: i + chunk_size], batch_size) for i in range(0, len(queries), chunk_size)]
+        with Pool(workers, initializer = init_worker, initargs = (path_to_dict, path_to_postings, warm_queries)) as pool:
+            chunk_results = pool.starmap(evaluate_chunk, chunks, chunksize = 1)
+        results = [result for chunk, _ in chunk_results for result in chunk]
+        stats = {key: sum(chunk_stats[key] for _, chunk_stats in chunk_results) for key in ('hits', 'misses', 'evictions')}
+    else:
+        queryEvaluator = open_evaluator(path_to_dict, path_to_postings, warm_queries)
+        results = evaluate_queries(queryEvaluator, queries, batch_size)
+        stats = queryEvaluator.cache.stats()
+
+    print('posting cache: {}'.format(stats))
 
     # Save result
     with open(path_to_results, 'w') as f:
@@ -46,28 +110,41 @@ def run_search(dict_file, postings_file, queries_file, results_file):
             else:
                 f.write(" ".join(map(str, result)) + "\n")
 
-dictionary_file = postings_file = file_of_queries = output_file_of_results = None
-
-try:
-    opts, args = getopt.getopt(sys.argv[1:], 'd:p:q:o:')
-except getopt.GetoptError:
-    usage()
-    sys.exit(2)
-
-for o, a in opts:
-    if o == '-d':
-        dictionary_file  = a
-    elif o == '-p':
-        postings_file = a
-    elif o == '-q':
-        file_of_queries = a
-    elif o == '-o':
-        file_of_output = a
-    else:
-        assert False, "unhandled option"
+if __name__ == '__main__':
+    dictionary_file = postings_file = file_of_queries = output_file_of_results = None
+    warm_log = None
+    batch_size = None
+    workers = 1
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'd:p:q:o:', ['warm=', 'batch=', 'workers='])
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for o, a in opts:
+        if o == '-d':
+            dictionary_file  = a
+        elif o == '-p':
+            postings_file = a
+        elif o == '-q':
+            file_of_queries = a
+        elif o == '-o':
+            file_of_output = a
+        elif o == '--warm': # query log to warm the posting cache with
+            warm_log = a
+        elif o == '--batch': # number of queries evaluated together
+            batch_size = int(a)
+            if batch_size <= 0:
+                usage()
+                sys.exit(2)
+        elif o == '--workers': # number of processes evaluating the queries
+            workers = int(a)
+        else:
+            assert False, "unhandled option"
 
-if dictionary_file == None or postings_file == None or file_of_queries == None or file_of_output == None :
-    usage()
-    sys.exit(2)
+    if dictionary_file == None or postings_file == None or file_of_queries == None or file_of_output == None :
+        usage()
+        sys.exit(2)
 
-run_search(dictionary_file, postings_file, file_of_queries, file_of_output)
+    run_search(dictionary_file, postings_file, file_of_queries, file_of_output, warm_log, batch_size, workers)
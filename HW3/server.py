@@ -0,0 +1,172 @@
+#!/usr/bin/python3
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import getopt
+import os
+import sys
+import time
+import yaml
+
+from block_max import block_max_path
+from permuterm import permuterm_path
+from preprocessor import stem_table_path
+from queryEvaluator import QueryEvaluator
+from queryParser import QueryParser
+from term_table import TermTable
+
+# Obtain hyperparameters
+ROOT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+with open(os.path.join(ROOT_DIRECTORY, "config.yaml"), "r") as config:
+    hyperparameters = yaml.full_load(config)
+default_host = hyperparameters['serving']['host']
+default_port = hyperparameters['serving']['port']
+default_threads = hyperparameters['serving']['threads']
+
+def usage():
+    print("usage: " + sys.argv[0] + " -d dictionary-file -p postings-file [--host HOST] [--port PORT | --socket PATH] [--threads N]")
+
+class QueryServer:
+    '''
+    A server that keeps the index open and answers free text queries over a line
+    protocol: every line received is a query, in the format of the queries file,
+    and is answered with one line of results (the top 10 documents), in the format
+    of the output file.
+
+    Attributes:
+        parser (QueryParser): The parser of the queries
+        evaluator (QueryEvaluator): The evaluator of the queries, on the dictionary and postings
+        executor (ThreadPoolExecutor): The threads evaluating the queries, which share the evaluator
+        num_of_requests (int): Number of queries answered
+        total_latency (float): Total time spent answering the queries, in seconds
+    '''
+
+    def __init__(self, dict_file, postings_file, threads = None) -> None:
+        path_to_dict = os.path.join(ROOT_DIRECTORY, dict_file)
+        path_to_postings = os.path.join(ROOT_DIRECTORY, postings_file)
+        self.parser = QueryParser(stem_table = stem_table_path(path_to_dict))
+        self.evaluator = QueryEvaluator(path_to_postings, TermTable(path_to_dict), path_to_permuterm = permuterm_path(path_to_dict),
+        path_to_blocks = block_max_path(path_to_dict))
+        self.executor = ThreadPoolExecutor(default_threads if threads is None else threads)
+        self.num_of_requests = 0
+        self.total_latency = 0.0
+
+    def answer(self, parsed_query) -> str:
+        '''
+        Evaluate a query. It reads the postings by offset and length, so it can run
+        in several threads at the same time.
+
+        Argument:
+            parsed_query (List[str]): A parsed query
+
+        Return:
+            The line of its results
+        '''
+        return ' '.join(map(str, self.evaluator.evaluate(parsed_query)))
+
+    async def handle(self, reader, writer) -> None:
+        '''
+        Answer the queries of a connection until it is closed, logging the latency of every request.
+        A query longer than the limit of the stream is answered with an empty line, and the connection is closed.
+
+        Argument:
+            reader (asyncio.StreamReader): The stream of the queries
+            writer (asyncio.StreamWriter): The stream of the results
+        '''
+        peer = writer.get_extra_info('peername') or 'local'
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    # The line is longer than the limit of the stream, so the rest of the connection can not be
+                    # read in line with the queries: the query gets an empty line, and the connection is closed
+                    print('{} query longer than the stream limit, closing the connection'.format(peer), flush = True)
+                    writer.write(b'\n')
+                    if writer.can_write_eof():
+                        writer.write_eof()
+                    await writer.drain()
+                    # Closing with unread data would reset the connection before the client reads the empty line
+                    while await reader.read(1 << 16):
+                        pass
+                    break
+                if not line:
+                    break
+                sentence = line.decode('utf8').rstrip('\r\n')
+                start = time.perf_counter()
+                # The stem cache of the parser is not shared with the threads
+                parsed_query = self.parser.parse_query(sentence)
+                result = await loop.run_in_executor(self.executor, self.answer, parsed_query)
+                latency = time.perf_counter() - start
+                self.num_of_requests += 1
+                self.total_latency += latency
+                print('{} {:.3f}ms {}'.format(peer, latency * 1000, sentence), flush = True)
+                writer.write((result + '\n').encode('utf8'))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        except asyncio.CancelledError:
+            # The server was interrupted, so the connection is only closed
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host = None, port = None, socket_path = None) -> None:
+        '''
+        Serve the queries forever, on a TCP port or on a Unix socket.
+
+        Argument:
+            host (str): Address to listen on
+            port (int): TCP port to listen on
+            socket_path (str): Path of the Unix socket to listen on, instead of a TCP port
+        '''
+        if socket_path is not None:
+            server = await asyncio.start_unix_server(self.handle, path = socket_path)
+            print('serving on {}'.format(socket_path), flush = True)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+            print('serving on {}:{}'.format(host, port), flush = True)
+        async with server:
+            await server.serve_forever()
+
+if __name__ == '__main__':
+    dictionary_file = postings_file = socket_path = threads = None
+    host = default_host
+    port = default_port
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'd:p:', ['host=', 'port=', 'socket=', 'threads='])
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for o, a in opts:
+        if o == '-d':
+            dictionary_file = a
+        elif o == '-p':
+            postings_file = a
+        elif o == '--host': # address to listen on
+            host = a
+        elif o == '--port': # TCP port to listen on
+            port = int(a)
+        elif o == '--socket': # Unix socket to listen on instead of a TCP port
+            socket_path = a
+        elif o == '--threads': # number of threads evaluating the queries
+            threads = int(a)
+        else:
+            assert False, "unhandled option"
+
+    if dictionary_file == None or postings_file == None:
+        usage()
+        sys.exit(2)
+
+    print('loading the index...')
+    server = QueryServer(dictionary_file, postings_file, threads)
+    try:
+        asyncio.run(server.serve(host, port, socket_path))
+    except KeyboardInterrupt:
+        # The connections were cancelled with their queries that were still waiting for a thread
+        server.executor.shutdown(wait = False)
+        if server.num_of_requests:
+            print('{} queries, {:.3f}ms on average'.format(server.num_of_requests,
+                server.total_latency * 1000 / server.num_of_requests))
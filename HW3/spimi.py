@@ -0,0 +1,162 @@
+from array import array
+from math import log10, sqrt
+from typing import Generator, List, Tuple
+import heapq
+import os
+import sys
+
+# Rough memory held by every distinct term of a block, on top of the term itself: its entry
+# in the dictionary (about 100 bytes with the pointer to its buffers) and its two posting buffers
+TERM_OVERHEAD = 100 + sys.getsizeof((None, None)) + 2 * sys.getsizeof(array('I'))
+
+class SPIMI:
+    '''
+    A class that implements Single-Pass In-Memory Indexing for the weighted
+    index. The docIDs and the raw term frequencies are appended into growable
+    posting buffers per term, which are written as a term-sorted run once they
+    reach the memory budget. The length of the vector of a document only
+    depends on its own term frequencies, so it is computed as soon as the
+    document is added, and the weights are normalized when the runs are merged.
+
+    Attributes:
+    memory_budget (int): Memory in bytes that the posting buffers can take before being written as a run
+    postings (Dict[str, Tuple[array, array]]): Map a term to the docIDs and term frequencies of the block that contain it
+    size (int): Estimated memory in bytes taken by the terms and their posting buffers
+    term_ranks (Dict[str, int]): Position of every term in the order they first appear in the collection
+    vector_lengths (Dict[int, float]): Length of the vector of every document that has terms
+    document_length (Dict[int, int]): Number of terms of every document
+    max_weight (float): The largest normalized weight of the collection
+    '''
+
+    def __init__(self, memory_budget):
+        self.memory_budget = memory_budget
+        self.postings = dict()
+        self.size = 0
+        self.term_ranks = dict()
+        self.vector_lengths = dict()
+        self.document_length = dict()
+        self.max_weight = 0.0
+
+    def add_document(self, terms, doc_id):
+        '''
+        Add the terms of a document into the posting buffers, and compute the
+        length of its vector. The documents must be added in increasing order
+        of docID, so that the posting lists of the runs are sorted by docID.
+
+        Argument:
+        terms (List[str]): The terms of the document
+        doc_id (int): The docID of the document
+        '''
+        self.document_length[doc_id] = len(terms)
+        term_frequencies = dict()
+        for term in terms:
+            term_frequencies[term] = term_frequencies.get(term, 0) + 1
+        if not term_frequencies:
+            return
+
+        term_ranks = self.term_ranks
+        for term in term_frequencies:
+            if term not in term_ranks:
+                term_ranks[term] = len(term_ranks)
+
+        # The squares are summed in the order the terms first appear in the collection,
+        # as MemoryIndexing.create_posting does, so that the lengths are exactly the same
+        log_frequencies = {term: 1 + log10(term_frequency) for term, term_frequency in term_frequencies.items()}
+        length = sqrt(sum(log_frequencies[term] ** 2 for term in sorted(log_frequencies, key = term_ranks.__getitem__)))
+        self.vector_lengths[doc_id] = length
+        self.max_weight = max(self.max_weight, max(round(weight / length, 10) for weight in log_frequencies.values()))
+
+        postings = self.postings
+        for term, term_frequency in term_frequencies.items():
+            buffers = postings.get(term)
+            if buffers is None:
+                buffers = postings[term] = (array('I'), array('I'))
+                self.size += sys.getsizeof(term) + TERM_OVERHEAD
+            buffers[0].append(doc_id)
+            buffers[1].append(term_frequency)
+            self.size += 2 * buffers[0].itemsize
+
+    def is_full(self) -> bool:
+        '''
+        Check whether the posting buffers reached the memory budget.
+
+        Return:
+        A boolean specifying whether the block should be written as a run
+        '''
+        return self.size >= self.memory_budget
+
+    def write_run(self, target_name):
+        '''
+        Write the posting buffers to the disk as a run sorted by term, then
+        empty them. Each line of the run is a term followed by its
+        docID:term frequency postings, separated by tabs, which can not occur
+        in a term since the tokens never contain whitespace.
+
+        Argument:
+        target_name (str): Path to the run
+        '''
+        with open(target_name, 'w', encoding = 'utf8') as run_file:
+            for term in sorted(self.postings):
+                doc_ids, term_frequencies = self.postings[term]
+                run_file.write(term)
+                for doc_id, term_frequency in zip(doc_ids, term_frequencies):
+                    run_file.write('\t{}:{}'.format(doc_id, term_frequency))
+                run_file.write('\n')
+
+        self.postings = dict()
+        self.size = 0
+
+    def _push_next_line(self, heap, run_file, run_index):
+        '''
+        Read the next line of a run and push it into the heap, keyed on its term.
+
+        Argument:
+        heap (List[Tuple[str, int, List[str]]]): Heap of (term, run index, postings)
+        run_file (file): The opened run
+        run_index (int): Position of the run, so that the postings of a term are merged in the order of the runs
+        '''
+        line = run_file.readline().rstrip('\n')
+        if line == '':
+            return
+        term, *postings = line.split('\t')
+        heapq.heappush(heap, (term, run_index, postings))
+
+    def merge(self, run_filenames) -> Generator[Tuple[str, List[Tuple[int, float]]], None, None]:
+        '''
+        Do a single-pass k-way merge on the runs, and normalize the weights of
+        the postings with the lengths of the vectors of the documents. The runs
+        are deleted once they are merged.
+
+        Argument:
+        run_filenames (List[str]): Paths to the runs, in the order they were written
+
+        Return:
+        A generator of (term, postings) in sorted order of the terms, where the
+        (docID, weight) postings are sorted by decreasing weight
+        '''
+        run_files = [open(filename, 'r', encoding = 'utf8') for filename in run_filenames]
+        heap = []
+        for i, run_file in enumerate(run_files):
+            self._push_next_line(heap, run_file, i)
+
+        vector_lengths = self.vector_lengths
+        while heap:
+            # Collect the postings of the smallest term from every run that has it, in the order of the runs
+            term, i, postings = heapq.heappop(heap)
+            self._push_next_line(heap, run_files[i], i)
+            while heap and heap[0][0] == term:
+                _, j, more_postings = heapq.heappop(heap)
+                postings.extend(more_postings)
+                self._push_next_line(heap, run_files[j], j)
+
+            weighted_postings = []
+            for posting in postings:
+                doc_id, term_frequency = map(int, posting.split(':'))
+                weighted_postings.append((doc_id, round((1 + log10(term_frequency)) / vector_lengths[doc_id], 10)))
+            weighted_postings.sort(key = lambda pair: pair[1], reverse = True)
+            yield term, weighted_postings
+
+        # Delete the runs
+        for filename, run_file in zip(run_filenames, run_files):
+            run_file.close()
+            os.remove(filename)
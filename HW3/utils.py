@@ -15,3 +15,19 @@ def normalize(list_of_numbers) -> List[float]:
     for number in list_of_numbers:
         total_sum += number * number
     return list(map(lambda x : x / sqrt(total_sum), list_of_numbers))
+
+def parse_size(size) -> int:
+    '''
+    Take a size such as 512M, 64K or 2G and convert it into a number of bytes.
+
+    Argument:
+        size (Union[str, int]): A size, with an optional K, M or G unit
+
+    Return:
+        The number of bytes
+    '''
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    size = str(size).strip().upper().rstrip('B')
+    if size and size[-1] in units:
+        return int(float(size[:-1]) * units[size[-1]])
+    return int(size)
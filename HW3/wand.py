@@ -0,0 +1,307 @@
+from bisect import bisect_left
+import heapq
+from typing import Generator, List, Optional, Tuple
+
+# Relative slack on the upper bounds, since they are summed in a different order than the scores
+EPSILON = 1e-9
+
+class TermCursor:
+    '''
+    Cursor over the docID-ordered posting list of a query term.
+
+    Attributes:
+        docs (List[int]): The sorted docIDs of the posting list
+        weights (List[float]): The normalized weight of the term in each document
+        query_weight (float): The weight of the term in the query
+        upper_bound (float): The largest score contribution of the term to any document
+        block_max_weights (List[float]): The largest weight of every block of the posting list, or None
+        block_last_docs (List[int]): The last docID of every block of the posting list, or None
+        block_size (int): Number of postings in every block
+        position (int): Position of the current document
+        doc (int): The current docID, or None once the cursor is exhausted
+    '''
+
+    def __init__(self, docs, weights, query_weight, max_weight, blocks = None, block_size = None) -> None:
+        self.docs = docs
+        self.weights = weights
+        self.query_weight = query_weight
+        self.upper_bound = max_weight * query_weight
+        self.block_max_weights, self.block_last_docs = (None, None) if blocks is None else blocks
+        self.block_size = block_size
+        self.position = 0
+        self.doc = docs[0] if docs else None
+
+    def score(self) -> float:
+        '''
+        Get the score contribution of the term to the current document.
+
+        Return:
+            The weight of the term in the document times its weight in the query
+        '''
+        return self.weights[self.position] * self.query_weight
+
+    def block_bound(self, target) -> Tuple[float, Optional[int]]:
+        '''
+        Get the largest score contribution of the term to the documents of the
+        block that contains a target docID. Without blocks, the whole posting
+        list is one block.
+
+        Argument:
+            target (int): A docID
+
+        Return:
+            The largest score contribution in the block and its last docID, or
+            (0, None) if the target is after the last document of the term
+        '''
+        if self.block_last_docs is None:
+            if not self.docs or self.docs[-1] < target:
+                return 0.0, None
+            return self.upper_bound, self.docs[-1]
+        block = bisect_left(self.block_last_docs, target)
+        if block == len(self.block_last_docs):
+            return 0.0, None
+        return self.block_max_weights[block] * self.query_weight, self.block_last_docs[block]
+
+    def blocks(self) -> Generator[Tuple[int, int, float], None, None]:
+        '''
+        Iterate through the blocks of the posting list.
+
+        Return:
+            A generator of (start, end, largest score contribution) of each block
+        '''
+        if self.block_last_docs is None:
+            yield 0, len(self.docs), self.upper_bound
+            return
+        for block, max_weight in enumerate(self.block_max_weights):
+            start = block * self.block_size
+            yield start, min(start + self.block_size, len(self.docs)), max_weight * self.query_weight
+
+    def find(self, doc) -> Optional[int]:
+        '''
+        Find a document in the posting list, by binary search on the last docIDs
+        of the blocks, then in its block.
+
+        Argument:
+            doc (int): A docID
+
+        Return:
+            The position of the document, or None if the term is not in it
+        '''
+        low, high = 0, len(self.docs)
+        if self.block_last_docs is not None:
+            block = bisect_left(self.block_last_docs, doc)
+            low, high = block * self.block_size, min((block + 1) * self.block_size, high)
+        position = bisect_left(self.docs, doc, low, high)
+        if position < high and self.docs[position] == doc:
+            return position
+        return None
+
+    def next(self) -> Optional[int]:
+        '''
+        Move to the next document.
+
+        Return:
+            The new current docID, or None if the cursor is exhausted
+        '''
+        self.position += 1
+        self.doc = self.docs[self.position] if self.position < len(self.docs) else None
+        return self.doc
+
+    def advance(self, target) -> Optional[int]:
+        '''
+        Skip to the first document that is not smaller than a target, by binary search.
+
+        Argument:
+            target (int): A docID
+
+        Return:
+            The new current docID, or None if the cursor is exhausted
+        '''
+        self.position = bisect_left(self.docs, target, self.position)
+        self.doc = self.docs[self.position] if self.position < len(self.docs) else None
+        return self.doc
+
+def wand(cursors, k, doc_to_index) -> List[int]:
+    '''
+    Find the k documents with the highest scores with the WAND algorithm. The
+    cursors are kept sorted by their current document, and the pivot is the first
+    document at which the sum of the upper bounds of the cursors up to it can
+    reach the score of the k-th best document so far. The documents before the
+    pivot cannot, so the cursors skip them. With blocks, the bounds of the blocks
+    that contain the pivot are checked as well (Block-Max WAND), and if they can
+    not reach the k-th best score, the cursors skip to the end of the shortest
+    of those blocks. The scores are summed in the order of the cursors, and ties
+    go to the document that comes first in doc_to_index, so the results are the
+    same as scoring every posting.
+
+    Argument:
+        cursors (List[TermCursor]): The cursors of the query terms, in the order of the query
+        k (int): Number of documents to return
+        doc_to_index (Dict[int, int]): Rank of every docID to break ties
+
+    Return:
+        The docIDs of the top k documents with a positive score, best first
+    '''
+    heap = []
+    active = [cursor for cursor in cursors if cursor.doc is not None]
+    while active:
+        active.sort(key = lambda cursor: cursor.doc)
+
+        # Find the pivot
+        pivot = None
+        upper_bound = 0.0
+        for i, cursor in enumerate(active):
+            upper_bound += cursor.upper_bound
+            if len(heap) < k:
+                if upper_bound > 0:
+                    pivot = i
+                    break
+            elif upper_bound * (1 + EPSILON) >= heap[0][0]:
+                pivot = i
+                break
+        if pivot is None:
+            break
+        pivot_doc = active[pivot].doc
+
+        if len(heap) == k:
+            end = pivot + 1
+            while end < len(active) and active[end].doc == pivot_doc:
+                end += 1
+            upper_bound = 0.0
+            target = active[end].doc if end < len(active) else None
+            for cursor in active[:end]:
+                block_bound, last_doc = cursor.block_bound(pivot_doc)
+                upper_bound += block_bound
+                if last_doc is not None and (target is None or last_doc + 1 < target):
+                    target = last_doc + 1
+            if upper_bound * (1 + EPSILON) < heap[0][0]:
+                # No document from the pivot to the end of the shortest block can enter the top k
+                for cursor in active[:end]:
+                    cursor.advance(target)
+                active = [cursor for cursor in active if cursor.doc is not None]
+                continue
+
+        if active[0].doc == pivot_doc:
+            # Every cursor up to the pivot is on the pivot document, so it is fully scored
+            score = 0
+            for cursor in cursors:
+                if cursor.doc == pivot_doc:
+                    score = score + cursor.score()
+            if score > 0:
+                entry = (score, -doc_to_index[pivot_doc], pivot_doc)
+                if len(heap) < k:
+                    heapq.heappush(heap, entry)
+                elif entry[:2] > heap[0][:2]:
+                    heapq.heapreplace(heap, entry)
+            for cursor in active:
+                if cursor.doc == pivot_doc:
+                    cursor.next()
+        else:
+            # The documents before the pivot can not enter the top k
+            for cursor in active[:pivot]:
+                cursor.advance(pivot_doc)
+        active = [cursor for cursor in active if cursor.doc is not None]
+
+    return [doc for _, _, doc in sorted(heap, reverse = True)]
+
+def _kth_largest(scores, k) -> float:
+    '''
+    Get the k-th largest score, or 0 if there are fewer than k scores.
+
+    Argument:
+        scores (Dict[int, float]): The scores of the documents
+        k (int): Rank of the score
+
+    Return:
+        The k-th largest score
+    '''
+    if len(scores) < k:
+        return 0.0
+    return heapq.nlargest(k, scores.values())[-1]
+
+def max_score(cursors, k, doc_to_index) -> List[int]:
+    '''
+    Find the k documents with the highest scores with the term-at-a-time MaxScore
+    algorithm. The terms are accumulated by decreasing upper bound. A block of
+    postings whose bound, plus the upper bounds of the remaining terms, is less
+    than the k-th best partial score can not bring a new document into the top k,
+    so only the documents already scored are updated from it. Once the upper
+    bounds of the remaining terms add up to less than the k-th best partial score,
+    the remaining terms are only looked up for the documents that can still reach
+    it, and a document is dropped when the bound of the block where it would be
+    shows that it can not. The scores of the documents that may enter the top k
+    are recomputed in the order of the cursors, so the results are the same as
+    scoring every posting.
+
+    Argument:
+        cursors (List[TermCursor]): The cursors of the query terms, in the order of the query
+        k (int): Number of documents to return
+        doc_to_index (Dict[int, int]): Rank of every docID to break ties
+
+    Return:
+        The docIDs of the top k documents with a positive score, best first
+    '''
+    terms = sorted(cursors, key = lambda cursor: cursor.upper_bound, reverse = True)
+    # remaining[i] is the sum of the upper bounds of the terms from i
+    remaining = [0.0] * (len(terms) + 1)
+    for i in range(len(terms) - 1, -1, -1):
+        remaining[i] = remaining[i + 1] + terms[i].upper_bound
+
+    scores = {}
+    for i, cursor in enumerate(terms):
+        threshold = _kth_largest(scores, k)
+        rest = remaining[i + 1]
+        docs, weights, query_weight = cursor.docs, cursor.weights, cursor.query_weight
+        if remaining[i] * (1 + EPSILON) < threshold:
+            # Only the documents that can still reach the threshold are kept
+            scores = {doc: score for doc, score in scores.items() if (score + remaining[i]) * (1 + EPSILON) >= threshold}
+            if len(scores) * 8 < len(docs):
+                for doc, score in list(scores.items()):
+                    block_bound, _ = cursor.block_bound(doc)
+                    if (score + block_bound + rest) * (1 + EPSILON) < threshold:
+                        del scores[doc]
+                        continue
+                    position = cursor.find(doc)
+                    if position is not None:
+                        scores[doc] = score + weights[position] * query_weight
+            else:
+                best = max(scores.values(), default = 0.0)
+                for start, end, block_bound in cursor.blocks():
+                    # The documents of a skipped block can not reach the threshold, even if their score is not complete
+                    if (best + block_bound + rest) * (1 + EPSILON) < threshold:
+                        continue
+                    for doc, weight in zip(docs[start: end], weights[start: end]):
+                        if doc in scores:
+                            scores[doc] += weight * query_weight
+        else:
+            get = scores.get
+            # Merge the consecutive blocks that can bring new documents, and those that can not
+            runs = []
+            for start, end, block_bound in cursor.blocks():
+                new_documents = threshold == 0 or (block_bound + rest) * (1 + EPSILON) >= threshold
+                if runs and runs[-1][2] == new_documents:
+                    runs[-1][1] = end
+                else:
+                    runs.append([start, end, new_documents])
+            for start, end, new_documents in runs:
+                if new_documents:
+                    for doc, weight in zip(docs[start: end], weights[start: end]):
+                        scores[doc] = get(doc, 0) + weight * query_weight
+                else:
+                    for doc, weight in zip(docs[start: end], weights[start: end]):
+                        if doc in scores:
+                            scores[doc] += weight * query_weight
+
+    # Recompute the scores of the documents that may enter the top k in the order of the query terms
+    threshold = _kth_largest(scores, k)
+    results = []
+    for doc, score in scores.items():
+        if score > 0 and score * (1 + EPSILON) >= threshold:
+            exact = 0
+            for cursor in cursors:
+                position = cursor.find(doc)
+                if position is not None:
+                    exact = exact + cursor.weights[position] * cursor.query_weight
+            if exact > 0:
+                results.append((exact, -doc_to_index[doc], doc))
+    return [doc for _, _, doc in heapq.nlargest(k, results)]